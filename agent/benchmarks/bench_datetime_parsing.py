@@ -0,0 +1,102 @@
+"""Micro-benchmark: shared datetime parser vs the per-server strptime parsers it replaced.
+
+Run from the agent directory:
+
+    python benchmarks/bench_datetime_parsing.py [--min-speedup 3]
+
+Exits non-zero if the new parser is slower than --min-speedup times the old one.
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from datetime_parsing import parse_due_datetime, parse_event_datetime
+
+# Inputs shaped like what the agent sends: filter bounds, create/update times and phrases
+SAMPLES = [
+    "2025-03-14",
+    "2025-03-14 15:30",
+    "2025-03-14 15:30:00",
+    "2025-03-14T15:30:00",
+    "tomorrow 3:00 pm",
+    "today at 10:30 am",
+    "tomorrow",
+    "next week",
+]
+
+def legacy_calendar_parse(datetime_str):
+    """calendar_server.parse_datetime before the shared parser."""
+    formats = ["%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
+    for fmt in formats:
+        try:
+            return datetime.strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+    current_time = datetime.now()
+    today = datetime(2025, current_time.month, current_time.day)
+    if "today" in datetime_str.lower():
+        base_date = today
+    elif "tomorrow" in datetime_str.lower():
+        base_date = today + timedelta(days=1)
+    else:
+        base_date = today
+    time_match = re.search(r'(\d{1,2}):(\d{2})(?:\s*(am|pm))?', datetime_str, re.IGNORECASE)
+    if time_match:
+        hour = int(time_match.group(1))
+        minute = int(time_match.group(2))
+        am_pm = time_match.group(3)
+        if am_pm and am_pm.lower() == 'pm' and hour < 12:
+            hour += 12
+        elif am_pm and am_pm.lower() == 'am' and hour == 12:
+            hour = 0
+        return base_date.replace(hour=hour, minute=minute)
+    return base_date.replace(hour=9, minute=0)
+
+def legacy_task_parse(datetime_str):
+    """task_server.parse_datetime before the shared parser."""
+    if not datetime_str:
+        return None
+    formats = ["%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
+    for fmt in formats:
+        try:
+            return datetime.strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if "today" in datetime_str.lower():
+        return today
+    elif "tomorrow" in datetime_str.lower():
+        return today + timedelta(days=1)
+    elif "next week" in datetime_str.lower():
+        return today + timedelta(days=7)
+    return None
+
+def bench(parse, number):
+    return min(timeit.repeat(lambda: [parse(s) for s in SAMPLES], number=number, repeat=5)) / (number * len(SAMPLES))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--min-speedup", type=float, default=3.0)
+    options = parser.parse_args()
+
+    failed = False
+    for name, old, new in [
+        ("calendar", legacy_calendar_parse, parse_event_datetime),
+        ("tasks", legacy_task_parse, parse_due_datetime),
+    ]:
+        old_time = bench(old, options.number)
+        new_time = bench(new, options.number)
+        speedup = old_time / new_time
+        print(f"{name:9} old {old_time * 1e6:7.2f} us/parse   new {new_time * 1e6:6.2f} us/parse   {speedup:5.1f}x")
+        failed = failed or speedup < options.min_speedup
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Benchmark: calendar and task server handlers at 1k, 100k and 1M records.
+
+Run from the agent directory:
+
+    python benchmarks/bench_handlers.py [--scales 1000,100000,1000000] [--servers calendar,tasks]
+                                        [--output benchmarks/results/handlers.json]
+
+Each (server, scale) runs in a fresh interpreter with an in-memory store,
+which is bulk-loaded through create_events / create_tasks (the load rate is
+reported too), and then every handler is timed including the encoding of its
+response, as the JSON-lines loop would send it. Times are microseconds per
+call; the JSON output can be diffed against another commit with compare.py.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, AGENT_DIR)
+
+from results import measure, print_results, single, summarize, write_results
+
+DEFAULT_SCALES = [1000, 100_000, 1_000_000]
+SERVERS = ["calendar", "tasks"]
+# Records per bulk create call while loading
+LOAD_BATCH = 5000
+# Generated events are spread out at about this many per day
+EVENTS_PER_DAY = 20
+FIRST_DAY = datetime(2020, 1, 6)
+
+WORDS = (
+    "budget review planning sync report design launch hiring roadmap migration customer onboarding "
+    "retro standup interview demo research audit release security invoice contract offsite training"
+).split()
+PEOPLE = [f"person{i}@example.com" for i in range(200)]
+PRIORITIES = ["low", "medium", "high"]
+
+def title(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, 3))
+
+def event_args(rng: random.Random, days: int) -> Dict[str, Any]:
+    start = FIRST_DAY + timedelta(days=rng.randrange(days), hours=rng.randrange(7, 19), minutes=rng.choice((0, 30)))
+    return {
+        "title": title(rng),
+        "start_time": start.strftime("%Y-%m-%dT%H:%M:%S"),
+        "end_time": (start + timedelta(minutes=rng.choice((30, 60, 90)))).strftime("%Y-%m-%dT%H:%M:%S"),
+        "attendees": rng.sample(PEOPLE, rng.randrange(1, 4)),
+        "location": rng.choice(("room a", "room b", "online", None)),
+    }
+
+def task_args(rng: random.Random) -> Dict[str, Any]:
+    due = FIRST_DAY + timedelta(days=rng.randrange(365 * 3))
+    return {
+        "title": title(rng),
+        "description": " ".join(rng.choices(WORDS, k=8)),
+        "due_date": due.strftime("%Y-%m-%d"),
+        "priority": rng.choice(PRIORITIES),
+        "completed": rng.random() < 0.3,
+        "assignee": rng.choice(PEOPLE[:20]),
+        "tags": rng.sample(WORDS, 2),
+    }
+
+def check(result: Dict[str, Any]) -> Dict[str, Any]:
+    if result.get("status") == "error":
+        raise RuntimeError(result.get("message"))
+    return result
+
+def load(create: Callable[[Dict[str, Any]], Dict[str, Any]], key: str, make: Callable[[], Dict[str, Any]], count: int) -> float:
+    """Bulk-create `count` records and return the seconds it took."""
+    start = time.perf_counter()
+    for offset in range(0, count, LOAD_BATCH):
+        check(create({key: [make() for _ in range(min(LOAD_BATCH, count - offset))]}))
+    return time.perf_counter() - start
+
+def check_recurring_series(server: Any) -> None:
+    """Occurrences of several recurring series each keep their own series' id, title and length.
+
+    Runs against its own tenant, so the benchmarked calendar is left as generated.
+    """
+    from jsonl_server import encode_response
+
+    tenant = {"tenant_id": "bench-check"}
+    # Start time of each daily series -> (title, minutes, series id)
+    series = {}
+    for title, hour, minutes in (("Standup", 9, 15), ("Retro", 16, 60)):
+        start = datetime(2020, 1, 6, hour)
+        event = check(server.create_event({
+            **tenant, "title": title, "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=minutes)).isoformat(), "recurrence": {"frequency": "daily"},
+        }))["event"]
+        series[start.time()] = (title, minutes, event["id"])
+    response = check(server.get_events({**tenant, "start_date": "2020-01-07", "end_date": "2020-01-09T23:59:59"}))
+    # Events come back as encoded JSON fragments; decode them as a client would
+    events = json.loads(encode_response(response))["events"]
+    if len(events) != 3 * len(series):
+        raise RuntimeError(f"expected {3 * len(series)} occurrences, got {len(events)}")
+    for event in events:
+        start, end = datetime.fromisoformat(event["start_time"]), datetime.fromisoformat(event["end_time"])
+        title, minutes, series_id = series[start.time()]
+        if (event["title"], end - start, event["series_id"]) != (title, timedelta(minutes=minutes), series_id):
+            raise RuntimeError(f"occurrence at {event['start_time']} doesn't match its series {series_id}: {event}")
+
+def bench_calendar(scale: int, min_time: float) -> List[Dict[str, Any]]:
+    import calendar_server as server
+    from jsonl_server import encode_response
+
+    check_recurring_series(server)
+    rng = random.Random(scale)
+    days = max(30, scale // EVENTS_PER_DAY)
+    results = [single(f"calendar/{scale}/load", load(server.create_events, "events", lambda: event_args(rng, days), scale) / scale * 1e6, "us/record")]
+
+    # Queries look at a stretch in the middle of the generated range
+    middle = FIRST_DAY + timedelta(days=days // 2)
+    day = middle.strftime("%Y-%m-%d")
+    week_end = (middle + timedelta(days=6)).strftime("%Y-%m-%d")
+
+    def call(handler, args):
+        return lambda: encode_response(check(handler(dict(args))))
+
+    operations = [
+        ("get_events/day", call(server.get_events, {"start_date": day, "end_date": day})),
+        ("get_events/week", call(server.get_events, {"start_date": day, "end_date": week_end})),
+        ("get_events/week_count", call(server.get_events, {"start_date": day, "end_date": week_end, "count_only": True})),
+        ("get_events/page_100", call(server.get_events, {"start_date": "2020-01-01", "end_date": "2200-01-01", "limit": 100})),
+        ("find_available_slots/day", call(server.find_available_slots, {"date": day, "duration_minutes": 30})),
+        ("find_available_slots/week_attendees", call(server.find_available_slots, {
+            "start_date": day, "end_date": week_end, "duration_minutes": 60, "attendees": PEOPLE[:3],
+        })),
+        ("search_events", call(server.search_events, {"query": "budget review"})),
+    ]
+    for name, run in operations:
+        results.append(summarize(f"calendar/{scale}/{name}", measure(run, min_time)))
+
+    created: List[str] = []
+
+    def create() -> None:
+        created.append(check(server.create_event(event_args(rng, days)))["event"]["id"])
+
+    results.append(summarize(f"calendar/{scale}/create_event", measure(create, min_time)))
+    targets = iter(created * 2)
+    results.append(summarize(f"calendar/{scale}/update_event", measure(
+        lambda: check(server.update_event({"id": next(targets), "title": title(rng)})), min_time, max_runs=len(created),
+    )))
+    deletions = iter(created)
+    results.append(summarize(f"calendar/{scale}/delete_event", measure(
+        lambda: check(server.delete_event({"id": next(deletions)})), min_time, max_runs=len(created),
+    )))
+    return results
+
+def check_concurrent_search(server: Any) -> None:
+    """Searches running side by side, as reads do under the server's shared lock, leave the index intact.
+
+    Each round grows the tasks' average length so the searches would want new
+    length norms, searches from several threads at once, then deletes half of
+    the round's tasks. The deletes and later searches must succeed and never
+    return a deleted task. Runs against its own tenant, like check_recurring_series.
+    """
+    tenant = {"tenant_id": "bench-check"}
+    rng = random.Random(0)
+    errors: List[str] = []
+    deleted: set = set()
+    interval = sys.getswitchinterval()
+    # Switch threads as often as possible, so the searches interleave
+    sys.setswitchinterval(1e-6)
+    try:
+        for round in range(8):
+            tasks = [{"title": title(rng), "description": " ".join(rng.choices(WORDS, k=4 + 4 * round))} for _ in range(500)]
+            ids = [result["id"] for result in check(server.create_tasks({**tenant, "tasks": tasks}))["results"]]
+
+            def search() -> None:
+                try:
+                    for word in WORDS:
+                        found = check(server.search_tasks({**tenant, "query": f"{word} {rng.choice(WORDS)}", "limit": 5}))["tasks"]
+                        errors.extend(f"deleted task {task['id']} found" for task in found if task["id"] in deleted)
+                except Exception as e:
+                    errors.append(repr(e))
+
+            threads = [threading.Thread(target=search) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            check(server.delete_tasks({**tenant, "ids": ids[::2]}))
+            deleted.update(ids[::2])
+            search()
+            if errors:
+                raise RuntimeError(f"concurrent search broke the index in round {round}: {errors[0]}")
+    finally:
+        sys.setswitchinterval(interval)
+
+def bench_tasks(scale: int, min_time: float) -> List[Dict[str, Any]]:
+    import task_server as server
+    from jsonl_server import encode_response
+
+    check_concurrent_search(server)
+    rng = random.Random(scale)
+    results = [single(f"tasks/{scale}/load", load(server.create_tasks, "tasks", lambda: task_args(rng), scale) / scale * 1e6, "us/record")]
+
+    def call(handler, args):
+        return lambda: encode_response(check(handler(dict(args))))
+
+    operations = [
+        ("get_tasks/page_10", call(server.get_tasks, {"limit": 10})),
+        ("get_tasks/page_100", call(server.get_tasks, {"limit": 100})),
+        ("get_tasks/priority_incomplete", call(server.get_tasks, {"priority": "high", "completed": False, "limit": 20})),
+        ("get_tasks/assignee_by_due", call(server.get_tasks, {"assignee": PEOPLE[3], "sort_by": "due_date", "sort_dir": "asc", "limit": 20})),
+        ("get_tasks/count", call(server.get_tasks, {"completed": False, "count_only": True})),
+        ("get_task_summary", call(server.get_task_summary, {})),
+        ("search_tasks", call(server.search_tasks, {"query": "budget review"})),
+    ]
+    for name, run in operations:
+        results.append(summarize(f"tasks/{scale}/{name}", measure(run, min_time)))
+
+    created: List[str] = []
+
+    def create() -> None:
+        created.append(check(server.create_task(task_args(rng)))["task"]["id"])
+
+    results.append(summarize(f"tasks/{scale}/create_task", measure(create, min_time)))
+    targets = iter(created * 2)
+    results.append(summarize(f"tasks/{scale}/update_task", measure(
+        lambda: check(server.update_task({"id": next(targets), "priority": rng.choice(PRIORITIES)})), min_time, max_runs=len(created),
+    )))
+    completions = iter(created)
+    results.append(summarize(f"tasks/{scale}/mark_completed", measure(
+        lambda: check(server.mark_completed({"id": next(completions)})), min_time, max_runs=len(created),
+    )))
+    deletions = iter(created)
+    results.append(summarize(f"tasks/{scale}/delete_task", measure(
+        lambda: check(server.delete_task({"id": next(deletions)})), min_time, max_runs=len(created),
+    )))
+    return results
+
+def worker(server: str, scale: int, min_time: float) -> None:
+    """Benchmark one server at one scale and print the results as the last line of JSON."""
+    results = bench_calendar(scale, min_time) if server == "calendar" else bench_tasks(scale, min_time)
+    print(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES))
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds each operation is repeated for")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--worker", nargs=2, metavar=("SERVER", "SCALE"), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.worker:
+        worker(options.worker[0], int(options.worker[1]), options.min_time)
+        return
+
+    scales = [int(scale) for scale in options.scales.split(",") if scale]
+    servers = [server for server in options.servers.split(",") if server]
+    unknown = set(servers) - set(SERVERS)
+    if unknown:
+        parser.error(f"unknown servers: {', '.join(sorted(unknown))}")
+
+    # Fresh interpreter per run, so stores don't carry over and memory is returned between scales
+    env = {**os.environ, "CALENDAR_DB_PATH": "memory", "TASK_DB_PATH": "memory"}
+    results: List[Dict[str, Any]] = []
+    for server in servers:
+        for scale in scales:
+            print(f"{server} x {scale:,} ...", file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", server, str(scale), "--min-time", str(options.min_time)],
+                cwd=AGENT_DIR, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode:
+                sys.stderr.write(completed.stderr)
+                sys.exit(f"{server} at {scale} records failed")
+            results.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_results(results)
+    path = write_results("handlers", results, {"scales": scales, "servers": servers, "min_time": options.min_time}, options.output)
+    print(f"results written to {path}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark: round trips through the JSON-lines stdio loop of the calendar and task servers.
+
+Run from the agent directory:
+
+    python benchmarks/bench_stdio.py [--servers calendar,tasks] [--records 1000] [--pipelined 5000]
+                                     [--output benchmarks/results/stdio.json]
+
+For each server this spawns `python <server>.py` with an in-memory store and
+measures:
+
+- spawn: process start until the first response arrives
+- <function>/roundtrip: one request in flight at a time, in microseconds
+- <function>/handler: the same call made in process, so the difference is
+  what the pipe, JSON and the request loop cost
+- pipelined/<tagged|untagged>: requests per second with `--pipelined`
+  requests written back to back (tagged requests may run concurrently and
+  answer out of order, untagged ones run strictly in order)
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, AGENT_DIR)
+
+from bench_handlers import event_args, task_args
+from results import measure, print_results, single, summarize, write_results
+
+SERVERS = ["calendar", "tasks"]
+MODULES = {"calendar": "calendar_server", "tasks": "task_server"}
+# Bulk create function and its list argument, used to load records
+BULK_CREATE = {"calendar": ("create_events", "events"), "tasks": ("create_tasks", "tasks")}
+
+# (function, args) timed one at a time; None args create a freshly generated record each call
+CALLS = {
+    "calendar": [
+        ("get_events", {"start_date": "2020-01-06", "end_date": "2020-01-12", "limit": 20}),
+        ("find_available_slots", {"date": "2020-01-08", "duration_minutes": 30}),
+        ("create_event", None),
+    ],
+    "tasks": [
+        ("get_task_summary", {}),
+        ("get_tasks", {"priority": "high", "limit": 20}),
+        ("create_task", None),
+    ],
+}
+PIPELINED_CALL = {"calendar": ("get_events", {"start_date": "2020-01-06", "end_date": "2020-01-06"}), "tasks": ("get_task_summary", {})}
+
+class ServerProcess:
+    """A server child fed and read over its stdin/stdout pipes."""
+
+    def __init__(self, server: str):
+        env = {**os.environ, "CALENDAR_DB_PATH": "memory", "TASK_DB_PATH": "memory"}
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(AGENT_DIR, f"{MODULES[server]}.py")],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=AGENT_DIR, env=env,
+        )
+        self.stdout = self.process.stdout
+
+    def send(self, lines: List[bytes]) -> None:
+        self.process.stdin.write(b"".join(lines))
+        self.process.stdin.flush()
+
+    def receive(self) -> Dict[str, Any]:
+        line = self.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited")
+        return json.loads(line)
+
+    def request(self, function: str, args: Dict[str, Any], request_id: Optional[int] = None) -> Dict[str, Any]:
+        self.send([encode(function, args, request_id)])
+        response = self.receive()
+        if response.get("status") == "error":
+            raise RuntimeError(response.get("message"))
+        return response
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait(timeout=30)
+
+def encode(function: str, args: Dict[str, Any], request_id: Optional[int] = None) -> bytes:
+    request = {"function": function, "args": args}
+    if request_id is not None:
+        request["id"] = request_id
+    return (json.dumps(request) + "\n").encode("utf-8")
+
+def pipelined(server: ServerProcess, function: str, args: Dict[str, Any], count: int, tagged: bool) -> float:
+    """Requests per second with `count` requests written back to back."""
+    lines = [encode(function, args, i if tagged else None) for i in range(count)]
+    start = time.perf_counter()
+    # Write from a thread so a full pipe can't deadlock against the responses we're reading
+    writer = threading.Thread(target=server.send, args=(lines,))
+    writer.start()
+    for _ in range(count):
+        server.receive()
+    elapsed = time.perf_counter() - start
+    writer.join()
+    return count / elapsed
+
+def bench_server(name: str, records: int, count: int, min_time: float) -> List[Dict[str, Any]]:
+    rng = random.Random(records)
+    make = (lambda: event_args(rng, max(30, records // 20))) if name == "calendar" else (lambda: task_args(rng))
+
+    start = time.perf_counter()
+    server = ServerProcess(name)
+    server.request(*PIPELINED_CALL[name])
+    results = [single(f"stdio/{name}/spawn", (time.perf_counter() - start) * 1000, "ms")]
+    try:
+        bulk, key = BULK_CREATE[name]
+        for offset in range(0, records, 5000):
+            server.request(bulk, {key: [make() for _ in range(min(5000, records - offset))]})
+
+        # The same calls in process, against the same data, for the handler's share of each round trip
+        module = importlib.import_module(MODULES[name])
+        from jsonl_server import encode_response
+        rng.seed(records)
+        for offset in range(0, records, 5000):
+            module.FUNCTIONS[bulk]({key: [make() for _ in range(min(5000, records - offset))]})
+
+        for function, args in CALLS[name]:
+            arguments = (lambda: make()) if args is None else (lambda args=args: dict(args))
+            results.append(summarize(
+                f"stdio/{name}/{function}/roundtrip",
+                measure(lambda: server.request(function, arguments()), min_time),
+            ))
+            handler = module.FUNCTIONS[function]
+            results.append(summarize(
+                f"stdio/{name}/{function}/handler",
+                measure(lambda: encode_response(handler(arguments())), min_time),
+            ))
+
+        function, args = PIPELINED_CALL[name]
+        for tagged in (True, False):
+            rate = pipelined(server, function, args, count, tagged)
+            results.append(single(f"stdio/{name}/pipelined/{'tagged' if tagged else 'untagged'}", rate, "req/s", better="higher"))
+    finally:
+        server.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    parser.add_argument("--records", type=int, default=1000, help="records loaded before timing")
+    parser.add_argument("--pipelined", type=int, default=5000, help="requests per pipelined burst")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds each call is repeated for")
+    parser.add_argument("--output", help="where to write the JSON results")
+    options = parser.parse_args()
+    # The servers are also imported here to time their handlers in process; keep them off disk
+    os.environ["CALENDAR_DB_PATH"] = "memory"
+    os.environ["TASK_DB_PATH"] = "memory"
+
+    servers = [server for server in options.servers.split(",") if server]
+    unknown = set(servers) - set(SERVERS)
+    if unknown:
+        parser.error(f"unknown servers: {', '.join(sorted(unknown))}")
+
+    results: List[Dict[str, Any]] = []
+    for server in servers:
+        results.extend(bench_server(server, options.records, options.pipelined, options.min_time))
+
+    print_results(results)
+    run_options = {"servers": servers, "records": options.records, "pipelined": options.pipelined, "min_time": options.min_time}
+    path = write_results("stdio", results, run_options, options.output)
+    print(f"results written to {path}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Benchmark: chat_node end to end against a deterministic local chat model.
+
+Run from the agent directory (needs the agent's dependencies installed):
+
+    python benchmarks/bench_turn.py [--turns 20] [--threads 1] [--mcp-config config.json]
+                                    [--output benchmarks/results/turn.json]
+
+The OpenAI model is swapped for a scripted one that answers each user
+message with a fixed set of tool calls and then a short reply, so every run
+makes the same calls and the numbers only measure the agent: the graph,
+history handling, checkpointing, the mcp pool and the servers. Reported:
+
+- turn/spawn: bringing up the mcp config's servers on a cold pool, in ms
+- turn/first: the first turn, which also compiles the react agent, in ms
+- turn: every later turn's wall time, in ms
+- tool/<name>: the latency of each tool call as the agent sees it, in us
+
+Stores and checkpoints are kept in memory unless --checkpoint-db is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, AGENT_DIR)
+
+from results import print_results, single, summarize, write_results
+
+# Each user message, and the tool calls the scripted model answers it with
+SCRIPT: List[Tuple[str, List[Tuple[str, Dict[str, Any]]]]] = [
+    ("What's on my calendar this week, and how are my tasks looking?", [
+        ("get_events", {"start_date": "2025-03-03", "end_date": "2025-03-09"}),
+        ("get_task_summary", {}),
+    ]),
+    ("Add a task to review the budget by Friday.", [
+        ("create_task", {"title": "review the budget", "due_date": "2025-03-07", "priority": "high"}),
+    ]),
+    ("Book a planning sync on Tuesday at 10.", [
+        ("create_event", {"title": "planning sync", "start_time": "2025-03-04T10:00:00", "end_time": "2025-03-04T10:30:00"}),
+    ]),
+    ("When am I free on Tuesday for an hour?", [
+        ("find_available_slots", {"date": "2025-03-04", "duration_minutes": 60}),
+    ]),
+    ("Which of my tasks mention the budget?", [
+        ("search_tasks", {"query": "budget"}),
+        ("get_tasks", {"priority": "high", "limit": 10}),
+    ]),
+    ("Thanks, that's all for now.", []),
+]
+REPLIES = {message: calls for message, calls in SCRIPT}
+
+def scripted_model_class():
+    """The scripted chat model, defined on first use since it needs langchain."""
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class ScriptedChatModel(BaseChatModel):
+        """Answers a scripted user message with its tool calls, and tool results with a reply."""
+
+        @property
+        def _llm_type(self) -> str:
+            return "scripted"
+
+        def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+            return self
+
+        def _reply(self, messages: List[Any]) -> AIMessage:
+            last = messages[-1]
+            if isinstance(last, ToolMessage):
+                names = [message.name for message in messages if isinstance(message, ToolMessage)][-4:]
+                return AIMessage(content=f"Here's what I found using {', '.join(names)}. Anything else?")
+            if isinstance(last, HumanMessage) and REPLIES.get(last.content):
+                calls = [
+                    {"name": name, "args": args, "id": f"call_{index}_{name}"}
+                    for index, (name, args) in enumerate(REPLIES[last.content])
+                ]
+                return AIMessage(content="", tool_calls=calls)
+            # Summaries and anything unscripted get a short plain answer
+            return AIMessage(content="Sounds good.")
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+            reply = self._reply(messages)
+            # Stream the reply word by word like the real model, then its tool calls
+            for word in reply.content.split(" ") if reply.content else ():
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            for index, call in enumerate(reply.tool_calls):
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index},
+                ]))
+
+    return ScriptedChatModel
+
+def tool_timer_class():
+    from langchain_core.callbacks import AsyncCallbackHandler
+
+    class ToolTimer(AsyncCallbackHandler):
+        """Collects the wall time of every tool call, by tool name."""
+
+        def __init__(self):
+            self.started: Dict[Any, Tuple[str, float]] = {}
+            self.samples: Dict[str, List[float]] = {}
+
+        async def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+            self.started[run_id] = ((serialized or {}).get("name", "tool"), time.perf_counter())
+
+        async def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+            name, start = self.started.pop(run_id, (None, 0.0))
+            if name is not None:
+                self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1e6)
+
+        on_tool_error = on_tool_end
+
+    return ToolTimer
+
+async def run(options: argparse.Namespace) -> List[Dict[str, Any]]:
+    from langchain_core.messages import HumanMessage
+    import sample_agent.agent as agent
+    from sample_agent.mcp_pool import get_session_pool
+
+    ScriptedChatModel = scripted_model_class()
+    agent.chat_model = lambda **kwargs: ScriptedChatModel()
+    mcp_config = agent.DEFAULT_MCP_CONFIG
+    if options.mcp_config:
+        with open(options.mcp_config) as f:
+            mcp_config = json.load(f)
+
+    start = time.perf_counter()
+    async with get_session_pool().client(mcp_config):
+        pass
+    results = [single("turn/spawn", (time.perf_counter() - start) * 1000, "ms")]
+
+    timer = tool_timer_class()()
+    turn_times: List[float] = []
+    first_turn: Optional[float] = None
+
+    async def conversation(thread: int) -> None:
+        nonlocal first_turn
+        config = {"configurable": {"thread_id": f"bench-{thread}"}, "callbacks": [timer]}
+        for turn in range(options.turns):
+            message = SCRIPT[turn % len(SCRIPT)][0]
+            state: Dict[str, Any] = {"messages": [HumanMessage(content=message)]}
+            if options.mcp_config:
+                state["mcp_config"] = mcp_config
+            start = time.perf_counter()
+            await agent.graph.ainvoke(state, config)
+            elapsed = (time.perf_counter() - start) * 1000
+            if first_turn is None:
+                first_turn = elapsed
+            else:
+                turn_times.append(elapsed)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(conversation(thread) for thread in range(options.threads)))
+    wall = time.perf_counter() - wall
+
+    results.append(single("turn/first", first_turn, "ms"))
+    if turn_times:
+        results.append(summarize("turn", turn_times, unit="ms"))
+    results.append(single("turn/throughput", options.turns * options.threads / wall, "turns/s", better="higher"))
+    for name, samples in sorted(timer.samples.items()):
+        results.append(summarize(f"tool/{name}", samples))
+    await get_session_pool().close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20, help="turns per conversation")
+    parser.add_argument("--threads", type=int, default=1, help="conversations run concurrently")
+    parser.add_argument("--mcp-config", help="JSON file with an mcp config to use instead of the default one")
+    parser.add_argument("--checkpoint-db", default="memory", help="checkpoint database path (default: in memory)")
+    parser.add_argument("--output", help="where to write the JSON results")
+    options = parser.parse_args()
+
+    # Set before the agent is imported, since it reads them at import time
+    os.environ["CALENDAR_DB_PATH"] = "memory"
+    os.environ["TASK_DB_PATH"] = "memory"
+    os.environ["CHECKPOINT_DB_PATH"] = options.checkpoint_db
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+    # chat_node logs its config every turn; keep that out of the results
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        results = asyncio.run(run(options))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print_results(results)
+    run_options = {
+        "turns": options.turns, "threads": options.threads, "mcp_config": options.mcp_config,
+        "checkpoint_db": options.checkpoint_db, "streaming": os.environ.get("CHAT_STREAMING", "true"),
+    }
+    path = write_results("turn", results, run_options, options.output)
+    print(f"results written to {path}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
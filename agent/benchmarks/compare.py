@@ -0,0 +1,57 @@
+"""Compare two benchmark result files, e.g. from before and after a change.
+
+Run from the agent directory:
+
+    python benchmarks/compare.py baseline.json candidate.json [--threshold 1.2]
+
+Prints every metric both runs have with its ratio, and exits non-zero if any
+got worse by more than --threshold times (slower for times, lower for
+throughputs).
+"""
+
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path) as f:
+        document = json.load(f)
+    return document, {result["name"]: result for result in document["results"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2, help="worst acceptable slowdown factor")
+    options = parser.parse_args()
+
+    baseline_run, baseline = load(options.baseline)
+    candidate_run, candidate = load(options.candidate)
+    if baseline_run["benchmark"] != candidate_run["benchmark"]:
+        sys.exit(f"can't compare a '{baseline_run['benchmark']}' run with a '{candidate_run['benchmark']}' run")
+    print(f"baseline  {baseline_run['environment'].get('commit')}  {baseline_run['environment'].get('timestamp')}")
+    print(f"candidate {candidate_run['environment'].get('commit')}  {candidate_run['environment'].get('timestamp')}")
+
+    names = [name for name in baseline if name in candidate]
+    width = max((len(name) for name in names), default=0)
+    regressions = []
+    for name in names:
+        old, new = baseline[name], candidate[name]
+        if not old["value"] or not new["value"]:
+            continue
+        # Above 1 means worse, whichever direction the metric improves in
+        slowdown = new["value"] / old["value"] if old.get("better", "lower") == "lower" else old["value"] / new["value"]
+        flag = ""
+        if slowdown > options.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif slowdown < 1 / options.threshold:
+            flag = "  improved"
+        print(f"{name:<{width}}  {old['value']:>12,.1f} -> {new['value']:>12,.1f} {new['unit']:<9} {slowdown:6.2f}x{flag}")
+
+    for name in sorted(set(baseline) ^ set(candidate)):
+        print(f"{name:<{width}}  only in {'baseline' if name in baseline else 'candidate'}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Shared timing and JSON result helpers for the benchmark scripts.
+
+Every benchmark writes one JSON document:
+
+    {
+      "benchmark": "handlers",
+      "environment": {"commit": "...", "python": "...", ...},
+      "options": {...},
+      "results": [
+        {"name": "tasks/100000/get_tasks", "unit": "us", "value": 812.4,
+         "min": 790.1, "p95": 850.0, "runs": 40, "better": "lower"},
+        ...
+      ]
+    }
+
+`value` is the median, and `better` says which direction is an improvement,
+so compare.py can diff two runs without knowing what each metric means.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def environment() -> Dict[str, Any]:
+    """Where the numbers came from, so runs on different commits or machines can be told apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def summarize(name: str, samples: List[float], unit: str = "us", better: str = "lower", **extra: Any) -> Dict[str, Any]:
+    """A result entry for a list of measurements."""
+    ordered = sorted(samples)
+    return {
+        "name": name,
+        "unit": unit,
+        "value": round(statistics.median(ordered), 3),
+        "min": round(ordered[0], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "runs": len(ordered),
+        "better": better,
+        **extra,
+    }
+
+def single(name: str, value: float, unit: str, better: str = "lower", **extra: Any) -> Dict[str, Any]:
+    """A result entry for a one-off measurement such as a load time or a throughput."""
+    return {"name": name, "unit": unit, "value": round(value, 3), "runs": 1, "better": better, **extra}
+
+def measure(
+    run: Callable[[], Any],
+    min_time: float = 0.5,
+    min_runs: int = 3,
+    max_runs: int = 200,
+    setup: Optional[Callable[[], Any]] = None,
+) -> List[float]:
+    """Microseconds per call of `run`, repeated until `min_time` has passed or `max_runs` were made.
+
+    `setup`, if given, runs untimed before every call (e.g. to recreate a
+    record the call deletes).
+    """
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+def write_results(benchmark: str, results: List[Dict[str, Any]], options: Dict[str, Any], output: Optional[str]) -> str:
+    """Write the run to `output` (default benchmarks/results/<benchmark>.json) and return the path."""
+    path = output or os.path.join(RESULTS_DIR, f"{benchmark}.json")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    document = {"benchmark": benchmark, "environment": environment(), "options": options, "results": results}
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    return path
+
+def print_results(results: List[Dict[str, Any]], file=sys.stdout) -> None:
+    width = max((len(result["name"]) for result in results), default=0)
+    for result in results:
+        spread = f"   min {result['min']:>12,.1f}   p95 {result['p95']:>12,.1f}" if "min" in result else ""
+        print(f"{result['name']:<{width}}  {result['value']:>12,.1f} {result['unit']:<6}{spread}", file=file)
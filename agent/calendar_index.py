@@ -0,0 +1,345 @@
+import bisect
+import heapq
+import itertools
+import math
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from interval_tree import IntervalTree
+from text_index import TextIndex
+
+# How far past the start of an open-ended query unbounded series are expanded
+RECURRENCE_HORIZON = timedelta(days=366)
+
+# Text search() matches, and how much a token in each field counts
+TEXT_FIELDS = {
+    "title": (lambda event: event.title, 3.0),
+    "attendees": (lambda event: event.attendees, 1.5),
+    "location": (lambda event: event.location, 1.5),
+    "description": (lambda event: event.description, 1.0),
+}
+
+class EventIndex:
+    """In-memory calendar store ordered by event start time.
+
+    Events are kept in a start-ordered array (ties broken by insertion order)
+    alongside an id map, so date-range and per-day lookups bisect into the
+    array and cost O(log n + k) instead of a scan over every event. Interval
+    trees over the whole calendar and per attendee answer overlap queries,
+    such as conflict checks, in O(log n + k) as well, and a full-text index
+    over TEXT_FIELDS backs `search()`.
+
+    Recurring events (those with a `recurrence` rule) are stored once, as a
+    series, and expanded into occurrences (`event.occurrence(start)`) only
+    within the window being queried. Occurrences sort among single events by
+    start time, then by the series' insertion order.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, Any] = {}
+        # Sorted (start_time, seq, id) keys
+        self._order: List[Tuple[datetime, int, str]] = []
+        self._keys: Dict[str, Tuple[datetime, int, str]] = {}
+        self._seq = 0
+        # Sorted (start_time, seq, id) keys of recurring series, and when each one's last occurrence starts
+        self._series_order: List[Tuple[datetime, int, str]] = []
+        self._series_last: Dict[str, Optional[datetime]] = {}
+        # Interval trees of single events for overlap queries, across the calendar and per attendee,
+        # and the (end_time, attendees) each event was entered into them with
+        self._tree = IntervalTree()
+        self._attendee_trees: Dict[str, IntervalTree] = {}
+        self._tree_entries: Dict[str, Tuple[datetime, Tuple[str, ...]]] = {}
+        self._text = TextIndex(TEXT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self._by_id[key[2]] for key in heapq.merge(self._order, self._series_order))
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._by_id
+
+    def get(self, event_id: str) -> Optional[Any]:
+        return self._by_id.get(event_id)
+
+    @staticmethod
+    def _attendees(event: Any) -> Tuple[str, ...]:
+        return tuple({attendee for attendee in event.attendees if isinstance(attendee, str)})
+
+    def _tree_add(self, event: Any, key: Tuple[datetime, int, str]) -> None:
+        attendees = self._attendees(event)
+        entry = (key[:2], event)
+        self._tree.insert(key, event.start_time, event.end_time, entry)
+        for attendee in attendees:
+            tree = self._attendee_trees.get(attendee)
+            if tree is None:
+                tree = self._attendee_trees[attendee] = IntervalTree()
+            tree.insert(key, event.start_time, event.end_time, entry)
+        self._tree_entries[event.id] = (event.end_time, attendees)
+
+    def _tree_discard(self, event_id: str, key: Tuple[datetime, int, str]) -> None:
+        _, attendees = self._tree_entries.pop(event_id)
+        self._tree.remove(key)
+        for attendee in attendees:
+            tree = self._attendee_trees[attendee]
+            tree.remove(key)
+            if not len(tree):
+                del self._attendee_trees[attendee]
+
+    def _insert_key(self, event: Any, seq: int) -> None:
+        key = (event.start_time, seq, event.id)
+        if getattr(event, "recurrence", None) is not None:
+            bisect.insort(self._series_order, key)
+            self._series_last[event.id] = event.recurrence.last_start(event.start_time)
+        else:
+            bisect.insort(self._order, key)
+            self._tree_add(event, key)
+        self._keys[event.id] = key
+
+    def _remove_key(self, event_id: str) -> int:
+        key = self._keys.pop(event_id)
+        if event_id in self._series_last:
+            del self._series_last[event_id]
+            order = self._series_order
+        else:
+            order = self._order
+            self._tree_discard(event_id, key)
+        index = bisect.bisect_left(order, key)
+        del order[index]
+        return key[1]
+
+    def add(self, event: Any) -> None:
+        """Add an event to the store."""
+        if event.id in self._by_id:
+            raise ValueError(f"Event with ID {event.id} already exists")
+        self._seq += 1
+        self._by_id[event.id] = event
+        self._insert_key(event, self._seq)
+        self._text.add(event.id, event)
+
+    def extend(self, events: List[Any]) -> None:
+        """Add many events at once, sorting the index once instead of per insert."""
+        added = []
+        for event in events:
+            if event.id in self._by_id:
+                raise ValueError(f"Event with ID {event.id} already exists")
+            self._seq += 1
+            self._by_id[event.id] = event
+            if getattr(event, "recurrence", None) is not None:
+                self._insert_key(event, self._seq)
+                continue
+            key = (event.start_time, self._seq, event.id)
+            self._order.append(key)
+            self._keys[event.id] = key
+            added.append((event, key))
+        self._order.sort()
+        self._text.extend((event.id, event) for event in events)
+
+        if len(self._tree) or len(added) < 2:
+            for event, key in added:
+                self._tree_add(event, key)
+            return
+        # Loading into empty trees: build them balanced in one pass each
+        by_attendee: Dict[str, List[Tuple[Any, ...]]] = {}
+        items = []
+        for event, key in added:
+            attendees = self._attendees(event)
+            item = (key, event.start_time, event.end_time, (key[:2], event))
+            items.append(item)
+            for attendee in attendees:
+                by_attendee.setdefault(attendee, []).append(item)
+            self._tree_entries[event.id] = (event.end_time, attendees)
+        self._tree = IntervalTree(items)
+        for attendee, attendee_items in by_attendee.items():
+            self._attendee_trees[attendee] = IntervalTree(attendee_items)
+
+    def remove(self, event_id: str) -> Optional[Any]:
+        """Remove an event by id, returning it (or None if it doesn't exist)."""
+        event = self._by_id.pop(event_id, None)
+        if event is not None:
+            self._remove_key(event_id)
+            self._text.remove(event_id)
+        return event
+
+    def _retree(self, event: Any) -> None:
+        """Refresh the interval trees after an event's end time or attendees changed."""
+        if self._tree_entries[event.id] != (event.end_time, self._attendees(event)):
+            key = self._keys[event.id]
+            self._tree_discard(event.id, key)
+            self._tree_add(event, key)
+
+    def reindex(self, event: Any) -> None:
+        """Refresh an event's position and secondary indexes after it was changed in place."""
+        self._text.add(event.id, event)
+        self._reposition(event)
+
+    def _reposition(self, event: Any) -> None:
+        if (
+            self._keys[event.id][0] != event.start_time
+            or event.id in self._series_last
+            or getattr(event, "recurrence", None) is not None
+        ):
+            seq = self._remove_key(event.id)
+            self._insert_key(event, seq)
+        else:
+            self._retree(event)
+
+    def remove_many(self, event_ids: List[str]) -> List[Any]:
+        """Remove many events, filtering the order once instead of per removal."""
+        removed = [self._by_id.pop(event_id) for event_id in event_ids if event_id in self._by_id]
+        for event in removed:
+            self._text.remove(event.id)
+        if len(removed) * 16 < len(self._order):
+            for event in removed:
+                self._remove_key(event.id)
+        else:
+            for event in removed:
+                if event.id in self._series_last:
+                    self._remove_key(event.id)
+                else:
+                    self._tree_discard(event.id, self._keys.pop(event.id))
+            self._order = [key for key in self._order if key[2] in self._keys]
+        return removed
+
+    def reindex_many(self, events: List[Any]) -> None:
+        """Refresh many events changed in place, sorting the start order at most once."""
+        self._text.extend((event.id, event) for event in events)
+        moved = {}
+        for event in events:
+            if event.id in self._series_last or getattr(event, "recurrence", None) is not None:
+                self._reposition(event)
+            elif self._keys[event.id][0] != event.start_time:
+                moved[event.id] = event
+            else:
+                self._retree(event)
+        if len(moved) * 16 < len(self._order):
+            for event in moved.values():
+                self._reposition(event)
+            return
+        self._order = [key for key in self._order if key[2] not in moved]
+        for event in moved.values():
+            old_key = self._keys[event.id]
+            self._tree_discard(event.id, old_key)
+            key = (event.start_time, old_key[1], event.id)
+            self._order.append(key)
+            self._keys[event.id] = key
+            self._tree_add(event, key)
+        self._order.sort()
+
+    def _range(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+        lo = bisect.bisect_left(self._order, (start,)) if start is not None else 0
+        hi = bisect.bisect_right(self._order, (end, math.inf)) if end is not None else len(self._order)
+        return lo, max(lo, hi)
+
+    def _expand(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        span: bool = False,
+        attendee: Optional[str] = None,
+    ) -> List[Iterator[Tuple[Tuple[datetime, int], Any]]]:
+        """Per-series generators of ((start_time, seq), occurrence) starting within [start, end].
+
+        With `span`, occurrences that started earlier but are still running at
+        `start` are included too; with `attendee`, only series they attend.
+        """
+        hi = bisect.bisect_right(self._series_order, (end, math.inf)) if end is not None else len(self._series_order)
+        expansions = []
+        for first, seq, event_id in self._series_order[:hi]:
+            event = self._by_id[event_id]
+            if attendee is not None and attendee not in event.attendees:
+                continue
+            length = event.end_time - event.start_time if span else timedelta(0)
+            last = self._series_last[event_id]
+            if start is not None and last is not None and last + length < start:
+                continue
+            window_end = end if end is not None else max(start or first, first) + RECURRENCE_HORIZON
+            moments = event.recurrence.occurrences(first, start - length if start is not None else None, window_end)
+            expansions.append(self._occurrences(event, seq, moments))
+        return expansions
+
+    @staticmethod
+    def _occurrences(event: Any, seq: int, moments: Iterable[datetime]) -> Iterator[Tuple[Tuple[datetime, int], Any]]:
+        # A generator function binds `event` and `seq` per series; a generator
+        # expression in _expand's loop would see only the last series'
+        for moment in moments:
+            yield (moment, seq), event.occurrence(moment)
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Any]:
+        """Events and occurrences starting within [start, end], both bounds inclusive and optional.
+
+        `after` is a `sort_key()` to resume from: only events ordered after it
+        are returned, at most `limit` of them. Open-ended queries include
+        unbounded series for up to RECURRENCE_HORIZON past their start.
+        """
+        lo, hi = self._range(start, end)
+        if after is not None:
+            # Keys are (start_time, seq, id), so (start_time, seq + 1) sorts right after `after`
+            lo = max(lo, bisect.bisect_left(self._order, (after[0], after[1] + 1)))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        if not self._series_order:
+            return [self._by_id[key[2]] for key in self._order[lo:hi]]
+
+        singles = (((key[0], key[1]), self._by_id[key[2]]) for key in self._order[lo:hi])
+        window_start = start
+        if after is not None and (window_start is None or after[0] > window_start):
+            window_start = after[0]
+        merged: Iterable[Tuple[Tuple[datetime, int], Any]] = heapq.merge(
+            singles, *self._expand(window_start, end), key=itemgetter(0)
+        )
+        if after is not None:
+            merged = itertools.dropwhile(lambda item: item[0] <= after, merged)
+        return [event for _, event in itertools.islice(merged, limit)]
+
+    def count_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        """Number of events `between()` would return; O(log n) plus the occurrences in the window."""
+        lo, hi = self._range(start, end)
+        return hi - lo + sum(sum(1 for _ in expansion) for expansion in self._expand(start, end))
+
+    def sort_key(self, event: Any) -> Tuple[datetime, int]:
+        """Position of an event or occurrence in the start order, usable as `between(after=...)`."""
+        series_id = getattr(event, "series_id", None)
+        if series_id is not None:
+            return event.start_time, self._keys[series_id][1]
+        return self._keys[event.id][:2]
+
+    def overlapping(self, start: datetime, end: datetime, attendee: Optional[str] = None) -> List[Any]:
+        """Events and occurrences that overlap [start, end), in start order.
+
+        With `attendee`, only events they attend. Single events come from an
+        interval tree in O(log n + k); recurring series are expanded over the window.
+        """
+        tree = self._tree if attendee is None else self._attendee_trees.get(attendee)
+        singles = tree.overlapping(start, end) if tree is not None else []
+        expansions = self._expand(start, end, span=True, attendee=attendee)
+        if not expansions:
+            return [event for _, event in singles]
+        merged = heapq.merge(singles, *expansions, key=itemgetter(0))
+        return [event for _, event in merged if event.end_time > start and event.start_time < end]
+
+    def search(
+        self, query: str, limit: int = 10, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> List[Tuple[float, Any]]:
+        """Top `limit` (score, event) full-text matches for `query`, best first.
+
+        With `start`/`end`, only events (or series) with an occurrence starting
+        in that range are ranked; recurring events match as their series.
+        """
+        candidates = None
+        if start is not None or end is not None:
+            candidates = {getattr(event, "series_id", None) or event.id for event in self.between(start, end)}
+        hits = self._text.search(query, limit, candidates=candidates)
+        return [(score, self._by_id[event_id]) for score, event_id in hits]
+
+    def starting_on(self, day: datetime) -> List[Any]:
+        """Events and occurrences starting on the given calendar day, in start order."""
+        day_start = datetime(day.year, day.month, day.day)
+        return self.between(day_start, day_start + timedelta(days=1) - timedelta(microseconds=1))
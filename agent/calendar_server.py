@@ -1,13 +1,51 @@
 import json
+import os
 import sys
 from datetime import datetime, timedelta
-import re
-from typing import Dict, List, Optional, Any, Union
+import heapq
+import itertools
+from typing import Dict, List, Optional, Any, Tuple, Union
+from zoneinfo import ZoneInfo
+from calendar_index import EventIndex
+from storage import open_backend
+from tenants import Partitions, tenant_db_path
+from datetime_parsing import parse_event_datetime as parse_datetime
+from jsonl_server import JSONFragments, object_schema, serve
+from pagination import MAX_LIMIT, decode_cursor, encode_cursor, page_arguments, parse_fields, parse_flag, parse_limit
+from recurrence import FREQUENCIES, WEEKDAYS, RecurrenceRule
+from scheduling import RANKINGS, find_slots, intersect, merge_intervals, overlapping_pairs, parse_working_hours, working_windows
 
-# Simple in-memory calendar database for demonstration
-calendar_events = []
+# Events are persisted to a local SQLite database so they survive restarts;
+# set CALENDAR_DB_PATH=memory to keep them in memory only. Tenants other than
+# the default one get a database file each, next to this one
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "calendar.db")
+DB_PATH = os.environ.get("CALENDAR_DB_PATH", DEFAULT_DB_PATH)
+
+# Occurrence ids are "<series id>@<occurrence start>", e.g. "event_3@2025-03-03T10:00:00"
+OCCURRENCE_SEPARATOR = "@"
+
+# How far ahead a new or changed recurring event is checked for conflicts
+SERIES_CONFLICT_WINDOW = timedelta(weeks=4)
+
+# Fields that describe each conflicting event
+CONFLICT_FIELDS = ["id", "title", "start_time", "end_time", "attendees"]
+
+# Longest date range find_available_slots will search
+MAX_SLOT_SEARCH_DAYS = 92
+
+# Matches search_events returns when no limit is given
+DEFAULT_SEARCH_LIMIT = 10
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
 
 class CalendarEvent:
+    # Slots keep each event compact; _json caches the encoded event until the next update()
+    __slots__ = (
+        "id", "title", "start_time", "end_time", "attendees", "location", "description",
+        "recurrence", "series_id", "_json"
+    )
+
     def __init__(
         self,
         title: str,
@@ -16,18 +54,53 @@ class CalendarEvent:
         attendees: List[str] = None,
         location: str = None,
         description: str = None,
-        id: str = None
+        id: str = None,
+        recurrence: RecurrenceRule = None,
+        series_id: str = None
     ):
-        self.id = id or f"event_{len(calendar_events) + 1}"
+        self.id = id
         self.title = title
         self.start_time = start_time
         self.end_time = end_time
-        self.attendees = attendees or []
-        self.location = location
+        # Attendees and locations repeat across events, so share one copy of each
+        self.attendees = [_intern(attendee) for attendee in attendees] if attendees else []
+        self.location = _intern(location)
         self.description = description
+        # Recurring events are stored once and expanded into occurrences on demand
+        self.recurrence = recurrence
+        # Occurrences point back at the recurring event they were expanded from
+        self.series_id = series_id
+        self._json = None
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Apply field changes and drop the cached encoding."""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._json = None
+
+    def to_json(self) -> str:
+        """The event encoded as JSON, cached until it's next updated."""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict())
+        return self._json
+
+    def occurrence(self, start_time: datetime) -> "CalendarEvent":
+        """The occurrence of this recurring event that starts at `start_time`."""
+        return CalendarEvent(
+            title=self.title,
+            start_time=start_time,
+            end_time=start_time + (self.end_time - self.start_time),
+            attendees=self.attendees,
+            location=self.location,
+            description=self.description,
+            id=f"{self.id}{OCCURRENCE_SEPARATOR}{start_time.isoformat()}",
+            series_id=self.id
+        )
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if fields is not None:
+            return {name: EVENT_FIELDS[name](self) for name in fields}
+        event = {
             "id": self.id,
             "title": self.title,
             "start_time": self.start_time.isoformat(),
@@ -36,93 +109,149 @@ class CalendarEvent:
             "location": self.location,
             "description": self.description
         }
+        if self.recurrence is not None:
+            event["recurrence"] = self.recurrence.to_dict()
+        if self.series_id is not None:
+            event["series_id"] = self.series_id
+        return event
 
-def parse_datetime(datetime_str: str) -> datetime:
-    """Parse a datetime string into a datetime object."""
-    formats = [
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d",
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(datetime_str, fmt)
-        except ValueError:
-            continue
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CalendarEvent":
+        return cls(
+            title=data["title"],
+            start_time=datetime.fromisoformat(data["start_time"]),
+            end_time=datetime.fromisoformat(data["end_time"]),
+            attendees=data.get("attendees"),
+            location=data.get("location"),
+            description=data.get("description"),
+            id=data["id"],
+            recurrence=RecurrenceRule.parse(data["recurrence"], parse_datetime) if data.get("recurrence") else None
+        )
+
+# Serializer per to_dict() field, used for field projections
+EVENT_FIELDS = {
+    "id": lambda e: e.id,
+    "title": lambda e: e.title,
+    "start_time": lambda e: e.start_time.isoformat(),
+    "end_time": lambda e: e.end_time.isoformat(),
+    "attendees": lambda e: e.attendees,
+    "location": lambda e: e.location,
+    "description": lambda e: e.description,
+    "recurrence": lambda e: e.recurrence.to_dict() if e.recurrence else None,
+    "series_id": lambda e: e.series_id,
+}
+
+class CalendarPartition:
+    """One tenant's events: an in-memory index ordered by start time, and its own storage."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.events = EventIndex()
+        self.storage = open_backend(tenant_db_path(DB_PATH, tenant_id), table="events")
+        self.load()
+
+    def load(self) -> None:
+        """Rebuild the in-memory index from storage."""
+        events = [CalendarEvent.from_dict(record) for record in self.storage.load()]
+        self.events.extend(events)
+        
+        # Ids stay unique after deletions, unlike numbering by the current event count.
+        # Each tenant numbers its own events, so ids are only unique within a tenant
+        numbers = [int(e.id[len("event_"):]) for e in events if e.id.startswith("event_") and e.id[len("event_"):].isdigit()]
+        self._event_ids = itertools.count(max(numbers, default=0) + 1)
+
+    def new_event_id(self) -> str:
+        return f"event_{next(self._event_ids)}"
+
+# Partitions are loaded on a tenant's first request, so a process only holds the tenants it serves
+partitions = Partitions(CalendarPartition)
+
+def build_event(store: CalendarPartition, args: Dict[str, Any]) -> CalendarEvent:
+    """Validate create arguments and build the event, without storing it."""
+    title = args.get("title", "Untitled Event")
     
-    # Natural language parsing
-    current_time = datetime.now()
-    # Default to 2025 instead of current year
-    default_year = 2025
-    today = datetime(default_year, current_time.month, current_time.day).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Default to current date in 2025 if no start_time provided
+    if not args.get("start_time", ""):
+        current_date = datetime.now()
+        default_date = datetime(2025, current_date.month, current_date.day, 9, 0)
+        args["start_time"] = default_date.strftime("%Y-%m-%d %H:%M")
+        
+    start_time = parse_datetime(args.get("start_time", ""))
     
-    if "today" in datetime_str.lower():
-        base_date = today
-    elif "tomorrow" in datetime_str.lower():
-        base_date = today + timedelta(days=1)
+    # If end_time is provided, parse it, otherwise default to 1 hour after start_time
+    if "end_time" in args and args["end_time"]:
+        end_time = parse_datetime(args["end_time"])
     else:
-        # Default to today in 2025 if no specific date is given
-        base_date = today
-    
-    # Extract time if provided
-    time_match = re.search(r'(\d{1,2}):(\d{2})(?:\s*(am|pm))?', datetime_str, re.IGNORECASE)
-    if time_match:
-        hour = int(time_match.group(1))
-        minute = int(time_match.group(2))
-        am_pm = time_match.group(3)
+        end_time = start_time + timedelta(hours=1)
         
-        if am_pm and am_pm.lower() == 'pm' and hour < 12:
-            hour += 12
-        elif am_pm and am_pm.lower() == 'am' and hour == 12:
-            hour = 0
-            
-        return base_date.replace(hour=hour, minute=minute)
+    attendees = args.get("attendees", [])
+    if isinstance(attendees, str):
+        attendees = [att.strip() for att in attendees.split(",")]
+    
+    recurrence = args.get("recurrence")
     
-    # If no time is provided, default to 9 AM for start times
-    return base_date.replace(hour=9, minute=0)
+    return CalendarEvent(
+        title=title,
+        start_time=start_time,
+        end_time=end_time,
+        attendees=attendees,
+        location=args.get("location"),
+        description=args.get("description"),
+        id=store.new_event_id(),
+        recurrence=RecurrenceRule.parse(recurrence, parse_datetime) if recurrence else None
+    )
 
-def create_event(args: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a new calendar event."""
-    title = args.get("title", "Untitled Event")
+def prepare_event_update(event: CalendarEvent, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate update arguments into the attribute changes to apply to an event."""
+    changes = {}
     
-    try:
-        # Default to current date in 2025 if no start_time provided
-        if not args.get("start_time", ""):
-            current_date = datetime.now()
-            default_date = datetime(2025, current_date.month, current_date.day, 9, 0)
-            args["start_time"] = default_date.strftime("%Y-%m-%d %H:%M")
-            
-        start_time = parse_datetime(args.get("start_time", ""))
+    if "title" in args:
+        changes["title"] = args["title"]
         
-        # If end_time is provided, parse it, otherwise default to 1 hour after start_time
-        if "end_time" in args and args["end_time"]:
-            end_time = parse_datetime(args["end_time"])
-        else:
-            end_time = start_time + timedelta(hours=1)
-            
-        attendees = args.get("attendees", [])
+    if "start_time" in args:
+        changes["start_time"] = parse_datetime(args["start_time"])
+        
+    if "end_time" in args:
+        changes["end_time"] = parse_datetime(args["end_time"])
+        
+    if "attendees" in args:
+        attendees = args["attendees"]
         if isinstance(attendees, str):
             attendees = [att.strip() for att in attendees.split(",")]
+        changes["attendees"] = attendees
         
-        event = CalendarEvent(
-            title=title,
-            start_time=start_time,
-            end_time=end_time,
-            attendees=attendees,
-            location=args.get("location"),
-            description=args.get("description")
-        )
+    if "location" in args:
+        changes["location"] = args["location"]
         
-        calendar_events.append(event)
-        return {"status": "success", "event": event.to_dict()}
+    if "description" in args:
+        changes["description"] = args["description"]
+        
+    if "recurrence" in args:
+        # An empty recurrence turns a series back into a single event
+        recurrence = args["recurrence"]
+        changes["recurrence"] = RecurrenceRule.parse(recurrence, parse_datetime) if recurrence else None
+        
+    return changes
+
+def create_event(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a new calendar event."""
+    try:
+        store = partitions.for_args(args)
+        event = build_event(store, args)
+        store.events.add(event)
+        store.storage.put(event.id, event.to_json())
+        return {"status": "success", "event": event.to_dict(), "conflicts": conflict_summaries(store.events, event)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def get_events(args: Dict[str, Any]) -> Dict[str, Any]:
-    """Get calendar events, optionally filtered by date range."""
+    """Get calendar events, optionally filtered by date range.
+    
+    Supports `limit`/`cursor` pagination (the response carries `next_cursor`
+    while more events remain), a `fields` projection and `count_only`.
+    """
     try:
+        store = partitions.for_args(args)
         start_date_str = args.get("start_date")
         end_date_str = args.get("end_date")
         
@@ -131,22 +260,55 @@ def get_events(args: Dict[str, Any]) -> Dict[str, Any]:
             current_date = datetime.now()
             start_date = datetime(2025, 1, 1)
             end_date = datetime(2025, 12, 31, 23, 59, 59)
-            filtered_events = [e for e in calendar_events 
-                              if e.start_time >= start_date and e.start_time <= end_date]
         else:
-            filtered_events = calendar_events
+            start_date = parse_datetime(start_date_str) if start_date_str else None
+            end_date = parse_datetime(end_date_str) if end_date_str else None
             
-            if start_date_str:
-                start_date = parse_datetime(start_date_str)
-                filtered_events = [e for e in filtered_events if e.start_time >= start_date]
-                
-            if end_date_str:
-                end_date = parse_datetime(end_date_str)
-                filtered_events = [e for e in filtered_events if e.start_time <= end_date]
+        if parse_flag(args.get("count_only")):
+            return {"status": "success", "count": store.events.count_between(start_date, end_date)}
             
-        return {
+        limit = parse_limit(args)
+        fields = parse_fields(args, EVENT_FIELDS)
+        after = decode_cursor(args["cursor"], "events") if args.get("cursor") else None
+        
+        # Fetch one extra event to tell whether there's another page
+        filtered_events = store.events.between(
+            start_date, end_date, after=after, limit=limit + 1 if limit is not None else None
+        )
+        page = filtered_events[:limit] if limit is not None else filtered_events
+            
+        response = {
             "status": "success", 
-            "events": [event.to_dict() for event in filtered_events]
+            "events": [event.to_dict(fields) for event in page] if fields is not None
+                      else JSONFragments(event.to_json() for event in page)
+        }
+        if limit is not None and len(filtered_events) > limit:
+            response["next_cursor"] = encode_cursor("events", store.events.sort_key(page[-1]))
+        return response
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def search_events(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Full-text search over event titles, attendees, locations and descriptions.
+    
+    Returns the best `limit` matches (default 10), best first, each with its
+    relevance `score`. `start_date`/`end_date` restrict the search to events
+    occurring in that range; recurring events match as their series.
+    """
+    try:
+        store = partitions.for_args(args)
+        query = args.get("query")
+        if not query or not isinstance(query, str):
+            return {"status": "error", "message": "Search query is required"}
+            
+        start_date = parse_datetime(args["start_date"]) if args.get("start_date") else None
+        end_date = parse_datetime(args["end_date"]) if args.get("end_date") else None
+        limit = parse_limit(args) or DEFAULT_SEARCH_LIMIT
+        fields = parse_fields(args, EVENT_FIELDS)
+        hits = store.events.search(query, limit, start_date, end_date)
+        return {
+            "status": "success",
+            "events": [{**event.to_dict(fields), "score": round(score, 4)} for score, event in hits]
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -154,132 +316,401 @@ def get_events(args: Dict[str, Any]) -> Dict[str, Any]:
 def update_event(args: Dict[str, Any]) -> Dict[str, Any]:
     """Update an existing calendar event."""
     try:
+        store = partitions.for_args(args)
         event_id = args.get("id")
         if not event_id:
             return {"status": "error", "message": "Event ID is required"}
             
-        event = next((e for e in calendar_events if e.id == event_id), None)
+        event = store.events.get(event_id)
         if not event:
             return {"status": "error", "message": f"Event with ID {event_id} not found"}
             
-        if "title" in args:
-            event.title = args["title"]
-            
-        if "start_time" in args:
-            event.start_time = parse_datetime(args["start_time"])
-            
-        if "end_time" in args:
-            event.end_time = parse_datetime(args["end_time"])
-            
-        if "attendees" in args:
-            attendees = args["attendees"]
-            if isinstance(attendees, str):
-                attendees = [att.strip() for att in attendees.split(",")]
-            event.attendees = attendees
+        # Validate everything up front so a bad value can't leave the event half-updated
+        changes = prepare_event_update(event, args)
+        event.update(changes)
+        store.events.reindex(event)
             
-        if "location" in args:
-            event.location = args["location"]
-            
-        if "description" in args:
-            event.description = args["description"]
-            
-        return {"status": "success", "event": event.to_dict()}
+        store.storage.put(event.id, event.to_json())
+        return {"status": "success", "event": event.to_dict(), "conflicts": conflict_summaries(store.events, event)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def delete_event(args: Dict[str, Any]) -> Dict[str, Any]:
     """Delete a calendar event."""
     try:
+        store = partitions.for_args(args)
         event_id = args.get("id")
         if not event_id:
             return {"status": "error", "message": "Event ID is required"}
             
-        event_index = next((i for i, e in enumerate(calendar_events) if e.id == event_id), None)
-        if event_index is None:
+        if event_id not in store.events and OCCURRENCE_SEPARATOR in str(event_id):
+            return delete_occurrence(store, event_id)
+            
+        deleted_event = store.events.remove(event_id)
+        if deleted_event is None:
             return {"status": "error", "message": f"Event with ID {event_id} not found"}
             
-        deleted_event = calendar_events.pop(event_index)
+        store.storage.delete(event_id)
         return {"status": "success", "deleted_event": deleted_event.to_dict()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def find_occurrence(store: CalendarPartition, occurrence_id: str) -> Optional[Tuple[CalendarEvent, datetime]]:
+    """The series and start time of an occurrence ID, or None if the series has no such occurrence."""
+    series_id, _, start = occurrence_id.rpartition(OCCURRENCE_SEPARATOR)
+    series = store.events.get(series_id)
+    if series is None or series.recurrence is None:
+        return None
+    try:
+        start_time = parse_datetime(start)
+    except ValueError:
+        return None
+    if next(series.recurrence.occurrences(series.start_time, start_time, start_time), None) != start_time:
+        return None
+    return series, start_time
+
+def delete_occurrence(store: CalendarPartition, occurrence_id: str) -> Dict[str, Any]:
+    """Cancel one occurrence of a recurring event by adding it to the series' exceptions."""
+    occurrence = find_occurrence(store, occurrence_id)
+    if occurrence is None:
+        return {"status": "error", "message": f"Event with ID {occurrence_id} not found"}
+        
+    series, start_time = occurrence
+    deleted_event = series.occurrence(start_time)
+    series.update({"recurrence": series.recurrence.with_exception(start_time)})
+    store.events.reindex(series)
+    store.storage.put(series.id, series.to_json())
+    return {"status": "success", "deleted_event": deleted_event.to_dict()}
+
+def event_conflicts(events: EventIndex, event: CalendarEvent) -> List[CalendarEvent]:
+    """Other events and occurrences that overlap `event`.
+    
+    A recurring event is checked over its occurrences in the first SERIES_CONFLICT_WINDOW.
+    """
+    if event.recurrence is None:
+        windows = [(event.start_time, event.end_time)]
+    else:
+        length = event.end_time - event.start_time
+        moments = event.recurrence.occurrences(
+            event.start_time, event.start_time, event.start_time + SERIES_CONFLICT_WINDOW
+        )
+        windows = [(moment, moment + length) for moment in moments]
+        
+    conflicts, seen = [], set()
+    for start, end in windows:
+        for other in events.overlapping(start, end):
+            if other.id != event.id and other.series_id != event.id and other.id not in seen:
+                seen.add(other.id)
+                conflicts.append(other)
+    return conflicts
+
+def conflict_summaries(events: EventIndex, event: CalendarEvent) -> List[Dict[str, Any]]:
+    return [other.to_dict(CONFLICT_FIELDS) for other in event_conflicts(events, event)]
+
+def _bulk_items(args: Dict[str, Any], key: str) -> List[Any]:
+    items = args.get(key)
+    if not isinstance(items, list):
+        raise ValueError(f"'{key}' must be a list")
+    return items
+
+def _bulk_error(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    failed = [r for r in results if "error" in r]
+    return {
+        "status": "error",
+        "message": f"{len(failed)} of {len(results)} items are invalid; nothing was changed",
+        "results": failed
+    }
+
+def create_events(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Create many calendar events at once; either all of them are created or none."""
+    try:
+        store = partitions.for_args(args)
+        events, results = [], []
+        for i, item in enumerate(_bulk_items(args, "events")):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Each event must be an object")
+                event = build_event(store, dict(item))
+                events.append(event)
+                results.append({"index": i, "id": event.id})
+            except Exception as e:
+                results.append({"index": i, "error": str(e)})
+        if len(events) < len(results):
+            return _bulk_error(results)
+            
+        store.events.extend(events)
+        store.storage.put_many([(event.id, event.to_json()) for event in events])
+        for result, event in zip(results, events):
+            result["conflicts"] = [other.id for other in event_conflicts(store.events, event)]
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def update_events(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Update many calendar events at once; either all of them are updated or none."""
+    try:
+        store = partitions.for_args(args)
+        updates, seen, results = [], set(), []
+        for i, item in enumerate(_bulk_items(args, "events")):
+            event_id = item.get("id") if isinstance(item, dict) else None
+            event = store.events.get(event_id) if event_id else None
+            try:
+                if not event_id:
+                    raise ValueError("Event ID is required")
+                if not event:
+                    raise ValueError(f"Event with ID {event_id} not found")
+                # Each update is validated against the event as it is now, so two can't be combined
+                if event_id in seen:
+                    raise ValueError(f"Duplicate event ID {event_id}")
+                seen.add(event_id)
+                updates.append((event, prepare_event_update(event, item)))
+                results.append({"index": i, "id": event_id})
+            except Exception as e:
+                results.append({"index": i, "error": str(e)})
+        if len(updates) < len(results):
+            return _bulk_error(results)
+            
+        for event, changes in updates:
+            event.update(changes)
+        events = [event for event, _ in updates]
+        store.events.reindex_many(events)
+        store.storage.put_many([(event.id, event.to_json()) for event in events])
+        for result, event in zip(results, events):
+            result["conflicts"] = [other.id for other in event_conflicts(store.events, event)]
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def delete_events(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Delete many calendar events at once; either all of them are deleted or none."""
+    try:
+        store = partitions.for_args(args)
+        event_ids, occurrences, seen, results = [], [], set(), []
+        for i, event_id in enumerate(_bulk_items(args, "ids")):
+            occurrence = None
+            if isinstance(event_id, str) and event_id not in store.events and OCCURRENCE_SEPARATOR in event_id:
+                occurrence = find_occurrence(store, event_id)
+            key = (occurrence[0].id, occurrence[1]) if occurrence else event_id
+            if not isinstance(event_id, str) or (event_id not in store.events and occurrence is None):
+                results.append({"index": i, "error": f"Event with ID {event_id} not found"})
+            elif key in seen:
+                results.append({"index": i, "error": f"Duplicate event ID {event_id}"})
+            else:
+                if occurrence:
+                    occurrences.append(occurrence)
+                else:
+                    event_ids.append(event_id)
+                seen.add(key)
+                results.append({"index": i, "id": event_id})
+        if len(event_ids) + len(occurrences) < len(results):
+            return _bulk_error(results)
+            
+        # Cancelled occurrences become exceptions of their series, unless the whole series goes
+        changed = {}
+        for series, start_time in occurrences:
+            if series.id not in seen:
+                series.update({"recurrence": series.recurrence.with_exception(start_time)})
+                changed[series.id] = series
+        if changed:
+            store.events.reindex_many(list(changed.values()))
+            store.storage.put_many([(series.id, series.to_json()) for series in changed.values()])
+        store.events.remove_many(event_ids)
+        store.storage.delete_many(event_ids)
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 def find_available_slots(args: Dict[str, Any]) -> Dict[str, Any]:
-    """Find available time slots based on existing calendar events."""
+    """Find free time slots across a date range, optionally for a set of attendees.
+    
+    Busy intervals of every relevant event are merged in one sweep, intersected
+    with each attendee's working hours and stepped through at `granularity_minutes`.
+    """
     try:
+        store = partitions.for_args(args)
         current_date = datetime.now()
         default_date = datetime(2025, current_date.month, current_date.day)
         date_str = args.get("date", default_date.strftime("%Y-%m-%d"))
-        duration_minutes = int(args.get("duration_minutes", 30))
+        first_day = parse_datetime(args.get("start_date", date_str)).date()
+        last_day = parse_datetime(args["end_date"]).date() if args.get("end_date") else first_day
+        if last_day < first_day:
+            raise ValueError("end_date must not be before start_date")
+        if (last_day - first_day).days >= MAX_SLOT_SEARCH_DAYS:
+            raise ValueError(f"Slot searches can span at most {MAX_SLOT_SEARCH_DAYS} days")
         
-        date = parse_datetime(date_str)
-        day_start = date.replace(hour=9, minute=0, second=0, microsecond=0)
-        day_end = date.replace(hour=17, minute=0, second=0, microsecond=0)
+        duration = timedelta(minutes=int(args.get("duration_minutes", 30)))
+        step = timedelta(minutes=int(args.get("granularity_minutes", 30)))
+        max_results = min(int(args.get("max_results", 50)), MAX_LIMIT)
         
-        # Get all events for the specified day
-        day_events = [
-            e for e in calendar_events 
-            if e.start_time.date() == date.date()
-        ]
+        attendees = args.get("attendees") or []
+        if isinstance(attendees, str):
+            attendees = [attendee.strip() for attendee in attendees.split(",") if attendee.strip()]
+        calendar_zone = ZoneInfo(args["time_zone"]) if args.get("time_zone") else None
         
-        # Sort events by start time
-        day_events.sort(key=lambda e: e.start_time)
+        # Everyone must be inside their working hours; attendees may override the shared hours
+        hours = parse_working_hours(args.get("working_hours"))
+        overrides = args.get("attendee_working_hours") or {}
+        range_start = datetime.combine(first_day, datetime.min.time())
+        range_end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+        window_lists = [[(range_start, range_end)], working_windows(hours, first_day, last_day, calendar_zone)]
+        for attendee in attendees:
+            if attendee in overrides:
+                window_lists.append(working_windows(
+                    parse_working_hours(overrides[attendee], hours), first_day, last_day, calendar_zone
+                ))
+        windows = intersect(window_lists)
         
-        # Find available slots
-        available_slots = []
-        current_time = day_start
+        # Events come out in start order, so merging them is a single sweep; with
+        # attendees, only events at least one of them attends keep the slot busy
+        if attendees:
+            busy_events = heapq.merge(
+                *(store.events.overlapping(range_start, range_end, attendee) for attendee in set(attendees)),
+                key=lambda event: event.start_time
+            )
+        else:
+            busy_events = store.events.overlapping(range_start, range_end)
+        busy = merge_intervals((event.start_time, event.end_time) for event in busy_events)
         
-        for event in day_events:
-            if current_time < event.start_time:
-                time_diff = (event.start_time - current_time).total_seconds() / 60
-                if time_diff >= duration_minutes:
-                    available_slots.append({
-                        "start_time": current_time.isoformat(),
-                        "end_time": (current_time + timedelta(minutes=duration_minutes)).isoformat()
-                    })
-            current_time = max(current_time, event.end_time)
-            
-        # Check for available slot after the last event
-        if current_time < day_end:
-            time_diff = (day_end - current_time).total_seconds() / 60
-            if time_diff >= duration_minutes:
-                available_slots.append({
-                    "start_time": current_time.isoformat(),
-                    "end_time": (current_time + timedelta(minutes=duration_minutes)).isoformat()
-                })
-                
-        return {"status": "success", "available_slots": available_slots}
+        slots = find_slots(windows, busy, duration, step, max_results, args.get("rank", "earliest"))
+        return {
+            "status": "success",
+            "available_slots": [
+                {"start_time": start.isoformat(), "end_time": end.isoformat()} for start, end in slots
+            ]
+        }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def find_conflicts(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Find every pair of overlapping events in a date range, optionally for one attendee.
+    
+    Defaults to the week starting today. Events are swept in start order, so
+    only events that actually overlap are compared.
+    """
+    try:
+        store = partitions.for_args(args)
+        current_date = datetime.now()
+        default_date = datetime(2025, current_date.month, current_date.day)
+        start_date = parse_datetime(args["start_date"]) if args.get("start_date") else default_date
+        end_date = parse_datetime(args["end_date"]) if args.get("end_date") else start_date + timedelta(days=7)
+        max_results = min(int(args.get("max_results", 100)), MAX_LIMIT)
+        
+        events = store.events.overlapping(start_date, end_date, args.get("attendee"))
+        conflicts = []
+        for first, second in overlapping_pairs(events):
+            if len(conflicts) == max_results:
+                return {"status": "success", "conflicts": conflicts, "truncated": True}
+            conflicts.append({
+                "events": [first.to_dict(CONFLICT_FIELDS), second.to_dict(CONFLICT_FIELDS)],
+                "overlap_start": max(first.start_time, second.start_time).isoformat(),
+                "overlap_end": min(first.end_time, second.end_time).isoformat()
+            })
+        return {"status": "success", "conflicts": conflicts, "truncated": False}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# Name the server's metrics are labelled with
+SERVER_NAME = "calendar"
+
 # Function dispatch table
 FUNCTIONS = {
     "create_event": create_event,
     "get_events": get_events,
+    "search_events": search_events,
     "update_event": update_event,
     "delete_event": delete_event,
     "find_available_slots": find_available_slots,
+    "find_conflicts": find_conflicts,
+    "create_events": create_events,
+    "update_events": update_events,
+    "delete_events": delete_events,
+}
+
+# Functions that modify the store; the request loop runs these one at a time
+WRITE_FUNCTIONS = {"create_event", "update_event", "delete_event", "create_events", "update_events", "delete_events"}
+
+# Argument schemas, advertised to MCP clients with each function (see sample_agent/inprocess.py)
+DATE = {"type": "string", "description": "Date or date-time, e.g. 2025-03-14 or 2025-03-14T09:30."}
+EVENT_ID = {"type": "string", "description": "Event id; an occurrence of a recurring event is <series id>@<start time>."}
+RECURRENCE = {
+    "description": 'Repeat rule, as an object or an RRULE string such as "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10".',
+    "anyOf": [
+        {"type": "string"},
+        {
+            "type": "object",
+            "properties": {
+                "frequency": {"type": "string", "enum": list(FREQUENCIES)},
+                "interval": {"type": "integer", "minimum": 1},
+                "count": {"type": "integer", "minimum": 1},
+                "until": DATE,
+                "weekdays": {"type": "array", "items": {"type": "string", "enum": list(WEEKDAYS)}},
+                "exceptions": {"type": "array", "items": DATE, "description": "Start times of cancelled occurrences."},
+            },
+            "required": ["frequency"],
+        },
+    ],
+}
+EVENT_PROPERTIES = {
+    "title": {"type": "string"},
+    "start_time": DATE,
+    "end_time": {**DATE, "description": "Date-time the event ends; an hour after start_time when omitted."},
+    "attendees": {"type": "array", "items": {"type": "string"}, "description": "Attendee emails."},
+    "location": {"type": "string"},
+    "description": {"type": "string"},
+    "recurrence": RECURRENCE,
+}
+WORKING_HOURS = {
+    "type": "object",
+    "description": "Working hours, 09:00-17:00 every day of the week unless given.",
+    "properties": {
+        "start": {"type": "string", "description": "HH:MM"},
+        "end": {"type": "string", "description": "HH:MM"},
+        "days": {"type": "array", "items": {"type": ["string", "integer"]}, "description": 'Days, as names like "mon" or 0-6 from Monday.'},
+        "time_zone": {"type": "string", "description": "IANA time zone the hours are in."},
+    },
+}
+SCHEMAS = {
+    "create_event": object_schema(EVENT_PROPERTIES),
+    "get_events": object_schema({
+        "start_date": DATE,
+        "end_date": DATE,
+        "count_only": {"type": "boolean", "description": "Only count the matching events."},
+        **page_arguments(EVENT_FIELDS),
+    }),
+    "search_events": object_schema({
+        "query": {"type": "string", "description": "Words to look for in titles, attendees, locations and descriptions."},
+        "start_date": DATE,
+        "end_date": DATE,
+        **page_arguments(EVENT_FIELDS),
+    }, ["query"]),
+    "update_event": object_schema({"id": EVENT_ID, **EVENT_PROPERTIES}, ["id"]),
+    "delete_event": object_schema({"id": EVENT_ID}, ["id"]),
+    "find_available_slots": object_schema({
+        "date": {**DATE, "description": "Day to search, when start_date isn't given."},
+        "start_date": DATE,
+        "end_date": DATE,
+        "duration_minutes": {"type": "integer", "minimum": 1, "default": 30},
+        "granularity_minutes": {"type": "integer", "minimum": 1, "default": 30},
+        "max_results": {"type": "integer", "minimum": 1, "maximum": MAX_LIMIT, "default": 50},
+        "attendees": {"type": "array", "items": {"type": "string"}, "description": "Attendees who must all be free."},
+        "time_zone": {"type": "string", "description": "IANA time zone of the calendar's times."},
+        "working_hours": WORKING_HOURS,
+        "attendee_working_hours": {"type": "object", "additionalProperties": WORKING_HOURS, "description": "Working hours per attendee email."},
+        "rank": {"type": "string", "enum": list(RANKINGS), "default": "earliest"},
+    }),
+    "find_conflicts": object_schema({
+        "start_date": DATE,
+        "end_date": DATE,
+        "attendee": {"type": "string", "description": "Only conflicts in this attendee's events."},
+        "max_results": {"type": "integer", "minimum": 1, "maximum": MAX_LIMIT, "default": 100},
+    }),
+    "create_events": object_schema({"events": {"type": "array", "items": object_schema(EVENT_PROPERTIES)}}, ["events"]),
+    "update_events": object_schema({"events": {"type": "array", "items": object_schema({"id": EVENT_ID, **EVENT_PROPERTIES}, ["id"])}}, ["events"]),
+    "delete_events": object_schema({"ids": {"type": "array", "items": EVENT_ID}}, ["ids"]),
 }
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        try:
-            request = json.loads(line)
-            function_name = request.get("function")
-            args = request.get("args", {})
-            
-            if function_name in FUNCTIONS:
-                result = FUNCTIONS[function_name](args)
-            else:
-                result = {
-                    "status": "error",
-                    "message": f"Unknown function: {function_name}"
-                }
-                
-            print(json.dumps(result))
-            sys.stdout.flush()
-        except json.JSONDecodeError:
-            print(json.dumps({"status": "error", "message": "Invalid JSON"}))
-            sys.stdout.flush()
-        except Exception as e:
-            print(json.dumps({"status": "error", "message": str(e)}))
-            sys.stdout.flush() 
\ No newline at end of file
+    serve(FUNCTIONS, WRITE_FUNCTIONS, name=SERVER_NAME)
+
+    # Commit any writes still waiting for the next group commit, in every tenant's storage
+    partitions.close()
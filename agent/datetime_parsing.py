@@ -0,0 +1,93 @@
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+# Dates the calendar resolves relative phrases against are pinned to this year
+CALENDAR_YEAR = 2025
+
+# Accepts everything the old strptime formats did ("%Y-%m-%d", "%Y-%m-%d %H:%M",
+# "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S") plus "T" without seconds and fractional seconds
+_ABSOLUTE_RE = re.compile(
+    r"(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"(?:(?:[Tt]|\s+)(\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.(\d{1,6}))?)?)?"
+)
+_KEYWORD_RE = re.compile(r"today|tomorrow|next week", re.IGNORECASE)
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})(?:\s*(am|pm))?", re.IGNORECASE)
+
+MEMO_SIZE = 4096
+
+def parse_absolute(datetime_str: str) -> Optional[datetime]:
+    """Parse an ISO-style date or datetime, or return None if the string isn't one."""
+    match = _ABSOLUTE_RE.fullmatch(datetime_str)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction = match.groups()
+    try:
+        return datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0),
+            int(fraction.ljust(6, "0")) if fraction else 0
+        )
+    except ValueError:
+        # Out of range fields (month 13, hour 25, ...) fall through to natural language
+        return None
+
+def _keywords(datetime_str: str) -> set:
+    return {keyword.lower() for keyword in _KEYWORD_RE.findall(datetime_str)}
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _event_datetime(datetime_str: str, month: int, day: int) -> datetime:
+    parsed = parse_absolute(datetime_str)
+    if parsed is not None:
+        return parsed
+
+    # Natural language, resolved against today's date in CALENDAR_YEAR
+    today = datetime(CALENDAR_YEAR, month, day)
+    keywords = _keywords(datetime_str)
+    base_date = today + timedelta(days=1) if "tomorrow" in keywords and "today" not in keywords else today
+
+    # Extract time if provided
+    time_match = _TIME_RE.search(datetime_str)
+    if time_match:
+        hour = int(time_match.group(1))
+        minute = int(time_match.group(2))
+        am_pm = time_match.group(3)
+
+        if am_pm and am_pm.lower() == "pm" and hour < 12:
+            hour += 12
+        elif am_pm and am_pm.lower() == "am" and hour == 12:
+            hour = 0
+
+        return base_date.replace(hour=hour, minute=minute)
+
+    # If no time is provided, default to 9 AM for start times
+    return base_date.replace(hour=9, minute=0)
+
+def parse_event_datetime(datetime_str: str) -> datetime:
+    """Parse a calendar datetime: ISO strings, or "today"/"tomorrow" with an optional "3:00 pm"."""
+    now = datetime.now()
+    return _event_datetime(datetime_str, now.month, now.day)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _due_datetime(datetime_str: str, today: datetime) -> Optional[datetime]:
+    parsed = parse_absolute(datetime_str)
+    if parsed is not None:
+        return parsed
+
+    keywords = _keywords(datetime_str)
+    if "today" in keywords:
+        return today
+    elif "tomorrow" in keywords:
+        return today + timedelta(days=1)
+    elif "next week" in keywords:
+        return today + timedelta(days=7)
+
+    return None
+
+def parse_due_datetime(datetime_str: str) -> Optional[datetime]:
+    """Parse a task due date: ISO strings or "today"/"tomorrow"/"next week"; None otherwise."""
+    if not datetime_str:
+        return None
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return _due_datetime(datetime_str, today)
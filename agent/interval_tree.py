@@ -0,0 +1,147 @@
+import random
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+class _Node:
+    __slots__ = ("key", "start", "end", "value", "priority", "left", "right", "max_end")
+
+    def __init__(self, key: Any, start: Any, end: Any, value: Any, priority: float):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.value = value
+        self.priority = priority
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.max_end = end
+
+    def update(self) -> None:
+        max_end = self.end
+        if self.left is not None and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+def _split(node: Optional[_Node], key: Any) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Split into the nodes keyed below `key` and those keyed at or above it."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """Join two treaps where every key in `left` sorts before every key in `right`."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+class IntervalTree:
+    """Intervals in a treap ordered by key, augmented with each subtree's latest end.
+
+    Keys must be unique and sort by interval start first (e.g. `(start, seq, id)`).
+    Inserts and removals take O(log n) expected time, and overlap queries skip
+    every subtree that ends before the query window, costing O(log n + k)
+    for k results in the common case.
+    """
+
+    def __init__(self, items: Iterable[Tuple[Hashable, Any, Any, Any]] = ()):
+        """Build from (key, start, end, value) items in O(n log n)."""
+        self._root: Optional[_Node] = None
+        self._size = 0
+        items = sorted(items, key=lambda item: item[0])
+        if items:
+            # Priorities that decrease level by level keep the balanced build a valid treap
+            priorities = sorted((random.random() for _ in items), reverse=True)
+            nodes = self._build(items, 0, len(items))
+            level, i = [nodes], 0
+            while level:
+                next_level = []
+                for node in level:
+                    node.priority = priorities[i]
+                    i += 1
+                    next_level.extend(child for child in (node.left, node.right) if child is not None)
+                level = next_level
+            self._root = nodes
+            self._size = len(items)
+
+    def _build(self, items: List[Tuple[Hashable, Any, Any, Any]], lo: int, hi: int) -> Optional[_Node]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = _Node(*items[mid], priority=0.0)
+        node.left = self._build(items, lo, mid)
+        node.right = self._build(items, mid + 1, hi)
+        node.update()
+        return node
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, key: Hashable, start: Any, end: Any, value: Any) -> None:
+        """Add an interval; `key` must not already be in the tree."""
+        node = _Node(key, start, end, value, random.random())
+        self._root = self._insert(self._root, node)
+        self._size += 1
+
+    def _insert(self, root: Optional[_Node], node: _Node) -> _Node:
+        if root is None:
+            return node
+        if node.priority > root.priority:
+            node.left, node.right = _split(root, node.key)
+            node.update()
+            return node
+        if node.key < root.key:
+            root.left = self._insert(root.left, node)
+        else:
+            root.right = self._insert(root.right, node)
+        root.update()
+        return root
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove the interval with `key`, returning whether it was present."""
+        self._root, removed = self._remove(self._root, key)
+        if removed:
+            self._size -= 1
+        return removed
+
+    def _remove(self, root: Optional[_Node], key: Hashable) -> Tuple[Optional[_Node], bool]:
+        if root is None:
+            return None, False
+        if key == root.key:
+            return _merge(root.left, root.right), True
+        if key < root.key:
+            root.left, removed = self._remove(root.left, key)
+        else:
+            root.right, removed = self._remove(root.right, key)
+        if removed:
+            root.update()
+        return root, removed
+
+    def overlapping(self, start: Any, end: Any) -> List[Any]:
+        """Values of intervals that overlap [start, end), in key order."""
+        found: List[Any] = []
+        self._collect(self._root, start, end, found)
+        return found
+
+    def _collect(self, node: Optional[_Node], start: Any, end: Any, found: List[Any]) -> None:
+        while node is not None and node.max_end > start:
+            self._collect(node.left, start, end, found)
+            # Everything further right starts at or after this node
+            if node.start >= end:
+                return
+            if node.end > start:
+                found.append(node.value)
+            node = node.right
@@ -0,0 +1,486 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from tenants import TENANT_ARG, HashRing, tenant_of
+
+# Longest request line we accept, so bulk requests fit in one line
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+# Lane shared by requests without an id; they run and answer strictly in order
+_UNTAGGED = ("untagged",)
+
+# Built-in request answering with this process's metrics, as Prometheus text or with {"format": "json"}
+METRICS_FUNCTION = "get_metrics"
+
+REQUESTS = metrics.counter("server_requests_total", "Requests handled, by server, function and status.", ("server", "function", "status"))
+LATENCY = metrics.histogram(
+    "server_request_seconds", "Time to handle a request, including the store lock and encoding the response.", ("server", "function")
+)
+REQUEST_BYTES = metrics.histogram("server_request_bytes", "Size of request lines.", ("server", "function"), metrics.SIZE_BUCKETS)
+RESPONSE_BYTES = metrics.histogram("server_response_bytes", "Size of response lines.", ("server", "function"), metrics.SIZE_BUCKETS)
+SHARD_REQUESTS = metrics.counter("server_shard_requests_total", "Requests routed to each worker of a sharded server.", ("server", "shard"))
+SHARD_STARTS = metrics.counter("server_shard_starts_total", "Worker processes started by a sharded server, restarts included.", ("server", "shard"))
+
+class JSONFragments(list):
+    """A list response whose items are already encoded as JSON.
+
+    `encode_response` splices the items into the response line verbatim, so
+    listings of records with cached encodings are joined rather than
+    re-serialized item by item.
+    """
+
+def encode_response(result: Any) -> str:
+    """json.dumps() for a handler result, splicing in any JSONFragments values."""
+    if isinstance(result, JSONFragments):
+        return "[" + ", ".join(result) + "]"
+    if isinstance(result, dict) and any(isinstance(value, JSONFragments) for value in result.values()):
+        return "{" + ", ".join(
+            f"{json.dumps(str(key))}: {encode_response(value)}" for key, value in result.items()
+        ) + "}"
+    return json.dumps(result)
+
+def object_schema(properties: Dict[str, Dict[str, Any]], required: Iterable[str] = ()) -> Dict[str, Any]:
+    """JSON Schema of a function's arguments, as advertised to MCP clients.
+
+    Extra properties stay allowed: handlers ignore arguments they don't use,
+    and clients may add routing arguments such as the tenant id.
+    """
+    schema: Dict[str, Any] = {"type": "object", "properties": properties, "additionalProperties": True}
+    if required:
+        schema["required"] = list(required)
+    return schema
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+class JSONLinesServer:
+    """Pipelined JSON-lines request loop shared by the calendar and task servers.
+
+    Each stdin line is a request `{"id": ..., "function": ..., "args": {...}}`.
+    Requests are read as fast as they arrive and their handlers run on a
+    worker pool, so responses come back as soon as they're ready, tagged with
+    the request's id and possibly out of order. Reads run concurrently; write
+    functions take the store-wide write lock, and writes to the same record id
+    are additionally queued so they apply in the order they were sent.
+
+    Requests without an id keep the old contract: they're handled one at a
+    time and answered in the order they were received.
+
+    Each tenant's data is a separate partition with its own lock, so one
+    tenant's writes never hold up another tenant's reads.
+
+    Responses are buffered and written out in batches, one flush per event
+    loop pass rather than one per response.
+
+    Every request is counted and timed per function under the server's
+    `name`, and a `get_metrics` request answers with the process's metrics.
+    """
+
+    def __init__(
+        self,
+        functions: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+        write_functions: Iterable[str] = (),
+        workers: Optional[int] = None,
+        stdin=None,
+        stdout=None,
+        name: str = "server",
+    ):
+        self.name = name
+        self.functions = functions
+        self.write_functions = frozenset(write_functions)
+        self.workers = workers or int(os.environ.get("SERVER_WORKERS", 0)) or min(32, (os.cpu_count() or 1) + 4)
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        # tenant -> lock over that tenant's partition of the store
+        self._locks: Dict[str, ReadWriteLock] = {}
+        self._locks_lock = threading.Lock()
+        self._lanes: Dict[Any, asyncio.Future] = {}
+        self._out = []
+        self._flush_scheduled = False
+
+    def dispatch(self, function_name: Any, args: Any) -> Dict[str, Any]:
+        """Run one request under the store lock and return the handler's result, not yet encoded."""
+        if function_name not in self.functions:
+            return {"status": "error", "message": f"Unknown function: {function_name}"}
+        try:
+            lock = self._tenant_lock(tenant_of(args))
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        is_write = function_name in self.write_functions
+        if is_write:
+            lock.acquire_write()
+        else:
+            lock.acquire_read()
+        try:
+            return self.functions[function_name](args)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            if is_write:
+                lock.release_write()
+            else:
+                lock.release_read()
+
+    def _tenant_lock(self, tenant_id: str) -> ReadWriteLock:
+        lock = self._locks.get(tenant_id)
+        if lock is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(tenant_id, ReadWriteLock())
+        return lock
+
+    def respond(self, function_name: Any, args: Any, request_id: Any = None, request_bytes: int = 0) -> Tuple[str, bool]:
+        """Run one request and return its encoded response line and whether it's an error."""
+        if function_name == METRICS_FUNCTION:
+            return self._metrics_response(args, request_id), False
+        start = time.perf_counter()
+        result = self.dispatch(function_name, args)
+        is_error = isinstance(result, dict) and result.get("status") == "error"
+        if request_id is not None:
+            result = {"id": request_id, **result}
+        try:
+            line = encode_response(result)
+        except (TypeError, ValueError) as e:
+            line, is_error = json.dumps({"id": request_id, "status": "error", "message": str(e)}), True
+        if metrics.ENABLED:
+            self._record(function_name, time.perf_counter() - start, is_error, request_id, request_bytes, len(line))
+        return line, is_error
+
+    def call(self, function_name: Any, args: Any, request_id: Any = None, request_bytes: int = 0) -> str:
+        """Run one request and return its encoded response line."""
+        return self.respond(function_name, args, request_id, request_bytes)[0]
+
+    def _record(self, function_name: Any, elapsed: float, is_error: bool, request_id: Any, request_bytes: int, response_bytes: int) -> None:
+        # Unknown names come from the client, so they share one label instead of adding a series each
+        function = function_name if function_name in self.functions else "unknown"
+        status = "error" if is_error else "success"
+        REQUESTS.inc(self.name, function, status)
+        LATENCY.observe(elapsed, self.name, function)
+        if request_bytes:
+            REQUEST_BYTES.observe(request_bytes, self.name, function)
+        RESPONSE_BYTES.observe(response_bytes, self.name, function)
+        metrics.trace(
+            "server_request", server=self.name, function=function, status=status, duration_ms=round(elapsed * 1000, 3),
+            jsonl_id=request_id, request_bytes=request_bytes, response_bytes=response_bytes,
+        )
+
+    def _metrics_response(self, args: Any, request_id: Any) -> str:
+        format = args.get("format", "prometheus") if isinstance(args, dict) else "prometheus"
+        response = {"status": "success", "format": format, "metrics": metrics.render(format)}
+        if request_id is not None:
+            response = {"id": request_id, **response}
+        return json.dumps(response)
+
+    def _emit(self, line: str) -> None:
+        self._out.append(line)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        if self._out:
+            self._out.append("")
+            self.stdout.write("\n".join(self._out))
+            self.stdout.flush()
+            self._out.clear()
+
+    async def _in_lane(self, key: Any, run: Callable[[], Awaitable[None]]) -> None:
+        """Run `run` after everything queued before it on the same lane."""
+        previous = self._lanes.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._lanes[key] = done
+        try:
+            if previous is not None:
+                await previous
+            await run()
+        finally:
+            done.set_result(None)
+            if self._lanes.get(key) is done:
+                del self._lanes[key]
+
+    async def _handle(self, line: bytes, pool: ThreadPoolExecutor) -> None:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            request = None
+            error = "Invalid JSON"
+        else:
+            error = None if isinstance(request, dict) else "Invalid request"
+        if error:
+            # There's no id to tag the error with, so answer it in order like any untagged request
+            async def reject() -> None:
+                self._emit(json.dumps({"status": "error", "message": error}))
+
+            await self._in_lane(_UNTAGGED, reject)
+            return
+
+        request_id = request.get("id")
+        function_name = request.get("function")
+        args = request.get("args", {})
+
+        async def run() -> None:
+            loop = asyncio.get_running_loop()
+            self._emit(await loop.run_in_executor(pool, self.call, function_name, args, request_id, len(line)))
+
+        if request_id is None:
+            await self._in_lane(_UNTAGGED, run)
+        elif function_name in self.write_functions and isinstance(args, dict) and args.get("id") is not None:
+            await self._in_lane(("record", str(args.get(TENANT_ARG)), str(args["id"])), run)
+        else:
+            await run()
+
+    async def _reader(self) -> asyncio.StreamReader:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), self.stdin)
+        except (ValueError, NotImplementedError, OSError):
+            # Regular files and some platforms can't be watched as a pipe; read on a thread instead
+            def pump() -> None:
+                stream = getattr(self.stdin, "buffer", self.stdin)
+                for chunk in iter(lambda: stream.readline(MAX_LINE_BYTES), b""):
+                    loop.call_soon_threadsafe(reader.feed_data, chunk)
+                loop.call_soon_threadsafe(reader.feed_eof)
+
+            threading.Thread(target=pump, name="stdin-reader", daemon=True).start()
+        return reader
+
+    async def run(self) -> None:
+        reader = await self._reader()
+        # Bound the number of requests in flight so a fast writer can't exhaust memory
+        in_flight = asyncio.Semaphore(self.workers * 8)
+        pending = set()
+
+        def finished(task: asyncio.Task) -> None:
+            pending.discard(task)
+            in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="handler") as pool:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await in_flight.acquire()
+                task = asyncio.create_task(self._handle(line, pool))
+                pending.add(task)
+                task.add_done_callback(finished)
+            if pending:
+                await asyncio.gather(*pending)
+        self._flush()
+
+# Responses to tagged requests start with their id, since call() puts it first
+_TAGGED_PREFIX = '{"id": '
+_id_decoder = json.JSONDecoder()
+
+def _error_line(request_id: Any, message: str) -> str:
+    response = {"status": "error", "message": message}
+    return json.dumps(response if request_id is None else {"id": request_id, **response})
+
+class _Worker:
+    """One worker process of a ShardedServer and the requests it hasn't answered yet."""
+
+    def __init__(self, shard: int, process: asyncio.subprocess.Process):
+        self.shard = shard
+        self.process = process
+        self.reader: Optional[asyncio.Task] = None
+        # Futures of the untagged requests sent to it, in the order it will answer them
+        self.untagged: Deque[asyncio.Future] = deque()
+        # Ids of the tagged requests sent to it, by their encoding
+        self.tagged: Dict[str, Any] = {}
+
+class ShardedServer(JSONLinesServer):
+    """Spreads tenants over `shards` worker processes by consistent hashing of their ids.
+
+    Every worker runs the same server script with SERVER_SHARDS=1, so it only
+    loads and serves the tenants hashed to it, and since tenants share nothing
+    throughput grows with the number of cores. This process only routes:
+    request lines are forwarded unchanged to their tenant's worker and tagged
+    responses are passed straight back. Untagged requests are still answered
+    in the order they were received, across all the workers.
+
+    A worker that exits is started again on its next request; the requests it
+    hadn't answered get error responses. `get_metrics` answers with this
+    process's routing metrics, or with a worker's given `{"shard": n}`.
+    """
+
+    def __init__(self, shards: int, command: List[str], name: str = "server", stdin=None, stdout=None):
+        super().__init__({}, stdin=stdin, stdout=stdout, name=name)
+        self.ring = HashRing(shards)
+        self.command = command
+        self._workers: List[Optional[_Worker]] = [None] * shards
+        # Response lines of untagged requests, as futures, in the order the requests arrived
+        self._untagged: Deque[asyncio.Future] = deque()
+
+    async def _worker(self, shard: int) -> _Worker:
+        worker = self._workers[shard]
+        if worker is not None and worker.process.returncode is None:
+            return worker
+        env = {**os.environ, "SERVER_SHARDS": "1", "SERVER_SHARD": str(shard)}
+        process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=env, limit=MAX_LINE_BYTES,
+        )
+        worker = self._workers[shard] = _Worker(shard, process)
+        worker.reader = asyncio.create_task(self._read_worker(worker))
+        SHARD_STARTS.inc(self.name, shard)
+        return worker
+
+    async def _read_worker(self, worker: _Worker) -> None:
+        while True:
+            line = await worker.process.stdout.readline()
+            if not line:
+                break
+            self._answer(worker, line.decode("utf-8").rstrip("\n"))
+        await worker.process.wait()
+        if self._workers[worker.shard] is worker:
+            self._workers[worker.shard] = None
+        message = f"Shard {worker.shard} exited with code {worker.process.returncode}"
+        for request_id in worker.tagged.values():
+            self._emit(_error_line(request_id, message))
+        worker.tagged.clear()
+        while worker.untagged:
+            worker.untagged.popleft().set_result(_error_line(None, message))
+        self._emit_untagged()
+
+    def _answer(self, worker: _Worker, line: str) -> None:
+        if line.startswith(_TAGGED_PREFIX) and not line.startswith(_TAGGED_PREFIX + "null"):
+            request_id, _ = _id_decoder.raw_decode(line, len(_TAGGED_PREFIX))
+            worker.tagged.pop(json.dumps(request_id), None)
+            self._emit(line)
+        elif worker.untagged:
+            worker.untagged.popleft().set_result(line)
+            self._emit_untagged()
+
+    def _emit_untagged(self) -> None:
+        while self._untagged and self._untagged[0].done():
+            self._emit(self._untagged.popleft().result())
+
+    def _reply(self, request_id: Any, line: str) -> None:
+        """Answer a request from this process, in order if it's untagged."""
+        if request_id is not None:
+            self._emit(line)
+            return
+        done = asyncio.get_running_loop().create_future()
+        done.set_result(line)
+        self._untagged.append(done)
+        self._emit_untagged()
+
+    def _shard_of(self, function_name: Any, args: Any) -> Optional[int]:
+        if function_name != METRICS_FUNCTION:
+            return self.ring.shard(tenant_of(args))
+        if not isinstance(args, dict) or args.get("shard") is None:
+            return None
+        shard = args["shard"]
+        if not isinstance(shard, int) or not 0 <= shard < self.ring.shards:
+            raise ValueError(f"shard must be an integer from 0 to {self.ring.shards - 1}")
+        return shard
+
+    async def _route(self, line: bytes) -> None:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            self._reply(None, _error_line(None, "Invalid JSON"))
+            return
+        if not isinstance(request, dict):
+            self._reply(None, _error_line(None, "Invalid request"))
+            return
+
+        request_id = request.get("id")
+        args = request.get("args", {})
+        try:
+            shard = self._shard_of(request.get("function"), args)
+        except ValueError as e:
+            self._reply(request_id, _error_line(request_id, str(e)))
+            return
+        if shard is None:
+            self._reply(request_id, self._metrics_response(args, request_id))
+            return
+
+        worker = await self._worker(shard)
+        if request_id is None:
+            answered = asyncio.get_running_loop().create_future()
+            self._untagged.append(answered)
+            worker.untagged.append(answered)
+        else:
+            worker.tagged[json.dumps(request_id)] = request_id
+        SHARD_REQUESTS.inc(self.name, shard)
+        try:
+            worker.process.stdin.write(line if line.endswith(b"\n") else line + b"\n")
+            await worker.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The worker died; its reader answers everything it was sent once it sees the exit
+            pass
+
+    async def run(self) -> None:
+        reader = await self._reader()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                await self._route(line)
+        # Workers answer what they were sent and exit once their stdin closes
+        workers = [worker for worker in self._workers if worker is not None]
+        for worker in workers:
+            worker.process.stdin.close()
+        await asyncio.gather(*(worker.reader for worker in workers))
+        self._flush()
+
+def serve(
+    functions: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+    write_functions: Iterable[str] = (),
+    workers: Optional[int] = None,
+    name: str = "server",
+    shards: Optional[int] = None,
+) -> None:
+    """Serve a dispatch table over stdin/stdout until stdin closes.
+
+    With more than one shard (SERVER_SHARDS), this process routes requests by
+    tenant to that many worker processes running the same script instead.
+    """
+    shards = shards or int(os.environ.get("SERVER_SHARDS", 0)) or 1
+    if shards > 1:
+        command = [sys.executable, os.path.abspath(sys.argv[0]), *sys.argv[1:]]
+        asyncio.run(ShardedServer(shards, command, name=name).run())
+        return
+    asyncio.run(JSONLinesServer(functions, write_functions, workers, name=name).run())
@@ -0,0 +1,326 @@
+"""Process-wide metrics and spans for the servers and the agent.
+
+Counters and histograms are kept in one registry per process and exported as
+Prometheus text or JSON: the JSON-lines servers answer a `get_metrics`
+request, and any process can serve `/metrics` and `/metrics.json` over HTTP
+by setting METRICS_PORT. The agent loads the bundled servers in process, so
+its endpoint covers their handlers too.
+
+Spans time a block of code into a `<name>_seconds` histogram. They carry the
+request and thread id bound with `correlate()`, which follow the code into
+tasks and `asyncio.to_thread` calls; with METRICS_TRACE_LOG set, every span is
+also appended to that file as a JSON line.
+
+METRICS_ENABLED=false turns everything into no-ops, so instrumented code
+pays one attribute check per call.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ENABLED = os.environ.get("METRICS_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+
+# Latency buckets in seconds, from sub-millisecond handler calls up to slow model calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Payload size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_NOOP = nullcontext()
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        if not ENABLED:
+            return
+        key = tuple(str(label) for label in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination, Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        if not ENABLED:
+            return
+        key = tuple(str(label) for label in labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], List[int], float, int]]:
+        """(label values, cumulative bucket counts, sum, count) per label combination."""
+        with self._lock:
+            entries = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        result = []
+        for key, counts, total, count in entries:
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            result.append((key, cumulative, total, count))
+        return result
+
+class Registry:
+    """The metrics of one process, created on first use and looked up by name after that."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs: Any) -> Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered with different labels or type")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._sorted():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "counter":
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_labels(metric.labelnames, key)} {_number(value)}")
+                continue
+            for key, cumulative, total, count in metric.samples():
+                for bound, running in zip(metric.buckets + (float("inf"),), cumulative):
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labelnames + ('le',), key + (le,))} {running}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labelnames, key)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(metric.labelnames, key)} {count}")
+        for name, kind, help, value in _process_metrics():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric as plain JSON-able data."""
+        metrics: Dict[str, Any] = {}
+        for metric in self._sorted():
+            if metric.kind == "counter":
+                values = [{"labels": dict(zip(metric.labelnames, key)), "value": value} for key, value in metric.samples()]
+            else:
+                values = [
+                    {
+                        "labels": dict(zip(metric.labelnames, key)),
+                        "count": count,
+                        "sum": total,
+                        "mean": total / count if count else 0.0,
+                        "buckets": {
+                            ("+Inf" if bound == float("inf") else _number(bound)): running
+                            for bound, running in zip(metric.buckets + (float("inf"),), cumulative)
+                        },
+                    }
+                    for key, cumulative, total, count in metric.samples()
+                ]
+            metrics[metric.name] = {"type": metric.kind, "help": metric.help, "values": values}
+        for name, kind, help, value in _process_metrics():
+            metrics[name] = {"type": kind, "help": help, "values": [{"labels": {}, "value": value}]}
+        return metrics
+
+    def _sorted(self) -> List[Any]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+def _process_metrics() -> List[Tuple[str, str, str, float]]:
+    if resource is None:
+        return []
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS, where this overstates by 1024x)
+    return [
+        ("process_cpu_seconds_total", "counter", "User and system CPU time of this process.", usage.ru_utime + usage.ru_stime),
+        ("process_max_resident_memory_bytes", "gauge", "Peak resident set size of this process.", usage.ru_maxrss * 1024),
+    ]
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+REGISTRY = Registry()
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, help, labelnames)
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, labelnames, buckets)
+
+def render(format: str = "prometheus") -> Any:
+    """The registry as Prometheus text, or as JSON-able data with format="json"."""
+    return REGISTRY.snapshot() if format == "json" else REGISTRY.render_prometheus()
+
+# Request and thread ids that spans started in this context are tagged with
+_correlation: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("metrics_correlation", default={})
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+@contextmanager
+def correlate(**ids: Optional[str]) -> Iterator[Dict[str, str]]:
+    """Tag every span started inside the block (and in tasks it starts) with these ids."""
+    merged = {**_correlation.get(), **{key: str(value) for key, value in ids.items() if value is not None}}
+    token = _correlation.set(merged)
+    try:
+        yield merged
+    finally:
+        _correlation.reset(token)
+
+def correlation() -> Dict[str, str]:
+    return _correlation.get()
+
+class _TraceLog:
+    """Appends spans to METRICS_TRACE_LOG as JSON lines, if it's set."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(line)
+
+_trace_log = _TraceLog(os.environ.get("METRICS_TRACE_LOG") or None)
+
+def trace(event: str, **fields: Any) -> None:
+    """Write one event to the trace log, tagged with the current correlation ids."""
+    if ENABLED and _trace_log.path:
+        _trace_log.write({"ts": round(time.time(), 6), "event": event, **_correlation.get(), **fields})
+
+class _Span:
+    __slots__ = ("histogram", "labels", "attributes", "start", "error")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[Any, ...], attributes: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+        self.attributes = attributes
+        self.error = False
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.histogram.observe(elapsed, *self.labels)
+        if _trace_log.path:
+            trace(
+                self.histogram.name[: -len("_seconds")],
+                duration_ms=round(elapsed * 1000, 3),
+                error=self.error or exc_type is not None,
+                **dict(zip(self.histogram.labelnames, self.labels)),
+                **self.attributes,
+            )
+
+def span(name: str, help: str = "", attributes: Optional[Dict[str, Any]] = None, **labels: Any) -> Any:
+    """Time the block into the `<name>_seconds` histogram, labelled with `labels`.
+
+    `attributes` only go to the trace log, so high-cardinality values (ids,
+    sizes) don't become label combinations.
+    """
+    if not ENABLED:
+        return _NOOP
+    names = tuple(sorted(labels))
+    metric = histogram(f"{name}_seconds", help or f"Duration of {name.replace('_', ' ')}.", names)
+    return _Span(metric, tuple(labels[label] for label in names), attributes or {})
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, content_type = render().encode("utf-8"), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(render("json")).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+_http_server: Optional[ThreadingHTTPServer] = None
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    global _http_server
+    if _http_server is None:
+        _http_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_http_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _http_server
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """Start the HTTP endpoint if METRICS_PORT is set."""
+    port = os.environ.get("METRICS_PORT")
+    if not ENABLED or not port:
+        return None
+    return start_http_server(int(port), os.environ.get("METRICS_HOST", "0.0.0.0"))
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+MAX_LIMIT = 1000
+
+def _encode_key(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, (tuple, list)):
+        return [_encode_key(item) for item in value]
+    return value
+
+def _decode_key(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["$dt"])
+    if isinstance(value, list):
+        return tuple(_decode_key(item) for item in value)
+    return value
+
+def encode_cursor(scope: str, key: Any) -> str:
+    """Opaque cursor pointing just past `key` in the ordering named by `scope`.
+
+    Cursors hold the sort key of the last item returned rather than an offset,
+    so inserts and deletes elsewhere in the order don't make the next page skip
+    or repeat items.
+    """
+    payload = json.dumps([scope, _encode_key(key)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, scope: str) -> Any:
+    """Sort key stored in a cursor; raises ValueError if it's malformed or from another ordering."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_scope, key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_scope != scope:
+        raise ValueError("Cursor does not match the requested sort order")
+    return _decode_key(key)
+
+def parse_limit(args: Dict[str, Any]) -> Optional[int]:
+    """Page size from args, or None when the caller wants every result."""
+    if args.get("limit") is None:
+        return None
+    limit = int(args["limit"])
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_LIMIT)
+
+def parse_fields(args: Dict[str, Any], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Requested field projection (a list or comma-separated string), or None for every field."""
+    fields = args.get("fields")
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(map(str, unknown))}")
+    return list(fields)
+
+def page_arguments(fields: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Schemas of the `limit`, `cursor` and `fields` arguments listings take."""
+    return {
+        "limit": {"type": "integer", "minimum": 1, "maximum": MAX_LIMIT, "description": "Page size; every result when omitted."},
+        "cursor": {"type": "string", "description": "next_cursor of the previous page, to fetch the one after it."},
+        "fields": {
+            "type": "array", "items": {"type": "string", "enum": list(fields)},
+            "description": "Only return these fields of each result.",
+        },
+    }
+
+def parse_flag(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
@@ -0,0 +1,201 @@
+import calendar
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+class RecurrenceRule:
+    """RRULE-style repetition of an event: frequency, interval, count/until and exceptions.
+
+    A rule is stored once with its event; `occurrences()` expands it lazily
+    and jumps straight to the requested window, so the cost of a query
+    depends on the window rather than on how long the series has run.
+    """
+
+    __slots__ = ("frequency", "interval", "count", "until", "weekdays", "exceptions")
+
+    def __init__(
+        self,
+        frequency: str,
+        interval: int = 1,
+        count: Optional[int] = None,
+        until: Optional[datetime] = None,
+        weekdays: Optional[Iterable[int]] = None,
+        exceptions: Optional[Iterable[datetime]] = None,
+    ):
+        frequency = str(frequency).lower()
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown recurrence frequency: {frequency}. Expected one of: {', '.join(FREQUENCIES)}")
+        if int(interval) < 1:
+            raise ValueError("Recurrence interval must be at least 1")
+        if count is not None and int(count) < 1:
+            raise ValueError("Recurrence count must be at least 1")
+        self.frequency = frequency
+        self.interval = int(interval)
+        self.count = int(count) if count is not None else None
+        self.until = until
+        # Days of the week (0 = Monday) a weekly rule repeats on; None means the start's weekday
+        self.weekdays = tuple(sorted(set(weekdays))) if weekdays and frequency == "weekly" else None
+        self.exceptions = frozenset(exceptions or ())
+
+    @classmethod
+    def parse(cls, spec: Any, parse_datetime: Callable[[str], datetime]) -> "RecurrenceRule":
+        """Rule from a dict (`{"frequency": "weekly", "weekdays": ["MO"], ...}`) or an RRULE string.
+
+        RRULE strings understand FREQ, INTERVAL, COUNT, UNTIL and BYDAY,
+        e.g. "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=10".
+        """
+        if isinstance(spec, str):
+            parts = dict(part.split("=", 1) for part in spec.upper().removeprefix("RRULE:").split(";") if "=" in part)
+            spec = {
+                "frequency": parts.get("FREQ", ""),
+                "interval": parts.get("INTERVAL", 1),
+                "count": parts.get("COUNT"),
+                "until": parts.get("UNTIL"),
+                "weekdays": parts["BYDAY"].split(",") if parts.get("BYDAY") else None,
+            }
+        if not isinstance(spec, dict):
+            raise ValueError("Recurrence must be an object or an RRULE string")
+
+        weekdays = spec.get("weekdays")
+        if isinstance(weekdays, str):
+            weekdays = weekdays.split(",")
+        exceptions = spec.get("exceptions") or []
+        if isinstance(exceptions, str):
+            exceptions = exceptions.split(",")
+        return cls(
+            frequency=spec.get("frequency", ""),
+            interval=spec.get("interval") or 1,
+            count=spec.get("count"),
+            until=_parse_moment(spec.get("until"), parse_datetime),
+            weekdays=[_parse_weekday(day) for day in weekdays] if weekdays else None,
+            exceptions=[_parse_moment(moment, parse_datetime) for moment in exceptions],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "frequency": self.frequency,
+            "interval": self.interval,
+            "count": self.count,
+            "until": self.until.isoformat() if self.until else None,
+            "weekdays": [WEEKDAYS[day] for day in self.weekdays] if self.weekdays else None,
+            "exceptions": sorted(moment.isoformat() for moment in self.exceptions),
+        }
+
+    def with_exception(self, moment: datetime) -> "RecurrenceRule":
+        """Copy of the rule that skips the occurrence starting at `moment`."""
+        return RecurrenceRule(
+            self.frequency, self.interval, self.count, self.until, self.weekdays, self.exceptions | {moment}
+        )
+
+    def _period(self, first: datetime, k: int) -> Optional[List[datetime]]:
+        """Occurrence starts in the k-th repetition period, before count/until/exceptions.
+
+        None once the period is past the last representable date.
+        """
+        try:
+            if self.frequency == "daily":
+                return [first + timedelta(days=k * self.interval)]
+            if self.frequency == "weekly":
+                week = first + timedelta(weeks=k * self.interval)
+                if self.weekdays is None:
+                    return [week]
+                monday = week - timedelta(days=week.weekday())
+                return [monday + timedelta(days=day) for day in self.weekdays if k or day >= first.weekday()]
+        except OverflowError:
+            return None
+        months = k * self.interval * (12 if self.frequency == "yearly" else 1)
+        year, month = divmod(first.month - 1 + months, 12)
+        year += first.year
+        if year > 9999:
+            return None
+        if first.day > calendar.monthrange(year, month + 1)[1]:
+            # Months (or leap days) without the start's day are skipped
+            return []
+        return [first.replace(year=year, month=month + 1)]
+
+    def _first_period(self, first: datetime, start: datetime) -> int:
+        """Index of the earliest period that can hold an occurrence at or after `start`."""
+        if start <= first:
+            return 0
+        if self.frequency == "daily":
+            return (start - first).days // self.interval
+        if self.frequency == "weekly":
+            monday = first - timedelta(days=first.weekday())
+            return (start - monday).days // (7 * self.interval)
+        months = (start.year - first.year) * 12 + start.month - first.month
+        return max(0, months // (self.interval * (12 if self.frequency == "yearly" else 1)) - 1)
+
+    def _occurrences_before(self, first: datetime, k: int) -> int:
+        """How many occurrences the periods before the k-th one hold, for COUNT."""
+        if not k:
+            return 0
+        if self.frequency == "daily" or (self.frequency == "weekly" and self.weekdays is None):
+            return k
+        if self.frequency == "weekly":
+            return len(self._period(first, 0)) + (k - 1) * len(self.weekdays)
+        if first.day <= 28:
+            return k
+        return sum(1 for i in range(k) if self._period(first, i))
+
+    def occurrences(
+        self, first: datetime, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Iterator[datetime]:
+        """Occurrence starts of a series beginning at `first` within [start, end], lazily.
+
+        Without `end` an unbounded rule yields forever.
+        """
+        k = self._first_period(first, start) if start is not None else 0
+        index = self._occurrences_before(first, k) if self.count is not None else 0
+        while True:
+            period = self._period(first, k)
+            if period is None:
+                return
+            for moment in period:
+                if self.count is not None and index >= self.count:
+                    return
+                if (self.until is not None and moment > self.until) or (end is not None and moment > end):
+                    return
+                index += 1
+                if (start is None or moment >= start) and moment not in self.exceptions:
+                    yield moment
+            k += 1
+
+    def last_start(self, first: datetime) -> Optional[datetime]:
+        """Start of the series' last occurrence, or None if it never ends."""
+        if self.count is None and self.until is None:
+            return None
+        last = None
+        if self.count is not None and self.frequency == "daily":
+            last = first + timedelta(days=(self.count - 1) * self.interval)
+        elif self.count is not None and self.frequency == "weekly":
+            per_week = len(self.weekdays) if self.weekdays else 1
+            last = first + timedelta(weeks=(self.count // per_week + 1) * self.interval)
+        elif self.count is not None:
+            for last in self.occurrences(first, end=self.until):
+                pass
+            return last
+        if self.until is not None:
+            last = min(last, self.until) if last is not None else self.until
+        return last
+
+def _parse_weekday(value: Any) -> int:
+    if isinstance(value, int) and 0 <= value < 7:
+        return value
+    name = str(value).strip().upper()[:2]
+    if name not in WEEKDAYS:
+        raise ValueError(f"Unknown weekday: {value}")
+    return WEEKDAYS.index(name)
+
+def _parse_moment(value: Any, parse_datetime: Callable[[str], datetime]) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    value = str(value)
+    # RRULE's compact UNTIL form, e.g. 20250331T235959 or 20250331
+    if value.rstrip("Z").replace("T", "").isdigit() and len(value.rstrip("Z")) in (8, 15):
+        compact = value.rstrip("Z")
+        return datetime.strptime(compact, "%Y%m%dT%H%M%S" if "T" in compact else "%Y%m%d")
+    return parse_datetime(value)
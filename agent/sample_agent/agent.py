@@ -1,24 +1,44 @@
-from typing_extensions import Literal, TypedDict, Dict, List, Any, Union, Optional
+from typing_extensions import Literal, TypedDict, Dict, List, Any, Union, Optional, NotRequired
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import Command
 from copilotkit import CopilotKitState
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
+from sample_agent.mcp_pool import get_session_pool, tenant_scope
+from sample_agent.agent_cache import AgentCache
+from sample_agent.history import HistoryManager, make_model_summarizer
+from sample_agent.checkpointer import open_checkpointer
+from sample_agent.streaming import run_agent
+from sample_agent.tool_node import ServerAwareToolNode
+from sample_agent.instrumentation import instrument_config
+from sample_agent.tool_selection import selector_from_env
+import metrics
 import os
 
 class StdioConnection(TypedDict):
     command: str
     args: List[str]
     transport: Literal["stdio"]
+    # tool name -> "pure", "read_only" or "mutating", for the tool result cache
+    tool_kinds: NotRequired[Dict[str, str]]
+    # argument the server takes the conversation's tenant id in, if it keeps tenants apart
+    tenant_arg: NotRequired[str]
 
 class SSEConnection(TypedDict):
     url: str
     transport: Literal["sse"]
+    tool_kinds: NotRequired[Dict[str, str]]
+    tenant_arg: NotRequired[str]
 
-MCPConfig = Dict[str, Union[StdioConnection, SSEConnection]]
+class InProcessConnection(TypedDict):
+    # a trusted local server module, imported into the agent process instead of spawned
+    path: str
+    transport: Literal["inprocess"]
+    tool_kinds: NotRequired[Dict[str, str]]
+    tenant_arg: NotRequired[str]
+
+MCPConfig = Dict[str, Union[StdioConnection, SSEConnection, InProcessConnection]]
 
 class AgentState(CopilotKitState):
     """
@@ -28,31 +48,71 @@ class AgentState(CopilotKitState):
     and we're adding additional fields to support a more comprehensive personal assistant
     """
     mcp_config: Optional[MCPConfig]
+    # the user or team this conversation belongs to. the calendar and task servers keep each
+    # tenant's data in its own partition; without one, everything goes to the default tenant
+    tenant_id: Optional[str]
     calendar_data: Optional[Dict[str, Any]]
     tasks: Optional[List[Dict[str, Any]]]
     user_preferences: Optional[Dict[str, Any]]
     connected_services: Optional[Dict[str, bool]]
+    # running summary of the turns that no longer fit the history budget
+    conversation_summary: Optional[str]
+    # tool calls of the turn in progress and their status, emitted while the turn streams
+    tool_activity: Optional[List[Dict[str, Any]]]
 
+# the bundled servers are local and trusted, so they run inside the agent process rather
+# than as one python child each. a config from the frontend can still use stdio or sse
 DEFAULT_MCP_CONFIG: MCPConfig = {
     "math": {
-        "command": "python",
-        "args": [os.path.join(os.path.dirname(__file__), "..", "math_server.py")],
-        "transport": "stdio",
+        "path": os.path.join(os.path.dirname(__file__), "..", "math_server.py"),
+        "transport": "inprocess",
     },
     # Adding calendar service
     "calendar": {
-        "command": "python",
-        "args": [os.path.join(os.path.dirname(__file__), "..", "calendar_server.py")],
-        "transport": "stdio",
+        "path": os.path.join(os.path.dirname(__file__), "..", "calendar_server.py"),
+        "transport": "inprocess",
+        "tenant_arg": "tenant_id",
     },
     # Adding task management service
     "tasks": {
-        "command": "python",
-        "args": [os.path.join(os.path.dirname(__file__), "..", "task_server.py")],
-        "transport": "stdio",
+        "path": os.path.join(os.path.dirname(__file__), "..", "task_server.py"),
+        "transport": "inprocess",
+        "tenant_arg": "tenant_id",
     },
 }
 
+# compiled react agents, shared across turns and threads. an entry is rebuilt only when
+# a new mcp config shows up or one of its servers changes its tool list
+agent_cache = AgentCache()
+
+# configs with many tools only bind the ones relevant to each turn, plus search_tools and
+# call_tool to reach the rest. TOOL_SELECTION=false binds every tool, as before
+tool_selector = selector_from_env()
+
+def chat_model(**kwargs):
+    # the model behind both the agent and the history summarizer. looked up on every build,
+    # so the benchmarks can swap in a deterministic local model
+    return ChatOpenAI(model="gpt-4o-mini", **kwargs)
+
+def summarize_history(previous_summary, messages):
+    # fold the turns that no longer fit the history budget into the running summary
+    return make_model_summarizer(chat_model())(previous_summary, messages)
+
+# keeps the stored conversation bounded so prompts and checkpoints don't grow every turn
+history_manager = HistoryManager(summarize=summarize_history)
+
+# stream tokens and tool progress to the frontend as the turn runs; set CHAT_STREAMING=false
+# to only deliver the finished turn
+STREAMING = os.environ.get("CHAT_STREAMING", "true").strip().lower() not in ("0", "false", "no", "off")
+
+def build_react_agent(mcp_tools, tool_connections, extra_tools=()):
+    # create the react agent with a more powerful model for comprehensive assistant capabilities
+    model = chat_model(streaming=STREAMING)
+    mcp_tools = list(mcp_tools) + list(extra_tools)
+    # tool calls from one step run concurrently across servers, in order within a server
+    # whenever one of them mutates it
+    return create_react_agent(model, ServerAwareToolNode(mcp_tools, tool_connections))
+
 async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Literal["__end__"]]:
     """
     this is an agent but, simplified, and it uses the react agent as a subgraph
@@ -63,46 +123,76 @@ async def chat_node(state: AgentState, config: RunnableConfig) -> Command[Litera
     mcp_config = state.get("mcp_config", DEFAULT_MCP_CONFIG)
 
     print(f"mcp_config: {mcp_config}, default: {DEFAULT_MCP_CONFIG}")
-    
-    # set up the mcp client and tools using the configuration from state
-    async with MultiServerMCPClient(mcp_config) as mcp_client:
-        # get the tools
-        mcp_tools = mcp_client.get_tools()
-        
-        # create the react agent with a more powerful model for comprehensive assistant capabilities
-        model = ChatOpenAI(model="gpt-4o-mini")
-        react_agent = create_react_agent(model, mcp_tools)
-        
-        # prepare messages for the react agent
-        agent_input = {
-            "messages": state["messages"]
-        }
+
+    # every span recorded during the turn (pool, tools, model calls and in-process server
+    # handlers) is tagged with a fresh request id and the conversation's thread id, and every
+    # tool call acts on the conversation's tenant
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    tenant_id = state.get("tenant_id")
+    with metrics.correlate(request_id=metrics.new_request_id(), thread_id=thread_id, tenant_id=tenant_id), tenant_scope(tenant_id):
+        with metrics.span("chat_turn", "Wall time of a chat_node turn."):
+            return await run_turn(state, config, mcp_config)
+
+def get_react_agent(mcp_client, state: AgentState):
+    # the react agent compiled for the config's tools, or for the subset of them selected
+    # for this turn (plus the escape hatches) when the config has too many to send them all
+    tools = mcp_client.get_tools()
+    if tool_selector is None or not tool_selector.enabled(tools):
+        return agent_cache.get_or_build(
+            mcp_client, lambda tools: build_react_agent(tools, mcp_client.tool_connections())
+        ).agent
+    catalog = tool_selector.catalog(f"{mcp_client.key}:{mcp_client.tools_fingerprint()}", tools)
+    selected = tool_selector.select(catalog, state.get("messages", []))
+    return agent_cache.get_or_build(
+        mcp_client,
+        lambda tools: build_react_agent(tools, mcp_client.tool_connections(), catalog.escape_hatches()),
+        tool_names=selected,
+    ).agent
+
+async def run_turn(state: AgentState, config: RunnableConfig, mcp_config: MCPConfig) -> Command[Literal["__end__"]]:
+    # check out the pooled mcp client for this configuration. servers are only spawned
+    # the first time a config is seen (or after they die), so warm turns skip the handshakes
+    async with get_session_pool().client(mcp_config) as mcp_client:
+        # get the tools and the react agent compiled for them
+        with metrics.span("chat_tool_discovery", "Time to get a turn's tools and react agent, compiling it on a cache miss."):
+            react_agent = get_react_agent(mcp_client, state)
         
-        # Add context about connected services and user preferences if available
-        if state.get("connected_services"):
-            connected_services_msg = {"role": "system", "content": f"The user has the following services connected: {state['connected_services']}"}
-            agent_input["messages"].append(connected_services_msg)
-            
-        if state.get("user_preferences"):
-            user_prefs_msg = {"role": "system", "content": f"User preferences: {state['user_preferences']}"}
-            agent_input["messages"].append(user_prefs_msg)
+        # bound the stored history (summarizing the oldest turns if it's over budget), then
+        # build the prompt with the connected services, preferences and summary as context.
+        # the state itself is never mutated
+        with metrics.span("chat_history", "Time to bound the history and build a turn's prompt."):
+            history = await history_manager.prepare(state)
+            prompt = history_manager.prompt(state, history)
         
-        # run the react agent subgraph with our input
-        agent_response = await react_agent.ainvoke(agent_input)
+        # run the react agent subgraph with our input, streaming its tokens and tool calls
+        # to the frontend through this node's config as they happen. model calls are timed
+        # and counted (one per react iteration) through a callback on the config
+        agent_config, turn_metrics = instrument_config(config)
+        agent_response = await run_agent(react_agent, {"messages": prompt}, agent_config, state, streaming=STREAMING)
+        if turn_metrics is not None:
+            turn_metrics.finish_turn()
         
-        # update the state with the new messages
-        updated_messages = state["messages"] + agent_response.get("messages", [])
+        # the react agent echoes its input back, so only the messages it added are new
+        new_messages = history_manager.new_messages(prompt, agent_response.get("messages", []))
         
-        # end the graph with the updated messages
+        # end the graph with the new messages, dropping whatever the history manager trimmed
         return Command(
             goto=END,
-            update={"messages": updated_messages},
+            update=history.update(new_messages),
         )
 
+# serve /metrics and /metrics.json when METRICS_PORT is set. the bundled servers run in this
+# process, so their handler metrics are included
+metrics.serve_from_env()
+
 # define a more comprehensive workflow graph with nodes for various assistant capabilities
 workflow = StateGraph(AgentState)
 workflow.add_node("chat_node", chat_node)
 workflow.set_entry_point("chat_node")
 
+# conversations are checkpointed to a local sqlite database so they survive restarts;
+# set CHECKPOINT_DB_PATH=memory to keep them in memory only
+DEFAULT_CHECKPOINT_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "checkpoints.db")
+
 # compile the workflow graph
-graph = workflow.compile(MemorySaver())
\ No newline at end of file
+graph = workflow.compile(open_checkpointer(os.environ.get("CHECKPOINT_DB_PATH", DEFAULT_CHECKPOINT_DB_PATH)))
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+a bounded lru cache of compiled react agents.
+
+entries are keyed by the mcp config hash plus the fingerprint of every
+server's tool list, so the tool conversion and graph compilation happen once
+per config instead of once per message. when a server reports that its tools
+changed, its fingerprint changes, and the entries built from the old tool list
+for that config are dropped.
+
+with tool selection (see tool_selection.py) each distinct subset of a config's
+tools gets its own entry, so the key also carries the selected tool names.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.tools import BaseTool
+
+# room for several tool selections per config
+DEFAULT_MAX_AGENTS = 64
+
+
+class CachedAgent:
+    """the tools and compiled react agent subgraph built for one config."""
+
+    def __init__(self, tools: List[BaseTool], agent: Any):
+        self.tools = tools
+        self.agent = agent
+
+
+class AgentCache:
+    def __init__(self, maxsize: int = DEFAULT_MAX_AGENTS):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, str, Optional[Tuple[str, ...]]], CachedAgent]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(
+        self, mcp_client: Any, build: Callable[[List[BaseTool]], Any], tool_names: Optional[Sequence[str]] = None
+    ) -> CachedAgent:
+        """
+        return the cached agent for a pooled mcp client, calling `build(tools)` to
+        compile a new one if its config or tool lists haven't been seen yet.
+        with `tool_names`, the agent is built from just those of the client's tools.
+        """
+        fingerprint = mcp_client.tools_fingerprint()
+        key = (mcp_client.key, fingerprint, tuple(tool_names) if tool_names is not None else None)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        # anything cached for this config with another fingerprint was built from an older tool list
+        for stale in [cached for cached in self._entries if cached[0] == mcp_client.key and cached[1] != fingerprint]:
+            del self._entries[stale]
+        tools = mcp_client.get_tools()
+        if tool_names is not None:
+            selected = set(tool_names)
+            tools = [tool for tool in tools if tool.name in selected]
+        entry = CachedAgent(tools, build(tools))
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, config_key: str) -> None:
+        """drop every entry built for the given config hash."""
+        for key in [key for key in self._entries if key[0] == config_key]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,596 @@
+"""
+a durable, delta-based langgraph checkpointer backed by a local sqlite database.
+
+the in-process MemorySaver keeps a full copy of every thread's state for
+every step, forever, and loses all of it on restart. this saver writes to
+sqlite (in wal mode) instead, and only stores what changed:
+
+- a checkpoint row holds the channel versions, not the channel values. each
+  channel value is stored once per version, so channels that didn't change
+  in a step cost nothing.
+- list channels (the message history) are stored as deltas against their
+  previous version: the length of the prefix they share plus the items
+  appended. a subgraph's list channels, which usually start from the
+  parent's history, can also be deltas against the root namespace's value. a
+  full copy is written every `max_delta_chain` versions, or when a list was
+  rewritten rather than appended to, so loading never replays a long chain.
+
+old checkpoints are compacted as threads grow: each thread keeps its
+`keep_checkpoints` most recent root checkpoints (and the subgraph
+checkpoints taken since), and the blobs nothing references anymore are
+deleted. `prune_idle()` drops whole threads that haven't been touched for a
+while.
+
+the latest checkpoint of recently active threads is kept deserialized in an
+lru hot cache, so resuming an active conversation doesn't touch sqlite, and
+memory stays bounded however many threads exist.
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+# values of CHECKPOINT_DB_PATH that mean "keep checkpoints in memory only"
+MEMORY_PATHS = ("", ":memory:", "memory")
+
+DEFAULT_KEEP_CHECKPOINTS = 20
+# compaction runs once a thread has this many root checkpoints past its limit
+DEFAULT_COMPACT_SLACK = 10
+DEFAULT_MAX_DELTA_CHAIN = 32
+DEFAULT_HOT_THREADS = 256
+
+# a channel version's blob is a full value, an empty channel, or a delta against an older version
+FULL, EMPTY, DELTA = "full", "empty", "delta"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    base_ns TEXT,
+    base_version TEXT,
+    prefix INTEGER,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# a pending write as stored: (task id, channel, value, task path, idx)
+_Write = Tuple[str, str, Any, str, int]
+
+
+def _common_prefix(old: List[Any], new: List[Any]) -> int:
+    """how many leading items two lists share, comparing message ids when they have them."""
+    n = min(len(old), len(new))
+    for i in range(n):
+        a, b = old[i], new[i]
+        if a is b:
+            continue
+        a_id, b_id = getattr(a, "id", None), getattr(b, "id", None)
+        if a_id is not None and b_id is not None:
+            if a_id != b_id or a != b:
+                return i
+        elif a != b:
+            return i
+    return n
+
+
+class _HotThread:
+    """the latest checkpoint of one (thread, namespace), deserialized."""
+
+    __slots__ = ("checkpoint", "metadata", "parent_id", "writes", "sends", "depths")
+
+    def __init__(self, checkpoint: Checkpoint, metadata: CheckpointMetadata, parent_id: Optional[str], sends: List[Any]):
+        self.checkpoint = checkpoint
+        self.metadata = metadata
+        self.parent_id = parent_id
+        self.writes: List[_Write] = []
+        self.sends = sends
+        # delta chain length of each channel's current version
+        self.depths: Dict[str, int] = {}
+
+
+class SQLiteDeltaSaver(BaseCheckpointSaver[str]):
+    def __init__(
+        self,
+        path: str,
+        *,
+        keep_checkpoints: Optional[int] = DEFAULT_KEEP_CHECKPOINTS,
+        compact_slack: int = DEFAULT_COMPACT_SLACK,
+        max_delta_chain: int = DEFAULT_MAX_DELTA_CHAIN,
+        hot_threads: int = DEFAULT_HOT_THREADS,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.keep_checkpoints = keep_checkpoints
+        self.compact_slack = compact_slack
+        self.max_delta_chain = max_delta_chain
+        self.hot_threads = hot_threads
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._hot: "OrderedDict[Tuple[str, str], _HotThread]" = OrderedDict()
+        # root checkpoints written per thread since it was last compacted (or loaded)
+        self._since_compaction: Dict[str, int] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # -- hot cache
+
+    def _hot_get(self, thread_id: str, checkpoint_ns: str) -> Optional[_HotThread]:
+        entry = self._hot.get((thread_id, checkpoint_ns))
+        if entry is not None:
+            self._hot.move_to_end((thread_id, checkpoint_ns))
+        return entry
+
+    def _hot_put(self, thread_id: str, checkpoint_ns: str, entry: _HotThread) -> None:
+        self._hot[(thread_id, checkpoint_ns)] = entry
+        self._hot.move_to_end((thread_id, checkpoint_ns))
+        while len(self._hot) > self.hot_threads:
+            self._hot.popitem(last=False)
+
+    def _hot_tuple(self, thread_id: str, checkpoint_ns: str, entry: _HotThread) -> CheckpointTuple:
+        checkpoint = copy_checkpoint(entry.checkpoint)
+        # list values are copied too, so the caller can't change what's cached
+        checkpoint["channel_values"] = {
+            channel: list(value) if isinstance(value, list) else value
+            for channel, value in checkpoint["channel_values"].items()
+        }
+        checkpoint["pending_sends"] = list(entry.sends)
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, entry.checkpoint["id"]),
+            checkpoint=checkpoint,
+            metadata=entry.metadata,
+            parent_config=_config(thread_id, checkpoint_ns, entry.parent_id) if entry.parent_id else None,
+            pending_writes=[(task_id, channel, value) for task_id, channel, value, _, _ in entry.writes],
+        )
+
+    # -- reads
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            entry = self._hot_get(thread_id, checkpoint_ns)
+            if entry is not None and checkpoint_id in (None, entry.checkpoint["id"]):
+                return self._hot_tuple(thread_id, checkpoint_ns, entry)
+
+            query = "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+            params: List[Any] = [thread_id, checkpoint_ns]
+            if checkpoint_id:
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+            row = self._conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            entry = self._materialize(thread_id, checkpoint_ns, row)
+            latest = self._conn.execute(
+                "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            ).fetchone()[0]
+            if entry.checkpoint["id"] == latest:
+                self._hot_put(thread_id, checkpoint_ns, entry)
+            return self._hot_tuple(thread_id, checkpoint_ns, entry)
+
+    def _materialize(self, thread_id: str, checkpoint_ns: str, row: Tuple) -> _HotThread:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        values, depths = {}, {}
+        for channel, version in checkpoint["channel_versions"].items():
+            found, value, depths[channel] = self._load_blob(thread_id, checkpoint_ns, channel, version)
+            if found:
+                values[channel] = value
+        checkpoint["channel_values"] = values
+        entry = _HotThread(
+            checkpoint, self.serde.loads_typed((metadata_type, metadata)), parent_id,
+            self._sends(thread_id, checkpoint_ns, parent_id) if parent_id else [],
+        )
+        # so deltas taken against a reloaded checkpoint still start a full copy in time
+        entry.depths = depths
+        entry.writes = self._load_writes(thread_id, checkpoint_ns, checkpoint_id)
+        return entry
+
+    def _load_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Tuple[bool, Any, int]:
+        """(found, value, delta chain depth) of one channel version, replaying its delta chain if it has one."""
+        chain = []
+        while True:
+            row = self._conn.execute(
+                "SELECT kind, type, value, base_ns, base_version, prefix FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == EMPTY:
+                if chain:
+                    raise ValueError(f"checkpoint blob for {channel}@{version} is missing the base of its delta chain")
+                return False, None, 0
+            kind, type_, value, base_ns, base_version, prefix = row
+            chain.append((type_, value, prefix))
+            if kind == FULL:
+                break
+            checkpoint_ns, version = base_ns, base_version
+        depth = len(chain) - 1
+        type_, value, _ = chain.pop()
+        result = self.serde.loads_typed((type_, value))
+        while chain:
+            type_, value, prefix = chain.pop()
+            result = result[:prefix] + self.serde.loads_typed((type_, value))
+        return True, result, depth
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[_Write]:
+        rows = self._conn.execute(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, value)), task_path, idx)
+            for task_id, channel, type_, value, task_path, idx in rows
+        ]
+
+    def _sends(self, thread_id: str, checkpoint_ns: str, parent_id: str, writes: Optional[List[_Write]] = None) -> List[Any]:
+        """sends pushed by the parent checkpoint's tasks, which the child checkpoint still has to run."""
+        if writes is None:
+            writes = self._load_writes(thread_id, checkpoint_ns, parent_id)
+        sends = sorted((write for write in writes if write[1] == TASKS), key=lambda write: (write[3], write[0], write[4]))
+        return [write[2] for write in sends]
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                return
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            with self._lock:
+                entry = self._materialize(thread_id, checkpoint_ns, tuple(row))
+            if limit is not None:
+                limit -= 1
+            yield self._hot_tuple(thread_id, checkpoint_ns, entry)
+
+    # -- writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_id = config["configurable"].get("checkpoint_id")
+        metadata = get_checkpoint_metadata(config, metadata)
+        values = checkpoint["channel_values"]
+
+        stored = {key: value for key, value in checkpoint.items() if key not in ("channel_values", "pending_sends")}
+        type_, blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+
+        with self._lock:
+            previous = self._hot_get(thread_id, checkpoint_ns)
+            if previous is not None and previous.checkpoint["id"] != parent_id:
+                # the cache holds a different branch; deltas are only taken against the parent
+                previous = None
+            depths = dict(previous.depths) if previous is not None else {}
+            bases = [(previous, checkpoint_ns)] if previous is not None else []
+            if checkpoint_ns:
+                # a subgraph's history usually starts out as a copy of the root's
+                bases.append((self._hot.get((thread_id, "")), ""))
+
+            blobs = []
+            for channel, version in new_versions.items():
+                row, depths[channel] = self._encode_blob(channel, values, bases)
+                blobs.append((thread_id, checkpoint_ns, channel, str(version), *row))
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, kind, type, value, base_ns, base_version, prefix) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    blobs,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, blob, metadata_type, metadata_blob, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            sends = []
+            if parent_id:
+                parent_writes = previous.writes if previous is not None else None
+                sends = self._sends(thread_id, checkpoint_ns, parent_id, parent_writes)
+            cached = copy_checkpoint(checkpoint)
+            cached["channel_values"] = {
+                channel: list(value) if isinstance(value, list) else value for channel, value in values.items()
+            }
+            entry = _HotThread(cached, metadata, parent_id, sends)
+            entry.depths = depths
+            self._hot_put(thread_id, checkpoint_ns, entry)
+
+            if checkpoint_ns == "":
+                self._since_compaction[thread_id] = self._since_compaction.get(thread_id, 0) + 1
+                if self.keep_checkpoints is not None and self._since_compaction[thread_id] >= self.compact_slack:
+                    self.compact(thread_id)
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def _encode_blob(
+        self, channel: str, values: Dict[str, Any], bases: List[Tuple[Optional[_HotThread], str]]
+    ) -> Tuple[Tuple[Any, ...], int]:
+        """
+        the (kind, type, value, base ns, base version, prefix) row for a channel's
+        new version, and its delta chain depth. lists become a delta against the
+        first of `bases` (cached checkpoints and their namespaces) holding a
+        list in the same channel.
+        """
+        if channel not in values:
+            return (EMPTY, None, None, None, None, None), 0
+        value = values[channel]
+        for base, base_ns in bases if isinstance(value, list) else ():
+            old = base.checkpoint["channel_values"].get(channel) if base is not None else None
+            if not isinstance(old, list) or not old:
+                continue
+            depth = base.depths.get(channel, 0)
+            base_version = base.checkpoint["channel_versions"].get(channel)
+            if base_version is None or depth >= self.max_delta_chain:
+                break
+            prefix = _common_prefix(old, value)
+            # only worth it when most of the old list survives
+            if prefix * 2 >= len(old):
+                type_, blob = self.serde.dumps_typed(value[prefix:])
+                return (DELTA, type_, blob, base_ns, str(base_version), prefix), depth + 1
+            break
+        type_, blob = self.serde.dumps_typed(value)
+        return (FULL, type_, blob, None, None, None), 0
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows, replace = [], all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path))
+        with self._lock:
+            # special writes (errors, interrupts...) replace earlier ones; regular writes are only stored once
+            self._conn.executemany(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            entry = self._hot.get((thread_id, checkpoint_ns))
+            if entry is not None and entry.checkpoint["id"] == checkpoint_id:
+                entry.writes = self._load_writes(thread_id, checkpoint_ns, checkpoint_id)
+
+    # -- retention
+
+    def compact(self, thread_id: str) -> None:
+        """
+        drop a thread's checkpoints older than its `keep_checkpoints` most recent
+        root checkpoints, in every namespace, with their writes and any blobs
+        the remaining checkpoints no longer reference.
+        """
+        with self._lock:
+            self._since_compaction[thread_id] = 0
+            if self.keep_checkpoints is None:
+                return
+            cutoff = self._conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, max(self.keep_checkpoints - 1, 0)),
+            ).fetchone()
+            if cutoff is None:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, cutoff[0]))
+                self._conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, cutoff[0]))
+                self._collect_blobs(thread_id)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for key in [key for key in self._hot if key[0] == thread_id and key[1] != ""]:
+                if self._hot[key].checkpoint["id"] < cutoff[0]:
+                    del self._hot[key]
+
+    def _collect_blobs(self, thread_id: str) -> None:
+        """delete the thread's blobs that no checkpoint (or delta built on them) references."""
+        live = set()
+        for checkpoint_ns, type_, blob in self._conn.execute(
+            "SELECT checkpoint_ns, type, checkpoint FROM checkpoints WHERE thread_id = ?", (thread_id,)
+        ).fetchall():
+            for channel, version in self.serde.loads_typed((type_, blob))["channel_versions"].items():
+                live.add((checkpoint_ns, channel, str(version)))
+        bases = {
+            (checkpoint_ns, channel, version): (base_ns, channel, base_version) if base_version else None
+            for checkpoint_ns, channel, version, base_ns, base_version in self._conn.execute(
+                "SELECT checkpoint_ns, channel, version, base_ns, base_version FROM blobs WHERE thread_id = ?", (thread_id,)
+            ).fetchall()
+        }
+        # a live delta keeps its whole chain alive
+        for key in list(live):
+            while bases.get(key):
+                key = bases[key]
+                if key in live:
+                    break
+                live.add(key)
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, *key) for key in bases if key not in live],
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """forget everything stored for a thread."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "blobs", "writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for key in [key for key in self._hot if key[0] == thread_id]:
+                del self._hot[key]
+            self._since_compaction.pop(thread_id, None)
+
+    def prune_idle(self, max_idle_seconds: float) -> int:
+        """delete the threads with no checkpoint newer than `max_idle_seconds`, returning how many."""
+        with self._lock:
+            threads = [
+                row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                    (time.time() - max_idle_seconds,),
+                ).fetchall()
+            ]
+            for thread_id in threads:
+                self.delete_thread(thread_id)
+        return len(threads)
+
+    # -- async api: hot cache hits answer right away, sqlite work runs off the event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = self._hot.get((thread_id, checkpoint_ns))
+        if entry is not None and get_checkpoint_id(config) in (None, entry.checkpoint["id"]):
+            return self.get_tuple(config)
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+def open_checkpointer(path: str, **options: Any) -> BaseCheckpointSaver:
+    """the sqlite delta saver for `path`, or an in-memory saver when the path says not to persist."""
+    if path.strip().lower() in MEMORY_PATHS:
+        return MemorySaver()
+    return SQLiteDeltaSaver(path, **options)
@@ -0,0 +1,270 @@
+"""
+bounded conversation history for chat_node.
+
+the checkpointed message list is kept under a token budget. once the stored
+history grows past `max_tokens`, the oldest whole turns are folded into a
+running summary (kept in its own state field) and dropped from the state
+with RemoveMessage, so the prompt, the checkpoint and the turn latency stay
+flat over long sessions instead of growing with every message.
+
+context that describes the session rather than the conversation (connected
+services, user preferences, the summary itself) is rebuilt into every
+prompt and never written back to the stored history.
+"""
+
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+# token budget for the stored history, not counting the injected context
+DEFAULT_MAX_HISTORY_TOKENS = 8000
+# once over budget, history is compacted down to this fraction of it, so the
+# summarizer runs every few turns rather than on every turn
+DEFAULT_COMPACT_RATIO = 0.5
+# cap on the running summary, so it can't become the thing that grows
+DEFAULT_MAX_SUMMARY_TOKENS = 600
+# each message's text is cut to this many characters in the summarizer's transcript
+MAX_TRANSCRIPT_CHARS = 2000
+
+# rough tokenizer-free estimate: ~4 characters per token, plus per-message framing
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# ids of the messages injected into every prompt, so they're recognisable in the agent's output
+CONTEXT_ID_PREFIX = "context:"
+
+Summarizer = Callable[[Optional[str], List[BaseMessage]], Awaitable[str]]
+
+
+def _text(content: Any) -> str:
+    """plain text of a message's content, which may be a string or a list of content blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(
+            block if isinstance(block, str) else str(block.get("text", "")) if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return str(content)
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """approximate token count of a message, including the arguments of any tool calls."""
+    chars = len(_text(message.content))
+    for call in getattr(message, "tool_calls", None) or ():
+        chars += len(call.get("name") or "") + len(json.dumps(call.get("args") or {}, default=str))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def dedupe_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """
+    messages with repeated ids collapsed into one, kept at the first position
+    with the latest content. system messages repeating an earlier one's text
+    are collapsed the same way, which cleans up context that older versions
+    of chat_node appended to the history on every turn.
+    """
+    positions: Dict[Any, int] = {}
+    deduped: List[BaseMessage] = []
+    for message in messages:
+        keys = [("id", message.id)] if message.id else []
+        if isinstance(message, SystemMessage):
+            keys.append(("system", _text(message.content)))
+        position = next((positions[key] for key in keys if key in positions), None)
+        if position is None:
+            position = len(deduped)
+            deduped.append(message)
+        else:
+            deduped[position] = message
+        for key in keys:
+            positions[key] = position
+    return deduped
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    group messages into turns that each start at a human message, so trimming
+    whole turns never separates a tool call from its result.
+    """
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if not turns or isinstance(message, HumanMessage):
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def transcript(messages: Iterable[BaseMessage], max_chars: int = MAX_TRANSCRIPT_CHARS) -> str:
+    """a plain-text rendering of messages for the summarizer."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            role = "user"
+        elif isinstance(message, AIMessage):
+            role = "assistant"
+        elif isinstance(message, ToolMessage):
+            role = f"tool {message.name or ''}".strip()
+        else:
+            role = message.type
+        text = _text(message.content)
+        for call in getattr(message, "tool_calls", None) or ():
+            text += f" [called {call.get('name')}({json.dumps(call.get('args') or {}, default=str)})]"
+        if len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        lines.append(f"{role}: {text.strip()}")
+    return "\n".join(lines)
+
+
+async def extractive_summary(previous: Optional[str], messages: List[BaseMessage]) -> str:
+    """fallback summarizer that needs no model: the previous summary plus the dropped user requests."""
+    requests = [_text(message.content).strip() for message in messages if isinstance(message, HumanMessage)]
+    parts = [previous] if previous else []
+    if requests:
+        parts.append("earlier the user asked: " + "; ".join(request[:200] for request in requests if request))
+    return "\n".join(parts)
+
+
+def make_model_summarizer(model: Any, max_tokens: int = DEFAULT_MAX_SUMMARY_TOKENS) -> Summarizer:
+    """summarizer that asks a chat model to fold dropped turns into the running summary."""
+
+    async def summarize(previous: Optional[str], messages: List[BaseMessage]) -> str:
+        prompt = (
+            "you maintain a running summary of a conversation between a user and a personal assistant "
+            "that manages their calendar and tasks. update the summary with the messages below. keep "
+            "facts the assistant may need later: names, dates, ids of events and tasks it created or "
+            "changed, decisions and open requests. drop small talk. "
+            f"answer with the summary only, in at most {max_tokens * 3 // 4} words.\n\n"
+            f"current summary:\n{previous or '(none)'}\n\nmessages:\n{transcript(messages)}"
+        )
+        response = await model.ainvoke([HumanMessage(content=prompt)])
+        return _text(response.content).strip()
+
+    return summarize
+
+
+class PreparedHistory:
+    """the history window for one turn, and the state changes that keep it bounded."""
+
+    def __init__(self, messages: List[BaseMessage], removed_ids: List[str], summary: Optional[str], summary_changed: bool):
+        self.messages = messages
+        self.removed_ids = removed_ids
+        self.summary = summary
+        self.summary_changed = summary_changed
+
+    def update(self, new_messages: List[BaseMessage]) -> Dict[str, Any]:
+        """the state update for a turn that produced `new_messages`."""
+        update: Dict[str, Any] = {
+            "messages": [RemoveMessage(id=message_id) for message_id in self.removed_ids] + list(new_messages)
+        }
+        if self.summary_changed:
+            update["conversation_summary"] = self.summary
+        return update
+
+
+class HistoryManager:
+    """
+    keeps the stored conversation under a token budget and builds each turn's
+    prompt from it without mutating the graph state.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_MAX_HISTORY_TOKENS,
+        compact_ratio: float = DEFAULT_COMPACT_RATIO,
+        max_summary_tokens: int = DEFAULT_MAX_SUMMARY_TOKENS,
+        summarize: Optional[Summarizer] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.compact_ratio = compact_ratio
+        self.max_summary_tokens = max_summary_tokens
+        self.summarize = summarize or extractive_summary
+
+    async def prepare(self, state: Dict[str, Any]) -> PreparedHistory:
+        """
+        dedupe the stored messages and, when they're over budget, fold the
+        oldest turns into the summary. the latest turn is always kept whole.
+        """
+        stored = list(state.get("messages") or [])
+        messages = dedupe_messages(stored)
+        kept = {id(message) for message in messages}
+        kept_ids = {message.id for message in messages}
+        # removing by id would also remove a kept message sharing it, so only distinct ids go
+        removed_ids = [
+            message.id for message in stored
+            if id(message) not in kept and message.id and message.id not in kept_ids
+        ]
+
+        summary = state.get("conversation_summary")
+        turns = split_turns(messages)
+        sizes = [sum(estimate_tokens(message) for message in turn) for turn in turns]
+        total = sum(sizes)
+        if total <= self.max_tokens or len(turns) < 2:
+            return PreparedHistory(messages, _unique(removed_ids), summary, False)
+
+        # drop whole turns from the front until we're back under the compaction target
+        target = self.max_tokens * self.compact_ratio
+        dropped = 0
+        while dropped < len(turns) - 1 and total > target:
+            total -= sizes[dropped]
+            dropped += 1
+        evicted = [message for turn in turns[:dropped] for message in turn]
+        try:
+            summary = await self.summarize(summary, evicted)
+        except Exception as e:
+            # losing detail beats failing the turn; keep what the old summary had
+            print(f"history summarization failed, dropping {len(evicted)} messages unsummarized: {e}")
+        summary = _clip(summary, self.max_summary_tokens)
+        removed_ids += [message.id for message in evicted if message.id]
+        kept = [message for turn in turns[dropped:] for message in turn]
+        return PreparedHistory(kept, _unique(removed_ids), summary, True)
+
+    def context_messages(self, state: Dict[str, Any], summary: Optional[str]) -> List[SystemMessage]:
+        """system messages describing the session, rebuilt for every prompt with stable ids."""
+        context = []
+        if state.get("connected_services"):
+            context.append(SystemMessage(
+                content=f"The user has the following services connected: {state['connected_services']}",
+                id=CONTEXT_ID_PREFIX + "connected_services",
+            ))
+        if state.get("user_preferences"):
+            context.append(SystemMessage(
+                content=f"User preferences: {state['user_preferences']}",
+                id=CONTEXT_ID_PREFIX + "user_preferences",
+            ))
+        if summary:
+            context.append(SystemMessage(
+                content=f"Summary of the earlier conversation: {summary}",
+                id=CONTEXT_ID_PREFIX + "summary",
+            ))
+        return context
+
+    def prompt(self, state: Dict[str, Any], history: PreparedHistory) -> List[BaseMessage]:
+        """the messages to send the agent: session context first, then the history window."""
+        return self.context_messages(state, history.summary) + history.messages
+
+    @staticmethod
+    def new_messages(prompt: Sequence[BaseMessage], output: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """messages the agent added to the prompt, without the prompt's own messages or context."""
+        seen = {message.id for message in prompt if message.id}
+        return [
+            message for message in output
+            if message.id not in seen and not (message.id or "").startswith(CONTEXT_ID_PREFIX)
+        ]
+
+
+def _unique(ids: List[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+def _clip(summary: Optional[str], max_tokens: int) -> Optional[str]:
+    if summary and len(summary) > max_tokens * CHARS_PER_TOKEN:
+        # keep the newest part, which covers the turns dropped most recently
+        return "..." + summary[-max_tokens * CHARS_PER_TOKEN:]
+    return summary
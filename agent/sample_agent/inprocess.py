@@ -0,0 +1,164 @@
+"""
+the "inprocess" mcp transport: trusted local server modules are imported into
+the agent process and their handlers called directly, instead of spawning a
+python child per server and talking to it over a pipe.
+
+a connection names the module's file:
+
+    {"transport": "inprocess", "path": "/path/to/calendar_server.py"}
+
+two kinds of module are understood:
+
+- json-lines servers (calendar_server.py, task_server.py), which export a
+  FUNCTIONS dispatch table, WRITE_FUNCTIONS and SCHEMAS, the json schema of
+  each function's arguments. calls go through the same
+  JSONLinesServer.respond as over stdin, so the store lock, error results,
+  JSONFragments encoding and metrics are exactly what a child process would produce.
+- FastMCP servers (math_server.py), called through the FastMCP app's own
+  list_tools / call_tool.
+
+either way the session answers with mcp protocol types, and arguments and
+results are passed through json, so tools behave as they do over stdio. only
+the pipe, the process and the interpreter startup are gone. modules read
+their configuration (CALENDAR_DB_PATH, ...) from the agent's environment, and
+every connection to the same file shares one module and so one store.
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import threading
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp import types
+
+_load_lock = threading.Lock()
+# module file -> the JSONLinesServer dispatching its FUNCTIONS, shared by every connection to it
+_dispatchers: Dict[str, Any] = {}
+
+# arguments of json-lines handlers their server declares no schema for
+JSONL_INPUT_SCHEMA = {"type": "object", "additionalProperties": True}
+
+
+def load_server_module(path: str) -> ModuleType:
+    """
+    import a server module by file path, once per process. its directory goes on
+    sys.path, since the servers import their sibling modules by name.
+    """
+    path = os.path.abspath(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    with _load_lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            if os.path.abspath(getattr(module, "__file__", "") or "") != path:
+                raise ValueError(f"Can't load {path} in process: another module named '{name}' is already loaded")
+            return module
+        directory = os.path.dirname(path)
+        if directory not in sys.path:
+            sys.path.append(directory)
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ValueError(f"Can't load {path} in process: not a python module")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+        return module
+
+
+def _dispatcher(module: ModuleType) -> Any:
+    with _load_lock:
+        dispatcher = _dispatchers.get(module.__file__)
+        if dispatcher is None:
+            # the json-lines servers import jsonl_server from their own directory, so it's loaded by now
+            jsonl_server = importlib.import_module("jsonl_server")
+            dispatcher = jsonl_server.JSONLinesServer(
+                module.FUNCTIONS, getattr(module, "WRITE_FUNCTIONS", ()), name=getattr(module, "SERVER_NAME", module.__name__)
+            )
+            _dispatchers[module.__file__] = dispatcher
+        return dispatcher
+
+
+def _find_app(module: ModuleType) -> Optional[Any]:
+    """the module's FastMCP app (or anything else serving list_tools / call_tool)."""
+    for value in vars(module).values():
+        if inspect.ismodule(value) or inspect.isclass(value):
+            continue
+        if inspect.iscoroutinefunction(getattr(value, "list_tools", None)) and inspect.iscoroutinefunction(
+            getattr(value, "call_tool", None)
+        ):
+            return value
+    return None
+
+
+def _roundtrip(arguments: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
+    """the arguments as the server would have decoded them off the wire, and their encoded size."""
+    encoded = json.dumps(arguments or {})
+    return json.loads(encoded), len(encoded)
+
+
+def _text_result(text: str, is_error: bool = False) -> types.CallToolResult:
+    return types.CallToolResult(content=[types.TextContent(type="text", text=text)], isError=is_error)
+
+
+class InProcessSession:
+    """stands in for a ClientSession, answering from a server module loaded into this process."""
+
+    def __init__(self, connection: Dict[str, Any]):
+        self.path = connection["path"]
+        self._dispatcher: Optional[Any] = None
+        self._app: Optional[Any] = None
+        self._tools: List[types.Tool] = []
+
+    async def initialize(self) -> None:
+        # importing a server loads its store, so keep it off the event loop
+        module = await asyncio.to_thread(load_server_module, self.path)
+        if isinstance(getattr(module, "FUNCTIONS", None), dict):
+            self._dispatcher = _dispatcher(module)
+            schemas = getattr(module, "SCHEMAS", {})
+            self._tools = [
+                types.Tool(
+                    name=name,
+                    description=inspect.getdoc(handler) or "",
+                    inputSchema=schemas.get(name, JSONL_INPUT_SCHEMA),
+                )
+                for name, handler in module.FUNCTIONS.items()
+            ]
+            return
+        self._app = _find_app(module)
+        if self._app is None:
+            raise ValueError(f"{self.path} has neither a FUNCTIONS table nor a FastMCP app to serve in process")
+        self._tools = list(await self._app.list_tools())
+
+    async def list_tools(self) -> types.ListToolsResult:
+        return types.ListToolsResult(tools=self._tools)
+
+    async def send_ping(self) -> types.EmptyResult:
+        return types.EmptyResult()
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> types.CallToolResult:
+        arguments, size = _roundtrip(arguments)
+        if self._dispatcher is not None:
+            # handlers block on the store lock and on big listings, so they run on a worker thread
+            # like they would in the server's own pool. the server's metrics are recorded there too,
+            # tagged with the agent turn's request and thread ids
+            return _text_result(*await asyncio.to_thread(self._dispatcher.respond, name, arguments, None, size))
+        try:
+            result = await self._app.call_tool(name, arguments)
+        except Exception as e:
+            # the mcp server reports tool failures as error results rather than protocol errors
+            return _text_result(str(e), is_error=True)
+        if isinstance(result, tuple):
+            # newer FastMCP versions return (content, structured output)
+            result = result[0]
+        if isinstance(result, dict):
+            return _text_result(json.dumps(result))
+        return types.CallToolResult(content=list(result), isError=False)
@@ -0,0 +1,90 @@
+"""
+per-turn instrumentation for chat_node.
+
+the turn itself, the mcp connect and the tool discovery are timed with
+metrics.span() where they happen. model calls run deep inside the react
+agent, so they're observed through a callback handler attached to the turn's
+config instead: each call's latency and time to first token, its token usage,
+and the number of model calls the turn needed, which is the number of react
+iterations. everything lands in the process metrics (see metrics.py), tagged
+with the turn's request and thread id.
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+
+import metrics
+
+LLM_CALLS = metrics.counter("llm_calls_total", "Chat model calls, by model and status.", ("model", "status"))
+LLM_LATENCY = metrics.histogram("llm_call_seconds", "Chat model call duration.", ("model",))
+LLM_FIRST_TOKEN = metrics.histogram("llm_first_token_seconds", "Time from a streaming chat model call to its first token.", ("model",))
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens used by chat model calls, by model and input/output.", ("model", "kind"))
+REACT_ITERATIONS = metrics.histogram(
+    "chat_react_iterations", "Model calls (react iterations) per chat turn.", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 25)
+)
+
+
+class TurnMetrics(AsyncCallbackHandler):
+    """records every model call made while a turn runs, and counts them as react iterations."""
+
+    def __init__(self):
+        # run id -> (model, start, whether a token has arrived yet)
+        self._running: Dict[UUID, Tuple[str, float, bool]] = {}
+        self.iterations = 0
+
+    async def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self._running[run_id] = (model, time.perf_counter(), False)
+        self.iterations += 1
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        running = self._running.get(run_id)
+        if running is not None and not running[2]:
+            model, start, _ = running
+            LLM_FIRST_TOKEN.observe(time.perf_counter() - start, model)
+            self._running[run_id] = (model, start, True)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model = self._finish(run_id, "success")
+        if model is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                if usage.get("input_tokens"):
+                    LLM_TOKENS.inc(model, "input", amount=usage["input_tokens"])
+                if usage.get("output_tokens"):
+                    LLM_TOKENS.inc(model, "output", amount=usage["output_tokens"])
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: UUID, status: str) -> Optional[str]:
+        running = self._running.pop(run_id, None)
+        if running is None:
+            return None
+        model, start, _ = running
+        elapsed = time.perf_counter() - start
+        LLM_CALLS.inc(model, status)
+        LLM_LATENCY.observe(elapsed, model)
+        metrics.trace("llm_call", model=model, status=status, duration_ms=round(elapsed * 1000, 3), iteration=self.iterations)
+        return model
+
+    def finish_turn(self) -> None:
+        REACT_ITERATIONS.observe(self.iterations)
+
+
+def instrument_config(config: RunnableConfig) -> Tuple[RunnableConfig, Optional[TurnMetrics]]:
+    """the node's config with a TurnMetrics handler added, or unchanged when metrics are off."""
+    if not metrics.ENABLED:
+        return config, None
+    turn_metrics = TurnMetrics()
+    return merge_configs(config, {"callbacks": [turn_metrics]}), turn_metrics
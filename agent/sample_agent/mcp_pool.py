@@ -0,0 +1,564 @@
+"""
+a process-wide pool of mcp sessions, so chat_node doesn't have to spawn and
+handshake every server on every turn.
+
+pooled clients are keyed by a canonical hash of the mcp config, so the same
+config coming from different turns or threads shares one set of sessions.
+every server in a config gets its own long-lived connection task, which means
+we can health check and restart a single dead stdio child without tearing
+down the rest of the config.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+
+import metrics
+from sample_agent.inprocess import InProcessSession
+from sample_agent.tool_cache import MUTATING, PURE, ToolResultCache
+
+# how long a config can sit unused before its sessions get closed
+DEFAULT_IDLE_TTL_SECONDS = 600.0
+# how long a session can go without a ping before it's checked again on acquire
+DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS = 30.0
+DEFAULT_HEALTH_CHECK_TIMEOUT_SECONDS = 5.0
+# upper bound on the number of distinct configs we keep warm at once
+DEFAULT_MAX_CONFIGS = 32
+# tool calls a single server gets in flight at once, across every turn using it
+DEFAULT_MAX_CONCURRENT_CALLS = 8
+
+TOOL_CALLS = metrics.counter("mcp_tool_calls_total", "Tool calls made through the pool, by server, tool and status.", ("server", "tool", "status"))
+SERVER_RESTARTS = metrics.counter("mcp_server_restarts_total", "Servers restarted after dying or failing a health check.", ("server",))
+
+# the tenant (user or team) whose data tool calls made in this context act on. set per turn
+# by chat_node from the agent state, and passed to every server whose connection names a
+# "tenant_arg", so the model can never pick (or spoof) the tenant itself
+_current_tenant: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("mcp_tenant", default=None)
+
+
+@contextmanager
+def tenant_scope(tenant_id: Optional[str]) -> Iterator[None]:
+    """route tool calls made inside the block (and in tasks it starts) to `tenant_id`'s data."""
+    token = _current_tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def config_hash(mcp_config: Dict[str, Any]) -> str:
+    """canonical hash of an mcp config, independent of key order."""
+    canonical = json.dumps(mcp_config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def tools_fingerprint(tools: List[Any]) -> str:
+    """fingerprint of a server's tool list: changes whenever a name, description or schema does."""
+    listing = sorted(
+        ({"name": tool.name, "description": tool.description, "input_schema": tool.inputSchema} for tool in tools),
+        key=lambda entry: entry["name"],
+    )
+    return hashlib.sha256(json.dumps(listing, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def server_identity(connection: Dict[str, Any]) -> str:
+    """
+    what makes two connections reach the same server and so the same data: the module
+    file for inprocess, the command line and environment for stdio, the url for sse.
+    """
+    transport = connection.get("transport", "stdio")
+    if transport == "inprocess":
+        return f"inprocess:{os.path.abspath(connection['path'])}"
+    if transport == "stdio":
+        return "stdio:" + json.dumps(
+            {"command": connection.get("command"), "args": connection.get("args"), "env": connection.get("env")},
+            sort_keys=True, default=str,
+        )
+    return f"{transport}:{connection.get('url')}"
+
+
+class _NotifyingClientSession(ClientSession):
+    """client session that tells its owner when the server says its tool list changed."""
+
+    def __init__(self, *args: Any, on_tools_changed=None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._on_tools_changed = on_tools_changed
+
+    async def _received_notification(self, notification: types.ServerNotification) -> None:
+        await super()._received_notification(notification)
+        if isinstance(notification.root, types.ToolListChangedNotification) and self._on_tools_changed:
+            self._on_tools_changed()
+
+
+class FairReadWriteLock:
+    """
+    asyncio lock for many concurrent readers or one writer, granted strictly
+    in arrival order: a read queued behind a write runs after it, and a
+    write isn't starved by a stream of reads.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        # (is write, future resolved when granted), oldest first
+        self._waiters: "deque[tuple]" = deque()
+
+    async def acquire_read(self) -> None:
+        if not self._writer and not self._waiters:
+            self._readers += 1
+            return
+        await self._wait(False)
+
+    def release_read(self) -> None:
+        self._readers -= 1
+        if not self._readers:
+            self._wake()
+
+    async def acquire_write(self) -> None:
+        if not self._writer and not self._readers and not self._waiters:
+            self._writer = True
+            return
+        await self._wait(True)
+
+    def release_write(self) -> None:
+        self._writer = False
+        self._wake()
+
+    async def _wait(self, write: bool) -> None:
+        entry = (write, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            if entry[1].cancelled():
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                # whoever queued behind us may be able to go now
+                self._wake()
+            else:
+                # granted just as we were cancelled, so hand it back
+                self.release_write() if write else self.release_read()
+            raise
+
+    def _wake(self) -> None:
+        while self._waiters and not self._writer:
+            write, future = self._waiters[0]
+            if future.done():
+                # cancelled while waiting
+                self._waiters.popleft()
+                continue
+            if write and self._readers:
+                return
+            self._waiters.popleft()
+            if write:
+                self._writer = True
+            else:
+                self._readers += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        await self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        await self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ServerConnection:
+    """
+    one long-lived session to a single mcp server.
+
+    the transport and session contexts are entered and exited by a dedicated
+    background task, since anyio requires cancel scopes to be closed by the
+    task that opened them, and the turns using the session come and go.
+    """
+
+    def __init__(self, name: str, connection: Dict[str, Any]):
+        self.name = name
+        self.connection = connection
+        self.session: Optional[ClientSession] = None
+        # raw mcp tool definitions, refreshed on every (re)connect
+        self.tools: List[Any] = []
+        # langchain tools route calls through this object rather than a specific
+        # session, so they keep working after the server is restarted
+        self.langchain_tools: List[BaseTool] = []
+        self.fingerprint = ""
+        # set when the server sends notifications/tools/list_changed
+        self.tools_stale = False
+        self.restarts = 0
+        # bumped every time a session starts, so callers that saw a dead one can tell whether
+        # someone else has already replaced it
+        self.generation = 0
+        # results of pure and read-only tools, invalidated by this server's mutating ones,
+        # whichever config's connection they went through
+        self.cache = ToolResultCache(connection.get("tool_kinds"), server=server_identity(connection))
+        # argument the server takes the tenant id in, if it keeps each tenant's data apart
+        self.tenant_arg: Optional[str] = connection.get("tenant_arg")
+        # calls from every turn share these: reads run side by side, mutations run alone and in
+        # the order they arrived (per tenant, since tenants' data is independent), and at most
+        # `max_concurrency` requests are in flight at once
+        self._calls_locks: Dict[Optional[str], FairReadWriteLock] = {}
+        self._call_slots = asyncio.Semaphore(connection.get("max_concurrency", DEFAULT_MAX_CONCURRENT_CALLS))
+        self._runner: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._last_checked = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def transport(self) -> str:
+        return self.connection.get("transport", "stdio")
+
+    def is_running(self) -> bool:
+        return self.session is not None and self._runner is not None and not self._runner.done()
+
+    async def _open_session(self, stack: AsyncExitStack) -> ClientSession:
+        if self.transport == "inprocess":
+            # no transport to enter: the server module is called directly
+            return InProcessSession(self.connection)
+        if self.transport == "stdio":
+            params = StdioServerParameters(
+                command=self.connection["command"],
+                args=self.connection["args"],
+                env=self.connection.get("env"),
+            )
+            read, write = await stack.enter_async_context(stdio_client(params))
+        elif self.transport == "sse":
+            read, write = await stack.enter_async_context(
+                sse_client(
+                    self.connection["url"],
+                    headers=self.connection.get("headers"),
+                    timeout=self.connection.get("timeout", 5),
+                    sse_read_timeout=self.connection.get("sse_read_timeout", 60 * 5),
+                )
+            )
+        else:
+            raise ValueError(f"Unsupported transport: {self.transport}. Must be 'stdio', 'sse' or 'inprocess'")
+        return await stack.enter_async_context(
+            _NotifyingClientSession(read, write, on_tools_changed=self._mark_tools_stale)
+        )
+
+    def _mark_tools_stale(self) -> None:
+        self.tools_stale = True
+
+    async def _load_tools(self, session: ClientSession) -> None:
+        self.tools_stale = False
+        with metrics.span("mcp_tool_discovery", "Time to list a server's tools.", server=self.name):
+            self.tools = (await session.list_tools()).tools
+        self.langchain_tools = [convert_mcp_tool_to_langchain_tool(self, tool) for tool in self.tools]
+        self.fingerprint = tools_fingerprint(self.tools)
+
+    async def refresh_tools(self) -> None:
+        """re-list the server's tools after it reported a change."""
+        async with self._lock:
+            if self.session is not None:
+                await self._load_tools(self.session)
+
+    async def _run(self, ready: asyncio.Future) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                with metrics.span(
+                    "mcp_server_start", "Time to spawn or connect to a server and initialize its session.",
+                    server=self.name, transport=self.transport,
+                ):
+                    session = await self._open_session(stack)
+                    await session.initialize()
+                await self._load_tools(session)
+                self.session = session
+                ready.set_result(None)
+                await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"mcp server '{self.name}' exited: {e!r}")
+        finally:
+            self.session = None
+
+    async def _start(self) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._runner = asyncio.create_task(self._run(ready), name=f"mcp-session:{self.name}")
+        await ready
+        self.generation += 1
+        self._last_checked = time.monotonic()
+
+    async def _stop(self) -> None:
+        runner, self._runner = self._runner, None
+        if runner is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(runner, DEFAULT_HEALTH_CHECK_TIMEOUT_SECONDS)
+        except Exception:
+            runner.cancel()
+        self.session = None
+
+    async def start(self) -> None:
+        async with self._lock:
+            if not self.is_running():
+                await self._start()
+
+    async def stop(self) -> None:
+        async with self._lock:
+            await self._stop()
+
+    async def restart(self, seen: Optional[int] = None) -> None:
+        """
+        replace the server's session. `seen` is the generation the caller found broken: if
+        another turn has restarted it since and it's running, the new session is kept.
+        """
+        async with self._lock:
+            if seen is not None and self.generation != seen and self.is_running():
+                return
+            await self._stop()
+            await self._start()
+            self.restarts += 1
+            SERVER_RESTARTS.inc(self.name)
+            # the new process may not have seen what the old one served
+            self.cache.invalidate()
+
+    async def ensure_healthy(
+        self,
+        interval: float = DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = DEFAULT_HEALTH_CHECK_TIMEOUT_SECONDS,
+    ) -> None:
+        """ping the server if it hasn't been checked recently, restarting it if it doesn't answer."""
+        if self._runner is None:
+            await self.start()
+            return
+        generation = self.generation
+        if not self.is_running():
+            await self.restart(generation)
+            return
+        if self.tools_stale:
+            await self.refresh_tools()
+        if time.monotonic() - self._last_checked < interval:
+            return
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            self._last_checked = time.monotonic()
+        except Exception as e:
+            print(f"mcp server '{self.name}' failed health check ({e!r}), restarting")
+            await self.restart(generation)
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """session-compatible call_tool, so this object can stand in for a ClientSession."""
+        tenant = _current_tenant.get()
+        if self.tenant_arg:
+            # whatever the model put there is replaced by the turn's tenant. the argument then
+            # also keys the result cache, so tenants never see each other's cached reads
+            arguments = {key: value for key, value in arguments.items() if key != self.tenant_arg}
+            if tenant is not None:
+                arguments[self.tenant_arg] = tenant
+        status = "error"
+        try:
+            with metrics.span(
+                "mcp_tool_call", "Tool call latency as the agent sees it, including locks and the result cache.",
+                server=self.name, tool=name,
+            ):
+                result = await self._call_tool_locked(name, arguments, tenant if self.tenant_arg else None)
+            status = "error" if getattr(result, "isError", False) else "success"
+            return result
+        finally:
+            TOOL_CALLS.inc(self.name, name, status)
+
+    def calls_lock(self, tenant: Optional[str] = None) -> FairReadWriteLock:
+        """the lock ordering calls against one tenant's data on this server."""
+        lock = self._calls_locks.get(tenant)
+        if lock is None:
+            lock = self._calls_locks[tenant] = FairReadWriteLock()
+        return lock
+
+    async def _call_tool_locked(self, name: str, arguments: Dict[str, Any], tenant: Optional[str]) -> Any:
+        kind = self.cache.kind(name)
+        if kind == PURE:
+            # pure results don't depend on the server's data, so they needn't wait on its writes
+            return await self.cache.call(name, arguments, lambda: self._call_tool(name, arguments))
+        lock = self.calls_lock(tenant)
+        async with lock.write() if kind == MUTATING else lock.read():
+            return await self.cache.call(name, arguments, lambda: self._call_tool(name, arguments))
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        async with self._call_slots:
+            return await self._send(name, arguments)
+
+    async def _send(self, name: str, arguments: Dict[str, Any]) -> Any:
+        generation = self.generation
+        if not self.is_running():
+            await self.restart(generation)
+        generation, session = self.generation, self.session
+        try:
+            return await session.call_tool(name, arguments)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            # the child died between health checks, so the request never reached it
+            await self.restart(generation)
+            return await self.session.call_tool(name, arguments)
+
+
+class PooledClient:
+    """the set of server connections for one mcp config."""
+
+    def __init__(self, key: str, mcp_config: Dict[str, Any]):
+        self.key = key
+        self.connections: Dict[str, ServerConnection] = {
+            name: ServerConnection(name, connection) for name, connection in mcp_config.items()
+        }
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+    async def ensure_ready(self, interval: float, timeout: float) -> None:
+        # servers are independent, so spawn / check them all at once
+        results = await asyncio.gather(
+            *(connection.ensure_healthy(interval, timeout) for connection in self.connections.values()),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    def tools_fingerprint(self) -> str:
+        """combined fingerprint of every server's tool list in this config."""
+        return "|".join(f"{name}:{connection.fingerprint}" for name, connection in sorted(self.connections.items()))
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """tool result cache counters of every server in this config."""
+        return {name: connection.cache.stats() for name, connection in self.connections.items()}
+
+    def tool_connections(self) -> Dict[str, ServerConnection]:
+        """the connection serving each tool, by tool name."""
+        return {
+            tool.name: connection
+            for connection in self.connections.values()
+            for tool in connection.langchain_tools
+        }
+
+    def get_tools(self) -> List[BaseTool]:
+        """same contract as MultiServerMCPClient.get_tools()."""
+        all_tools: List[BaseTool] = []
+        for connection in self.connections.values():
+            all_tools.extend(connection.langchain_tools)
+        return all_tools
+
+    async def close(self) -> None:
+        await asyncio.gather(
+            *(connection.stop() for connection in self.connections.values()),
+            return_exceptions=True,
+        )
+
+
+class MCPSessionPool:
+    """
+    keeps mcp sessions alive across chat_node turns and threads.
+
+    configs that haven't been used for `idle_ttl` seconds are closed on the next
+    acquire, and at most `max_configs` configs are kept warm (least recently
+    used first out). configs that are in use by a running turn are never evicted.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = DEFAULT_IDLE_TTL_SECONDS,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS,
+        health_check_timeout: float = DEFAULT_HEALTH_CHECK_TIMEOUT_SECONDS,
+        max_configs: int = DEFAULT_MAX_CONFIGS,
+    ):
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.max_configs = max_configs
+        self._clients: "OrderedDict[str, PooledClient]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def _pop_evictable(self) -> List[PooledClient]:
+        now = time.monotonic()
+        evicted = [
+            client for client in self._clients.values()
+            if client.in_use == 0 and now - client.last_used > self.idle_ttl
+        ]
+        idle_by_age = [client for client in self._clients.values() if client.in_use == 0 and client not in evicted]
+        overflow = len(self._clients) - len(evicted) - self.max_configs
+        if overflow > 0:
+            evicted.extend(idle_by_age[:overflow])
+        for client in evicted:
+            del self._clients[client.key]
+        return evicted
+
+    @asynccontextmanager
+    async def client(self, mcp_config: Dict[str, Any]) -> AsyncIterator[PooledClient]:
+        """
+        check out the pooled client for a config, starting its servers on first use
+        and health checking them on later ones.
+        """
+        key = config_hash(mcp_config)
+        async with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = PooledClient(key, mcp_config)
+                self._clients[key] = client
+            self._clients.move_to_end(key)
+            client.in_use += 1
+            evicted = self._pop_evictable()
+
+        for stale in evicted:
+            await stale.close()
+
+        try:
+            # spawns servers on a cold config; on a warm one it's at most a health check ping
+            with metrics.span("mcp_connect", "Time to check out a config's servers, spawning or reconnecting them if needed."):
+                await client.ensure_ready(self.health_check_interval, self.health_check_timeout)
+            yield client
+        finally:
+            client.in_use -= 1
+            client.last_used = time.monotonic()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """tool result cache counters summed over every pooled server."""
+        totals = {"hits": 0, "misses": 0, "invalidations": 0, "entries": 0}
+        for client in self._clients.values():
+            for stats in client.cache_stats().values():
+                for counter, value in stats.items():
+                    totals[counter] += value
+        return totals
+
+    async def close(self) -> None:
+        async with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.close()
+
+
+# sessions are bound to the event loop that opened them, so keep one pool per loop
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MCPSessionPool]" = weakref.WeakKeyDictionary()
+
+
+def get_session_pool() -> MCPSessionPool:
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = MCPSessionPool()
+        _pools[loop] = pool
+    return pool
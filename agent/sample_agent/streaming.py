@@ -0,0 +1,78 @@
+"""
+streams the react agent's progress to the frontend while a turn runs.
+
+chat_node used to await the whole react loop, so the user saw nothing until
+every tool call had finished. the agent now runs with the node's config,
+customized so copilotkit forwards llm tokens and tool calls through the
+langgraph event stream as they're generated, and the start and finish of
+every tool call is emitted as intermediate `tool_activity` state, so long
+multi-tool turns show progress instead of a spinner.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from copilotkit.langgraph import copilotkit_customize_config, copilotkit_emit_state
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+
+class ToolActivity:
+    """the tool calls of the current turn and whether each is running, done or failed."""
+
+    def __init__(self):
+        self.calls: Dict[str, Dict[str, Any]] = {}
+
+    def observe(self, messages: List[BaseMessage]) -> bool:
+        """update from messages a step produced; returns whether anything changed."""
+        changed = False
+        for message in messages:
+            if isinstance(message, AIMessage):
+                for call in message.tool_calls or ():
+                    if call.get("id") and call["id"] not in self.calls:
+                        self.calls[call["id"]] = {"id": call["id"], "name": call.get("name"), "status": "running"}
+                        changed = True
+            elif isinstance(message, ToolMessage) and message.tool_call_id in self.calls:
+                self.calls[message.tool_call_id]["status"] = "error" if message.status == "error" else "done"
+                changed = True
+        return changed
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [dict(call) for call in self.calls.values()]
+
+
+def streaming_config(config: RunnableConfig) -> RunnableConfig:
+    """the node's config, set up for copilotkit to forward messages and tool calls as they stream."""
+    # copilotkit_customize_config writes into the metadata it's given, so hand it a copy
+    base = {**config, "metadata": dict(config.get("metadata") or {})}
+    return copilotkit_customize_config(base, emit_messages=True, emit_tool_calls=True)
+
+
+async def run_agent(
+    react_agent: Any,
+    agent_input: Dict[str, Any],
+    config: RunnableConfig,
+    state: Optional[Dict[str, Any]] = None,
+    streaming: bool = True,
+) -> Dict[str, Any]:
+    """
+    run the react agent for one turn and return its final state. with
+    `streaming`, tokens and tool calls reach the frontend as they happen and
+    tool progress is emitted as `tool_activity` alongside the rest of `state`.
+    """
+    if not streaming:
+        return await react_agent.ainvoke(agent_input, config)
+
+    config = streaming_config(config)
+    visible_state = {key: value for key, value in (state or {}).items() if key != "messages"}
+    activity = ToolActivity()
+    final: Dict[str, Any] = {}
+    # tool calls already in the prompt's history belong to earlier turns
+    observed = len(agent_input.get("messages", []))
+    # run inside a parent graph, the agent streams in the parent's mode rather than its own,
+    # so progress comes from the full state after each step; the react agent only appends
+    async for final in react_agent.astream(agent_input, config, stream_mode="values"):
+        messages = final.get("messages", [])
+        if activity.observe(messages[observed:]):
+            await copilotkit_emit_state(config, {**visible_state, "tool_activity": activity.to_list()})
+        observed = len(messages)
+    return final
@@ -0,0 +1,186 @@
+"""
+caches mcp tool results in the agent, so a react loop that re-asks a server
+the same question doesn't pay another round trip for it.
+
+every tool is one of three kinds:
+
+- pure: the result only depends on the arguments (math's add / multiply), so
+  it's cached until evicted.
+- read_only: reads the server's data (get_events, get_tasks, ...). cached per
+  server, and dropped whenever a mutating tool runs on that server, or after
+  `read_ttl` seconds in case the data was changed from somewhere else.
+  every config gets its own connections and caches, but configs naming the
+  same server (module path or stdio command) share its data, so a write
+  through any of them drops the reads cached by all of them.
+- mutating: never cached, and invalidates the server's read_only results.
+
+tools nobody declared are treated as mutating, which costs cache hits but
+never serves a stale read.
+"""
+
+import asyncio
+import json
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+PURE = "pure"
+READ_ONLY = "read_only"
+MUTATING = "mutating"
+TOOL_KINDS = (PURE, READ_ONLY, MUTATING)
+
+# declared kinds of the tools served by the bundled servers. a connection can
+# add to or override these with a "tool_kinds" entry in its mcp config
+DEFAULT_TOOL_KINDS: Dict[str, str] = {
+    # math_server.py
+    "add": PURE,
+    "multiply": PURE,
+    # calendar_server.py
+    "get_events": READ_ONLY,
+    "search_events": READ_ONLY,
+    "find_available_slots": READ_ONLY,
+    "find_conflicts": READ_ONLY,
+    # task_server.py
+    "get_tasks": READ_ONLY,
+    "search_tasks": READ_ONLY,
+    "get_task_summary": READ_ONLY,
+}
+
+# results kept per server, least recently used first out
+DEFAULT_MAX_ENTRIES = 256
+# how long a read_only result is trusted without a write through a connection to its server
+DEFAULT_READ_TTL_SECONDS = 30.0
+
+# server identity -> the result cache of every connection to that server
+_server_caches: Dict[str, "weakref.WeakSet[ToolResultCache]"] = {}
+
+
+def normalize_arguments(arguments: Optional[Dict[str, Any]]) -> str:
+    """
+    canonical form of a call's arguments: keys sorted and None values dropped,
+    since the servers treat an explicit null the same as a missing argument.
+    """
+    normalized = {key: value for key, value in (arguments or {}).items() if value is not None}
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """
+    result cache for one server's tools, with hit / miss counters.
+
+    identical reads that arrive while one is already in flight wait for it
+    instead of sending their own request. a read that was in flight while a
+    write ran isn't stored, since it may have seen the data before the write.
+    """
+
+    def __init__(
+        self,
+        tool_kinds: Optional[Dict[str, str]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        read_ttl: float = DEFAULT_READ_TTL_SECONDS,
+        server: Optional[str] = None,
+    ):
+        self.tool_kinds = {**DEFAULT_TOOL_KINDS, **(tool_kinds or {})}
+        unknown = {kind for kind in self.tool_kinds.values() if kind not in TOOL_KINDS}
+        if unknown:
+            raise ValueError(f"Unknown tool kinds: {sorted(unknown)}. Must be one of {TOOL_KINDS}")
+        self.max_entries = max_entries
+        self.read_ttl = read_ttl
+        # (tool, normalized arguments) -> (result, stored at)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # bumped by every write, so reads that overlapped one aren't stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # caches of other connections to the same server, whose reads our writes make stale
+        self.server = server
+        if server is not None:
+            _server_caches.setdefault(server, weakref.WeakSet()).add(self)
+
+    def kind(self, name: str) -> str:
+        return self.tool_kinds.get(name, MUTATING)
+
+    def invalidate(self) -> None:
+        """drop the cached reads, after a write or when the server restarts."""
+        self._generation += 1
+        self.invalidations += 1
+        self._entries = OrderedDict((key, entry) for key, entry in self._entries.items() if self.kind(key[0]) == PURE)
+
+    def invalidate_server(self) -> None:
+        """drop the cached reads of every connection to this cache's server, after a write."""
+        peers = _server_caches.get(self.server) if self.server is not None else None
+        for cache in list(peers) if peers else [self]:
+            cache.invalidate()
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        result, stored_at = entry
+        if self.kind(key[0]) == READ_ONLY and time.monotonic() - stored_at > self.read_ttl:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def _store(self, key: Tuple[str, str], result: Any) -> None:
+        self._entries[key] = (result, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def call(self, name: str, arguments: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """the result of `call()` for tool `name`, served from the cache when the tool's kind allows."""
+        kind = self.kind(name)
+        if kind == MUTATING:
+            try:
+                return await call()
+            finally:
+                # even a failed write may have changed something
+                self.invalidate_server()
+
+        key = (name, normalize_arguments(arguments))
+        found, result = self._lookup(key)
+        if found:
+            self.hits += 1
+            return result
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.hits += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await call()
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody may be waiting on it; don't let asyncio log it as unretrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            # tool errors come back as results; those aren't worth keeping
+            if generation == self._generation and not getattr(result, "isError", False):
+                self._store(key, result)
+            return result
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
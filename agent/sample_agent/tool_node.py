@@ -0,0 +1,90 @@
+"""
+runs the tool calls of one react step concurrently across mcp servers.
+
+when the model asks for `get_events` and `get_task_summary` in the same step,
+the two go to different stdio servers and run at the same time, so the step
+takes as long as the slowest call rather than their sum. calls to the same
+server keep their order whenever a mutation is involved: the server's calls
+are split into phases at each mutating call, reads within a phase run
+together, and each phase starts once the one before it has finished.
+
+the order is fixed here, before anything is dispatched, since the calls'
+callbacks can yield to the event loop and reshuffle them before they reach
+the server. per-server concurrency limits and ordering against other turns
+are enforced by ServerConnection.call_tool.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.types import Command
+
+from sample_agent.mcp_pool import ServerConnection
+from sample_agent.tool_cache import MUTATING
+from sample_agent.tool_selection import CALL_TOOL
+
+
+class ServerAwareToolNode(ToolNode):
+    """ToolNode that groups a step's tool calls by the mcp server serving them."""
+
+    def __init__(self, tools: Sequence[BaseTool], tool_connections: Dict[str, ServerConnection], **kwargs: Any):
+        super().__init__(tools, **kwargs)
+        self.tool_connections = tool_connections
+
+    def _phases(self, tool_calls: List[Dict[str, Any]]) -> List[List[List[int]]]:
+        """
+        indexes of the calls, grouped per server and split into phases that run
+        one after another. tools that don't belong to an mcp server each get
+        their own group; call_tool counts as the tool it calls.
+        """
+        groups: Dict[Any, List[List[int]]] = {}
+        for index, call in enumerate(tool_calls):
+            name = call["name"]
+            if name == CALL_TOOL and isinstance(call.get("args"), dict):
+                name = call["args"].get("name", name)
+            connection = self.tool_connections.get(name) if isinstance(name, str) else None
+            if connection is None:
+                groups[("local", index)] = [[index]]
+                continue
+            phases = groups.setdefault(connection.name, [])
+            if connection.cache.kind(name) == MUTATING:
+                phases.append([index])
+                # whatever follows the mutation must wait for it
+                phases.append([])
+            elif phases:
+                phases[-1].append(index)
+            else:
+                phases.append([index])
+        return [[phase for phase in phases if phase] for phases in groups.values()]
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: Optional[Any]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        outputs: List[Any] = [None] * len(tool_calls)
+
+        async def run(phases: List[List[int]]) -> None:
+            for phase in phases:
+                results = await asyncio.gather(
+                    *(self._arun_one(tool_calls[index], input_type, config) for index in phase)
+                )
+                for index, output in zip(phase, results):
+                    outputs[index] = output
+
+        await asyncio.gather(*(run(phases) for phases in self._phases(tool_calls)))
+        return self._combine(outputs, input_type)
+
+    def _combine(self, outputs: List[Any], input_type: str) -> Any:
+        """
+        the node's update from its tool messages and commands, shaped the way ToolNode
+        returns them. built here rather than through ToolNode's own helper, which not
+        every locked langgraph-prebuilt version has.
+        """
+        if not any(isinstance(output, Command) for output in outputs):
+            return outputs if input_type == "list" else {self.messages_key: outputs}
+        # langgraph applies a list of commands and plain updates one after another
+        return [
+            output if isinstance(output, Command) else ([output] if input_type == "list" else {self.messages_key: [output]})
+            for output in outputs
+        ]
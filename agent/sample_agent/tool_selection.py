@@ -0,0 +1,205 @@
+"""
+picks the tools a turn's model gets to see.
+
+every bound tool's name, description and argument schema is sent with every
+model call, so once a few marketplace servers are configured the tool schemas
+outweigh the conversation, and the model gets slower at picking among them.
+configs with more than `min_tools` tools are therefore given, per turn:
+
+- the `top_k` tools whose names, descriptions and arguments best match the
+  latest user message, ranked with bm25 (text_index.TextIndex, the same index
+  the servers search events and tasks with),
+- every tool called in the `recent_turns` turns before this one, so follow-ups work,
+- two escape hatches: `search_tools`, to find a tool that wasn't selected by
+  what it does, and `call_tool`, to call any tool of the config by name.
+
+smaller configs get every tool, as before. the agent is compiled once per
+distinct selection (see AgentCache), so turns that need the same tools share it.
+"""
+
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+from text_index import TextIndex
+
+SEARCH_TOOLS = "search_tools"
+CALL_TOOL = "call_tool"
+ESCAPE_HATCHES = (SEARCH_TOOLS, CALL_TOOL)
+
+# configs with at most this many tools are given all of them
+DEFAULT_MIN_TOOLS = 32
+# tools selected by relevance to the user's message
+DEFAULT_TOP_K = 8
+# tools called in this many turns before the current one stay selected
+DEFAULT_RECENT_TURNS = 2
+# matches search_tools returns unless asked for more
+DEFAULT_SEARCH_LIMIT = 5
+# tool sets whose indexes are kept, one per config and tool list
+MAX_CATALOGS = 16
+
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _words(name: str) -> str:
+    # "getTasks" and "get_tasks" both index as "get tasks"
+    return _CAMEL_RE.sub(" ", name).replace("_", " ").replace("-", " ")
+
+
+def tool_arguments(tool: BaseTool) -> Dict[str, Any]:
+    # mcp tools without arguments may have a schema with no properties at all
+    try:
+        return tool.args or {}
+    except KeyError:
+        return {}
+
+
+def _arguments_text(tool: BaseTool) -> List[str]:
+    text = []
+    for name, schema in tool_arguments(tool).items():
+        text.append(_words(name))
+        if isinstance(schema, dict) and schema.get("description"):
+            text.append(schema["description"])
+    return text
+
+
+# how much a match in each part of a tool counts: its name says most about what it does
+TOOL_FIELDS = {
+    "name": (lambda tool: _words(tool.name), 3.0),
+    "description": (lambda tool: tool.description, 1.0),
+    "arguments": (_arguments_text, 0.5),
+}
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        part if isinstance(part, str) else str(part.get("text", ""))
+        for part in content or ()
+        if isinstance(part, (str, dict))
+    )
+
+
+class ToolCatalog:
+    """every tool of a config, indexed for search."""
+
+    def __init__(self, tools: Sequence[BaseTool]):
+        self.tools = list(tools)
+        self.by_name: Dict[str, BaseTool] = {tool.name: tool for tool in self.tools}
+        self._order = {tool.name: index for index, tool in enumerate(self.tools)}
+        self.index = TextIndex(TOOL_FIELDS)
+        self.index.extend((tool.name, tool) for tool in self.tools)
+
+    def search(self, query: str, limit: int) -> List[BaseTool]:
+        return [self.by_name[name] for _, name in self.index.search(query, limit)]
+
+    def ordered(self, names: Any) -> List[str]:
+        """the known tool names among `names`, in the config's order, so equal selections look equal."""
+        return sorted((name for name in set(names) if name in self._order), key=self._order.__getitem__)
+
+    def escape_hatches(self) -> List[BaseTool]:
+        """the search_tools and call_tool tools, reaching every tool in the catalog."""
+
+        async def search_tools(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> str:
+            matches = self.search(query, max(1, min(int(limit), 20)))
+            if not matches:
+                return json.dumps({"tools": [], "message": "No tools match; try other words."})
+            return json.dumps({
+                "tools": [
+                    {"name": tool.name, "description": tool.description, "arguments": tool_arguments(tool)}
+                    for tool in matches
+                ]
+            }, default=str)
+
+        async def call_tool(name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+            tool = self.by_name.get(name)
+            if tool is None or name in ESCAPE_HATCHES:
+                suggestions = [tool.name for tool in self.search(name, 3)]
+                return f"Unknown tool '{name}'. Similar tools: {', '.join(suggestions) or 'none'}. Use {SEARCH_TOOLS} to find one."
+            return await tool.ainvoke(arguments or {})
+
+        return [
+            StructuredTool.from_function(
+                coroutine=search_tools,
+                name=SEARCH_TOOLS,
+                description=(
+                    "Find tools by what they do when none of the available tools fits. Returns matching tools "
+                    f"with their descriptions and arguments; call them with {CALL_TOOL}."
+                ),
+            ),
+            StructuredTool.from_function(
+                coroutine=call_tool,
+                name=CALL_TOOL,
+                description=f"Call a tool found with {SEARCH_TOOLS} by its name, with its arguments as an object.",
+            ),
+        ]
+
+
+class ToolSelector:
+    def __init__(
+        self,
+        top_k: int = DEFAULT_TOP_K,
+        min_tools: int = DEFAULT_MIN_TOOLS,
+        recent_turns: int = DEFAULT_RECENT_TURNS,
+    ):
+        self.top_k = top_k
+        self.min_tools = min_tools
+        self.recent_turns = recent_turns
+        self._catalogs: "OrderedDict[str, ToolCatalog]" = OrderedDict()
+
+    def catalog(self, key: str, tools: Sequence[BaseTool]) -> ToolCatalog:
+        """the catalog of a tool set, built once per `key` (the config and its tools' fingerprint)."""
+        catalog = self._catalogs.get(key)
+        if catalog is None:
+            catalog = self._catalogs[key] = ToolCatalog(tools)
+            while len(self._catalogs) > MAX_CATALOGS:
+                self._catalogs.popitem(last=False)
+        self._catalogs.move_to_end(key)
+        return catalog
+
+    def enabled(self, tools: Sequence[BaseTool]) -> bool:
+        # the escape hatches' names must stay unambiguous
+        return len(tools) > self.min_tools and not any(tool.name in ESCAPE_HATCHES for tool in tools)
+
+    def recent_tools(self, messages: Sequence[BaseMessage]) -> List[str]:
+        """
+        names of the tools called in the `recent_turns` turns before the current one (the turn
+        of the latest user message), including through call_tool.
+        """
+        names, turns = [], 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                # the first one found opens the current turn, which doesn't count
+                turns += 1
+                if turns > self.recent_turns:
+                    break
+            elif isinstance(message, AIMessage):
+                for call in message.tool_calls or ():
+                    if call.get("name") == CALL_TOOL:
+                        names.append((call.get("args") or {}).get("name"))
+                    else:
+                        names.append(call.get("name"))
+        return [name for name in names if isinstance(name, str)]
+
+    def select(self, catalog: ToolCatalog, messages: Sequence[BaseMessage]) -> List[str]:
+        """names of the tools to bind for a turn, in the config's order."""
+        query = next((message_text(message) for message in reversed(messages) if isinstance(message, HumanMessage)), "")
+        relevant = [name for _, name in catalog.index.search(query, self.top_k)] if query else []
+        return catalog.ordered(relevant + self.recent_tools(messages))
+
+
+def selector_from_env() -> Optional[ToolSelector]:
+    """the selector configured by TOOL_SELECTION* settings, or None when it's switched off."""
+    if os.environ.get("TOOL_SELECTION", "true").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    return ToolSelector(
+        top_k=int(os.environ.get("TOOL_SELECTION_TOP_K", DEFAULT_TOP_K)),
+        min_tools=int(os.environ.get("TOOL_SELECTION_MIN_TOOLS", DEFAULT_MIN_TOOLS)),
+    )
@@ -0,0 +1,192 @@
+import heapq
+import itertools
+from datetime import date, datetime, time, timedelta
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+Interval = Tuple[datetime, datetime]
+
+# Slot orderings find_slots() understands
+RANKINGS = ("earliest", "spacious")
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+class WorkingHours(NamedTuple):
+    """Daily working window of an attendee, in their own time zone."""
+    start: time = time(9, 0)
+    end: time = time(17, 0)
+    days: frozenset = frozenset(range(7))
+    time_zone: Optional[ZoneInfo] = None
+
+def _parse_time(value: Any) -> time:
+    if isinstance(value, time):
+        return value
+    hour, _, minute = str(value).strip().partition(":")
+    return time(int(hour), int(minute or 0))
+
+def _parse_day(value: Any) -> int:
+    if isinstance(value, int) and 0 <= value < 7:
+        return value
+    name = str(value).strip().lower()[:3]
+    if name not in WEEKDAYS:
+        raise ValueError(f"Unknown weekday: {value}")
+    return WEEKDAYS.index(name)
+
+def parse_working_hours(spec: Optional[Dict[str, Any]], default: WorkingHours = WorkingHours()) -> WorkingHours:
+    """Working hours from `{"start": "09:00", "end": "17:00", "days": [...], "time_zone": ...}`.
+
+    Missing keys fall back to `default`; days are 0-6 (Monday first) or names like "mon".
+    """
+    if not spec:
+        return default
+    if not isinstance(spec, dict):
+        raise ValueError("Working hours must be an object")
+    days = spec.get("days")
+    time_zone = spec.get("time_zone")
+    return WorkingHours(
+        start=_parse_time(spec["start"]) if "start" in spec else default.start,
+        end=_parse_time(spec["end"]) if "end" in spec else default.end,
+        days=frozenset(_parse_day(day) for day in days) if days is not None else default.days,
+        time_zone=ZoneInfo(time_zone) if time_zone else default.time_zone,
+    )
+
+def working_windows(
+    hours: WorkingHours,
+    first_day: date,
+    last_day: date,
+    calendar_zone: Optional[ZoneInfo] = None,
+) -> List[Interval]:
+    """Working windows for the days from `first_day` to `last_day`, in calendar-local time.
+
+    Hours in another time zone are converted to `calendar_zone`. Windows that
+    end at or before their start run past midnight.
+    """
+    if hours.time_zone is not None and calendar_zone is None:
+        raise ValueError("A calendar time zone is required when working hours have their own time zone")
+    convert = hours.time_zone is not None and hours.time_zone != calendar_zone
+    # A time zone shift can pull a neighbouring day's window into the range
+    day = first_day - timedelta(days=1) if convert else first_day
+    last = last_day + timedelta(days=1) if convert else last_day
+
+    windows = []
+    while day <= last:
+        if day.weekday() in hours.days:
+            start = datetime.combine(day, hours.start)
+            end = datetime.combine(day, hours.end)
+            if end <= start:
+                end += timedelta(days=1)
+            if convert:
+                start = start.replace(tzinfo=hours.time_zone).astimezone(calendar_zone).replace(tzinfo=None)
+                end = end.replace(tzinfo=hours.time_zone).astimezone(calendar_zone).replace(tzinfo=None)
+            windows.append((start, end))
+        day += timedelta(days=1)
+    return windows
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Union of intervals given in start order, merged in a single sweep.
+
+    Several start-ordered streams (one per attendee, say) can be combined
+    with `heapq.merge` first.
+    """
+    merged: List[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        elif end > start:
+            merged.append((start, end))
+    return merged
+
+def intersect(window_lists: Sequence[Iterable[Interval]]) -> List[Interval]:
+    """Times covered by every one of `window_lists`, found by sweeping over their boundaries."""
+    boundaries = []
+    for windows in window_lists:
+        for start, end in merge_intervals(sorted(windows)):
+            boundaries.append((start, 1))
+            boundaries.append((end, -1))
+    # At equal times ends (-1) sort before starts, so touching windows don't overlap
+    boundaries.sort()
+
+    needed = len(window_lists)
+    depth, opened, result = 0, None, []
+    for at, delta in boundaries:
+        depth += delta
+        if depth == needed:
+            opened = at
+        elif opened is not None:
+            if at > opened:
+                result.append((opened, at))
+            opened = None
+    return result
+
+def free_gaps(windows: List[Interval], busy: List[Interval]) -> Iterator[Interval]:
+    """Parts of the start-ordered, disjoint `windows` not covered by the merged `busy` intervals."""
+    i = 0
+    for start, end in windows:
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        cursor, j = start, i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                yield cursor, busy[j][0]
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            yield cursor, end
+
+def overlapping_pairs(events: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+    """Every pair of overlapping events among `events`, which must be in start order.
+
+    A sweep keeps the events still running in a heap by end time, so each
+    event is only paired with those it overlaps: O(n log n + pairs) rather
+    than comparing every pair.
+    """
+    running: List[Tuple[datetime, int, Any]] = []
+    for order, event in enumerate(events):
+        while running and running[0][0] <= event.start_time:
+            heapq.heappop(running)
+        for _, _, other in sorted(running, key=itemgetter(1)):
+            yield other, event
+        heapq.heappush(running, (event.end_time, order, event))
+
+def _align(moment: datetime, step: timedelta) -> datetime:
+    """Round `moment` up to the next multiple of `step` since midnight."""
+    midnight = datetime.combine(moment.date(), time())
+    return midnight + -((midnight - moment) // step) * step
+
+def candidate_slots(gaps: Iterable[Interval], duration: timedelta, step: timedelta) -> Iterator[Tuple[datetime, datetime, timedelta]]:
+    """Every `duration` slot starting on a `step` boundary inside the gaps, with its slack.
+
+    Slack is the free time on the tighter side of the slot within its gap.
+    """
+    for gap_start, gap_end in gaps:
+        start = _align(gap_start, step)
+        while start + duration <= gap_end:
+            yield start, start + duration, min(start - gap_start, gap_end - start - duration)
+            start += step
+
+def find_slots(
+    windows: List[Interval],
+    busy: List[Interval],
+    duration: timedelta,
+    step: timedelta,
+    limit: int,
+    rank: str = "earliest",
+) -> List[Interval]:
+    """The `limit` best free slots of `duration` within `windows` that avoid `busy`.
+
+    "earliest" ranks slots chronologically and stops generating candidates
+    once it has enough; "spacious" prefers slots with the most free time
+    around them, earliest first among equals.
+    """
+    if duration <= timedelta(0) or step <= timedelta(0):
+        raise ValueError("Slot duration and granularity must be positive")
+    candidates = candidate_slots(free_gaps(windows, busy), duration, step)
+    if rank == "earliest":
+        best = itertools.islice(candidates, limit)
+    elif rank == "spacious":
+        best = heapq.nsmallest(limit, candidates, key=lambda slot: (-slot[2], slot[0]))
+    else:
+        raise ValueError(f"Unknown rank: {rank}. Expected one of: {', '.join(RANKINGS)}")
+    return [(start, end) for start, end, _ in best]
@@ -0,0 +1,219 @@
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import metrics
+
+# Values of a *_DB_PATH setting that mean "don't persist anything"
+MEMORY_PATHS = ("", ":memory:", "memory")
+
+DEFAULT_COMMIT_INTERVAL = 0.005
+# Delay before retrying a failed commit, doubled after every further failure up to the max
+COMMIT_RETRY_DELAY = 0.05
+MAX_COMMIT_RETRY_DELAY = 5.0
+# Commit attempts a batch gets while the database stays locked, before its writes are dropped
+MAX_COMMIT_ATTEMPTS = 10
+
+COMMIT_FAILURES = metrics.counter("storage_commit_failures_total", "Group commits that failed, by table.", ("table",))
+RETRIED_WRITES = metrics.counter("storage_retried_writes_total", "Queued writes put back for another commit attempt, by table.", ("table",))
+DROPPED_WRITES = metrics.counter("storage_dropped_writes_total", "Queued writes dropped because their commit kept failing, by table.", ("table",))
+
+def _transient(error: Exception) -> bool:
+    # Another connection holding the database; anything else fails the same way next time
+    return isinstance(error, sqlite3.OperationalError) and any(word in str(error).lower() for word in ("locked", "busy"))
+
+def _encode(record: Union[Dict[str, Any], str]) -> str:
+    # Records may come already encoded (e.g. a record's cached JSON)
+    return record if isinstance(record, str) else json.dumps(record)
+
+class MemoryBackend:
+    """Storage backend that keeps nothing; data lives only in the server's indexes."""
+
+    def load(self) -> List[Dict[str, Any]]:
+        return []
+
+    def put(self, record_id: str, record: Union[Dict[str, Any], str]) -> None:
+        pass
+
+    def delete(self, record_id: str) -> None:
+        pass
+
+    def put_many(self, records: List[Tuple[str, Union[Dict[str, Any], str]]]) -> None:
+        pass
+
+    def delete_many(self, record_ids: List[str]) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class SQLiteBackend:
+    """Records persisted as JSON documents in a local SQLite database in WAL mode.
+
+    Writes are queued and committed by a background thread in groups: every
+    write made within `commit_interval` seconds of the first one shares a
+    single transaction and WAL sync, so bursts of writes don't pay one commit
+    each. Records keep the sequence number of their first insert, so `load()`
+    returns them in the order they were created.
+
+    Writes are acknowledged once queued, so a batch that fails to commit
+    because the database is locked is kept at the head of the queue and
+    retried with backoff, up to `MAX_COMMIT_ATTEMPTS` times. A batch that
+    fails any other way (a constraint, a bad record, ...), or keeps failing,
+    is dropped so later writes aren't stuck behind it. Failures are logged
+    and counted in `storage_commit_failures_total` and
+    `storage_dropped_writes_total`.
+    """
+
+    def __init__(self, path: str, table: str = "records", commit_interval: float = DEFAULT_COMMIT_INTERVAL):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self.commit_interval = commit_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, data TEXT NOT NULL)"
+        )
+        # Queued (id, json or None for a delete) writes, in order
+        self._pending: List[Tuple[str, Optional[str]]] = []
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._closed = False
+        # Consecutive failed commits of the batch at the head of the queue
+        self._failures = 0
+        self._flusher = threading.Thread(target=self._run, name=f"{table}-group-commit", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Every stored record, in creation order."""
+        with self._commit_lock:
+            rows = self._conn.execute(f"SELECT data FROM {self.table} ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def put(self, record_id: str, record: Union[Dict[str, Any], str]) -> None:
+        """Queue an insert or update of a record."""
+        self._enqueue(record_id, _encode(record))
+
+    def delete(self, record_id: str) -> None:
+        """Queue the removal of a record."""
+        self._enqueue(record_id, None)
+
+    def put_many(self, records: List[Tuple[str, Union[Dict[str, Any], str]]]) -> None:
+        """Queue several inserts or updates; they're committed in the same transaction."""
+        self._enqueue_many([(record_id, _encode(record)) for record_id, record in records])
+
+    def delete_many(self, record_ids: List[str]) -> None:
+        """Queue several removals; they're committed in the same transaction."""
+        self._enqueue_many([(record_id, None) for record_id in record_ids])
+
+    def _enqueue(self, record_id: str, data: Optional[str]) -> None:
+        self._enqueue_many([(record_id, data)])
+
+    def _enqueue_many(self, writes: List[Tuple[str, Optional[str]]]) -> None:
+        # Writes queued together are always taken, and so committed, together
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Storage for {self.table} is closed")
+            self._pending.extend(writes)
+        self._wakeup.set()
+
+    def _commit(self, batch: List[Tuple[str, Optional[str]]]) -> None:
+        self._conn.execute("BEGIN")
+        try:
+            for record_id, data in batch:
+                if data is None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (record_id,))
+                else:
+                    self._conn.execute(
+                        f"INSERT INTO {self.table} (id, data) VALUES (?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                        (record_id, data),
+                    )
+            self._conn.execute("COMMIT")
+        except Exception:
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                # Nothing left to roll back; the commit's own error is the one to report
+                pass
+            raise
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            # Give writes arriving right behind this one a chance to join the group
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                if not self._failures:
+                    # The batch was dropped, and flush() said so
+                    continue
+                delay = min(MAX_COMMIT_RETRY_DELAY, COMMIT_RETRY_DELAY * 2 ** (self._failures - 1))
+                print(f"Failed to commit writes to {self.path}: {e}; retrying in {delay:g}s", file=sys.stderr)
+                # Sleep on the close flag, so closing doesn't wait out the backoff
+                self._closing.wait(delay)
+
+    def flush(self) -> None:
+        """Commit everything queued so far before returning."""
+        # Batches are taken under the commit lock so they're committed in the order they were queued
+        with self._commit_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._wakeup.clear()
+            if not batch:
+                return
+            try:
+                self._commit(batch)
+                self._failures = 0
+            except Exception as e:
+                self._failures += 1
+                COMMIT_FAILURES.inc(self.table)
+                metrics.trace("storage_commit_failed", table=self.table, path=self.path, writes=len(batch), error=repr(e))
+                if _transient(e) and self._failures < MAX_COMMIT_ATTEMPTS:
+                    # Keep the writes ahead of anything queued since, so the retry commits them in order
+                    with self._lock:
+                        self._pending[:0] = batch
+                        self._wakeup.set()
+                    RETRIED_WRITES.inc(self.table, amount=len(batch))
+                else:
+                    # Retrying can't fix it, so don't hold up the writes queued behind it
+                    DROPPED_WRITES.inc(self.table, amount=len(batch))
+                    print(f"Dropped {len(batch)} writes to {self.path} after {self._failures} failed commits: {e}", file=sys.stderr)
+                    self._failures = 0
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._closing.set()
+        self._wakeup.set()
+        self._flusher.join()
+        try:
+            # Last attempt; if it fails too the writes are lost, and the error says so
+            self.flush()
+        finally:
+            self._conn.close()
+
+def open_backend(path: Optional[str], table: str = "records"):
+    """Open the storage backend for a server; in-memory when persistence is disabled."""
+    if path is None or path.strip() in MEMORY_PATHS:
+        return MemoryBackend()
+    return SQLiteBackend(path, table=table)
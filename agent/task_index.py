@@ -0,0 +1,455 @@
+import bisect
+import math
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+from text_index import TextIndex
+
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+# Sort modes supported by get_tasks, plus plain insertion order
+SORT_MODES = ("created_at", "due_date", "priority", "insertion")
+
+def _sort_key(task: Any, mode: str, seq: int) -> Tuple:
+    """Sort key for a task under a given mode; seq keeps ties in insertion order."""
+    if mode == "created_at":
+        return (task.created_at, seq)
+    if mode == "due_date":
+        # Tasks without a due date sort after every dated task
+        return ((1,) if task.due_date is None else (0, task.due_date), seq)
+    if mode == "priority":
+        return (PRIORITY_ORDER.get(task.priority, 3) if _is_hashable(task.priority) else 3, seq)
+    return (seq,)
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+# Text search() matches, and how much a token in each field counts
+TEXT_FIELDS = {
+    "title": (lambda task: task.title, 3.0),
+    "tags": (lambda task: task.tags, 2.0),
+    "assignee": (lambda task: task.assignee, 1.0),
+    "description": (lambda task: task.description, 1.0),
+}
+
+class _InvertedIndex:
+    """Maps a field value to the ids of the tasks holding it."""
+
+    def __init__(self):
+        self.postings: Dict[Hashable, Set[str]] = {}
+        # Ids whose value can't be hashed; they're candidates for every lookup
+        self.unhashable: Set[str] = set()
+
+    def add(self, value: Any, task_id: str) -> None:
+        try:
+            ids = self.postings.get(value)
+        except TypeError:
+            self.unhashable.add(task_id)
+            return
+        if ids is None:
+            self.postings[value] = {task_id}
+        else:
+            ids.add(task_id)
+
+    def discard(self, value: Any, task_id: str) -> None:
+        if _is_hashable(value):
+            ids = self.postings.get(value)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self.postings[value]
+        else:
+            self.unhashable.discard(task_id)
+
+    def lookup(self, value: Any) -> Set[str]:
+        ids = self.postings.get(value, set())
+        return ids | self.unhashable if self.unhashable else ids
+
+class TaskIndex:
+    """In-memory task store with secondary indexes.
+
+    Tasks are held in an id map (in insertion order) with inverted indexes on
+    completed, priority, assignee and tag, and an ordered array per sort mode.
+    The due_date order doubles as the range index for due-date filters.
+    Running totals and a due-date order of the open tasks back `summary()`,
+    and a full-text index over TEXT_FIELDS backs `search()`.
+    Indexed fields are snapshotted on every write, so call `reindex()` after
+    mutating a task in place.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, Any] = {}
+        self._seq_of: Dict[str, int] = {}
+        self._seq = 0
+        self._completed = _InvertedIndex()
+        self._priority = _InvertedIndex()
+        self._assignee = _InvertedIndex()
+        self._tag = _InvertedIndex()
+        # Sorted (sort_key, id) entries per sort mode
+        self._orders: Dict[str, List[Tuple[Tuple, str]]] = {mode: [] for mode in SORT_MODES}
+        # Indexed values as of the last write, so they can be unindexed later
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        # Running aggregates for summary()
+        self._completed_count = 0
+        # Sorted (due_date, seq) of incomplete tasks that have a due date
+        self._open_due: List[Tuple[datetime, int]] = []
+        self._text = TextIndex(TEXT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._by_id
+
+    def get(self, task_id: str) -> Optional[Any]:
+        return self._by_id.get(task_id)
+
+    def _index(self, task: Any, presorted: bool = True) -> None:
+        seq = self._seq_of[task.id]
+        tags = list(task.tags or [])
+        self._completed.add(task.completed, task.id)
+        self._priority.add(task.priority, task.id)
+        self._assignee.add(task.assignee, task.id)
+        for tag in tags:
+            self._tag.add(tag, task.id)
+        keys = {}
+        for mode in SORT_MODES:
+            keys[mode] = _sort_key(task, mode, seq)
+            if presorted:
+                bisect.insort(self._orders[mode], (keys[mode], task.id))
+            else:
+                self._orders[mode].append((keys[mode], task.id))
+        open_due = None
+        if task.completed:
+            self._completed_count += 1
+        elif task.due_date is not None:
+            open_due = (task.due_date, seq)
+            if presorted:
+                bisect.insort(self._open_due, open_due)
+            else:
+                self._open_due.append(open_due)
+        # Unsorted (bulk) callers index the text in one batch themselves
+        if presorted:
+            self._text.add(task.id, task)
+        self._snapshots[task.id] = {
+            "completed": task.completed,
+            "priority": task.priority,
+            "assignee": task.assignee,
+            "tags": tags,
+            "keys": keys,
+            "open_due": open_due,
+        }
+
+    def _unindex(self, task_id: str, orders: bool = True) -> None:
+        snapshot = self._snapshots.pop(task_id)
+        self._text.remove(task_id)
+        self._completed.discard(snapshot["completed"], task_id)
+        self._priority.discard(snapshot["priority"], task_id)
+        self._assignee.discard(snapshot["assignee"], task_id)
+        for tag in snapshot["tags"]:
+            self._tag.discard(tag, task_id)
+        if orders:
+            for mode, key in snapshot["keys"].items():
+                order = self._orders[mode]
+                del order[bisect.bisect_left(order, (key, task_id))]
+        if snapshot["completed"]:
+            self._completed_count -= 1
+        elif orders and snapshot["open_due"] is not None:
+            del self._open_due[bisect.bisect_left(self._open_due, snapshot["open_due"])]
+
+    def add(self, task: Any) -> None:
+        """Add a task to the store."""
+        if task.id in self._by_id:
+            raise ValueError(f"Task with ID {task.id} already exists")
+        self._seq += 1
+        self._by_id[task.id] = task
+        self._seq_of[task.id] = self._seq
+        self._index(task)
+
+    def extend(self, tasks: List[Any]) -> None:
+        """Add many tasks at once, sorting each order once instead of per insert."""
+        for task in tasks:
+            if task.id in self._by_id:
+                raise ValueError(f"Task with ID {task.id} already exists")
+            self._seq += 1
+            self._by_id[task.id] = task
+            self._seq_of[task.id] = self._seq
+            self._index(task, presorted=False)
+        self._resort()
+        self._text.extend((task.id, task) for task in tasks)
+
+    def remove(self, task_id: str) -> Optional[Any]:
+        """Remove a task by id, returning it (or None if it doesn't exist)."""
+        task = self._by_id.pop(task_id, None)
+        if task is not None:
+            self._unindex(task_id)
+            del self._seq_of[task_id]
+        return task
+
+    def reindex(self, task: Any) -> None:
+        """Refresh the indexes for a task that was mutated in place."""
+        self._unindex(task.id)
+        self._index(task)
+
+    def _filter_orders(self, task_ids: Set[str]) -> None:
+        """Drop the given tasks from every order in one pass per order."""
+        seqs = {self._seq_of[task_id] for task_id in task_ids}
+        for mode, order in self._orders.items():
+            self._orders[mode] = [entry for entry in order if entry[1] not in task_ids]
+        self._open_due = [entry for entry in self._open_due if entry[1] not in seqs]
+
+    def _resort(self) -> None:
+        for order in self._orders.values():
+            order.sort()
+        self._open_due.sort()
+
+    def remove_many(self, task_ids: List[str]) -> List[Any]:
+        """Remove many tasks, rebuilding the orders once instead of per removal."""
+        ids = {task_id for task_id in task_ids if task_id in self._by_id}
+        if len(ids) * 16 < len(self._by_id):
+            return [self.remove(task_id) for task_id in ids]
+        self._filter_orders(ids)
+        removed = []
+        for task_id in ids:
+            self._unindex(task_id, orders=False)
+            removed.append(self._by_id.pop(task_id))
+            del self._seq_of[task_id]
+        return removed
+
+    def reindex_many(self, tasks: List[Any]) -> None:
+        """Refresh the indexes for many mutated tasks, sorting each order at most once."""
+        if len(tasks) * 16 < len(self._by_id):
+            for task in tasks:
+                self.reindex(task)
+            return
+        self._filter_orders({task.id for task in tasks})
+        for task in tasks:
+            self._unindex(task.id, orders=False)
+            self._index(task, presorted=False)
+        self._resort()
+        self._text.extend((task.id, task) for task in tasks)
+
+    def _open_due_between(self, start: datetime, end: datetime) -> int:
+        """Number of incomplete tasks due within [start, end)."""
+        return bisect.bisect_left(self._open_due, (end,)) - bisect.bisect_left(self._open_due, (start,))
+
+    def summary(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Task counts by status, priority and due date, in O(log n).
+
+        Counts come from running totals, and the due-date buckets are bisected
+        out of the open tasks' due order relative to `now`, so they follow the
+        clock without any work on the write path.
+        """
+        now = now or datetime.now()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        total = len(self._by_id)
+        return {
+            "total_tasks": total,
+            "completed_tasks": self._completed_count,
+            "incomplete_tasks": total - self._completed_count,
+            "priority_counts": {
+                priority: len(self._priority.postings.get(priority, ())) for priority in PRIORITY_ORDER
+            },
+            "overdue": bisect.bisect_left(self._open_due, (today,)),
+            "due_today": self._open_due_between(today, tomorrow),
+            "due_this_week": self._open_due_between(tomorrow, today + timedelta(days=8)),
+        }
+
+    def _due_range(self, after: Optional[datetime], before: Optional[datetime]) -> Tuple[int, int]:
+        """Positions in the due_date order of the dated tasks within [after, before]."""
+        order = self._orders["due_date"]
+        lo = bisect.bisect_left(order, (((0, after),),)) if after is not None else 0
+        if before is not None:
+            hi = bisect.bisect_right(order, (((0, before), math.inf),))
+        else:
+            hi = bisect.bisect_left(order, (((1,),),))
+        return lo, max(lo, hi)
+
+    def _match(
+        self,
+        completed: Any = None,
+        priority: Any = None,
+        assignee: Any = None,
+        tag: Any = None,
+        due_after: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+        filters: Iterable[str] = (),
+    ) -> Optional[Set[str]]:
+        """Ids of the tasks matching every filter named in `filters` (None means every task).
+
+        Equality filters (completed, priority, assignee, tag) are answered from
+        the inverted indexes and due-date bounds from the due_date order. The
+        planner starts from the smallest candidate set, intersects the others in
+        ascending size and checks whatever is left with a plain predicate, so
+        compound filters cost roughly the size of the most selective one.
+        """
+        filters = set(filters)
+        candidate_sets: List[Set[str]] = []
+        predicates: List[Callable[[Any], bool]] = []
+
+        def equality(name: str, index: _InvertedIndex, value: Any, predicate: Callable[[Any], bool]) -> None:
+            if name not in filters:
+                return
+            if _is_hashable(value):
+                candidate_sets.append(index.lookup(value))
+            predicates.append(predicate)
+
+        equality("completed", self._completed, completed, lambda t: t.completed == completed)
+        equality("priority", self._priority, priority, lambda t: t.priority == priority)
+        equality("assignee", self._assignee, assignee, lambda t: t.assignee == assignee)
+        equality("tag", self._tag, tag, lambda t: tag in t.tags)
+
+        due_range = None
+        if due_after is not None or due_before is not None:
+            due_range = self._due_range(due_after, due_before)
+            if due_after is not None:
+                predicates.append(lambda t: t.due_date is not None and t.due_date >= due_after)
+            if due_before is not None:
+                predicates.append(lambda t: t.due_date is not None and t.due_date <= due_before)
+
+        if not candidate_sets and due_range is None:
+            return None
+
+        candidate_sets.sort(key=len)
+        due_count = due_range[1] - due_range[0] if due_range is not None else math.inf
+        if not candidate_sets or due_count < len(candidate_sets[0]):
+            order = self._orders["due_date"]
+            candidates = {entry[1] for entry in order[due_range[0]:due_range[1]]}
+        else:
+            candidates = candidate_sets.pop(0)
+        for ids in candidate_sets:
+            if not candidates:
+                break
+            candidates = candidates & ids
+        return {task_id for task_id in candidates if all(p(self._by_id[task_id]) for p in predicates)}
+
+    def count(self, **criteria: Any) -> int:
+        """Number of tasks matching the same criteria `query()` takes, without ordering them."""
+        matches = self._match(**criteria)
+        return len(self._by_id) if matches is None else len(matches)
+
+    def query(self, sort_by: str = "insertion", descending: bool = False, **criteria: Any) -> List[Any]:
+        """Return every task matching the criteria accepted by `_match()`, in sort order."""
+        tasks, _ = self.page(sort_by=sort_by, descending=descending, **criteria)
+        return tasks
+
+    def page(
+        self,
+        sort_by: str = "insertion",
+        descending: bool = False,
+        after: Optional[Tuple] = None,
+        limit: Optional[int] = None,
+        **criteria: Any,
+    ) -> Tuple[List[Any], Optional[Tuple]]:
+        """One page of matching tasks in sort order, plus the sort key to resume after.
+
+        `after` is the sort key of the last task on the previous page, so the
+        next page starts at the right place even if tasks were added or removed
+        in between. The returned key is None when there are no more results.
+        """
+        mode = self.sort_mode(sort_by)
+        descending = descending and mode != "insertion"
+        ids = self._match(**criteria)
+        if descending and ids is None:
+            # Unfiltered descending listings walk the order back from their cursor
+            entries, next_key = _descending_page(self._orders[mode], after, limit)
+            return [self._by_id[entry[1]] for entry in entries], next_key
+        entries = self._ordered(ids, mode, descending)
+        start = _position_after(entries, after, descending) if after is not None else 0
+        end = len(entries) if limit is None else min(len(entries), start + limit)
+        next_key = entries[end - 1][0] if end < len(entries) else None
+        return [self._by_id[entry[1]] for entry in entries[start:end]], next_key
+
+    def search(self, query: str, limit: int = 10, **criteria: Any) -> List[Tuple[float, Any]]:
+        """Top `limit` (score, task) full-text matches for `query`, best first.
+
+        Takes the same filter criteria as `query()`; filters narrow the
+        candidates before ranking.
+        """
+        hits = self._text.search(query, limit, candidates=self._match(**criteria))
+        return [(score, self._by_id[task_id]) for score, task_id in hits]
+
+    def sort_mode(self, sort_by: str) -> str:
+        return sort_by if sort_by in self._orders else "insertion"
+
+    def _ordered(self, ids: Optional[Set[str]], mode: str, descending: bool) -> List[Tuple[Tuple, str]]:
+        """Order a set of ids (or every task, when ids is None) by a sort mode."""
+        if ids is not None and len(ids) * 8 < len(self._by_id):
+            # Few matches: sorting them beats walking the whole pre-sorted order
+            entries = sorted((self._snapshots[task_id]["keys"][mode], task_id) for task_id in ids)
+        else:
+            order = self._orders[mode]
+            entries = order if ids is None else [entry for entry in order if entry[1] in ids]
+        if descending:
+            entries = _reverse_stable(entries)
+        return entries
+
+def _position_after(entries: List[Tuple[Tuple, str]], after: Tuple, descending: bool) -> int:
+    """Index of the first entry that comes after the sort key `after`, by binary search."""
+    def is_after(key: Tuple) -> bool:
+        if not descending:
+            return key > after
+        # Descending orders reverse the key but keep ties in insertion (seq) order
+        return key[:-1] < after[:-1] or (key[:-1] == after[:-1] and key[-1] > after[-1])
+
+    lo, hi = 0, len(entries)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if is_after(entries[mid][0]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def _descending_page(
+    order: List[Tuple[Tuple, str]], after: Optional[Tuple], limit: Optional[int]
+) -> Tuple[List[Tuple[Tuple, str]], Optional[Tuple]]:
+    """One page of an ascending order in descending order, plus the key to resume after.
+
+    Same page as slicing `_reverse_stable(order)` after `after`, but found by
+    walking back from the end (or from `after`) one tie group at a time, each
+    located by bisection, so a page costs O(limit log n) rather than O(n).
+    """
+    wanted = len(order) + 1 if limit is None else limit + 1
+    key = itemgetter(0)
+    entries: List[Tuple[Tuple, str]] = []
+    end = len(order)
+    if after is not None:
+        # Later insertions tied with `after` come first, then everything ordered before it
+        prefix = after[:-1]
+        tail = bisect.bisect_right(order, after, key=key)
+        tail_end = bisect.bisect_left(order, prefix + (math.inf,), key=key)
+        entries.extend(order[tail:min(tail_end, tail + wanted)])
+        end = bisect.bisect_left(order, prefix, key=key)
+    while end > 0 and len(entries) < wanted:
+        start = bisect.bisect_left(order, order[end - 1][0][:-1], hi=end, key=key)
+        entries.extend(order[start:min(end, start + wanted - len(entries))])
+        end = start
+    if limit is not None and len(entries) > limit:
+        return entries[:limit], entries[limit - 1][0]
+    return entries, None
+
+def _reverse_stable(entries: List[Tuple[Tuple, str]]) -> List[Tuple[Tuple, str]]:
+    """Reverse an ascending order while keeping tied entries in insertion order.
+
+    Matches `list.sort(..., reverse=True)`, which is stable. Keys end with the
+    insertion seq, so ties are entries whose keys differ only in that last item.
+    """
+    result: List[Tuple[Tuple, str]] = []
+    end = len(entries)
+    while end > 0:
+        start = end - 1
+        prefix = entries[start][0][:-1]
+        while start > 0 and entries[start - 1][0][:-1] == prefix:
+            start -= 1
+        result.extend(entries[start:end])
+        end = start
+    return result
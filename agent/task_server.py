@@ -1,13 +1,35 @@
 import json
+import os
 import sys
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 import uuid
+from task_index import PRIORITY_ORDER, SORT_MODES, TaskIndex
+from storage import open_backend
+from tenants import Partitions, tenant_db_path
+from datetime_parsing import parse_due_datetime as parse_datetime
+from jsonl_server import JSONFragments, object_schema, serve
+from pagination import decode_cursor, encode_cursor, page_arguments, parse_fields, parse_flag, parse_limit
 
-# Simple in-memory task database for demonstration
-tasks = []
+# Tasks are persisted to a local SQLite database so they survive restarts;
+# set TASK_DB_PATH=memory to keep them in memory only. Tenants other than the
+# default one get a database file each, next to this one
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tasks.db")
+DB_PATH = os.environ.get("TASK_DB_PATH", DEFAULT_DB_PATH)
+
+# Matches search_tasks returns when no limit is given
+DEFAULT_SEARCH_LIMIT = 10
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
 
 class Task:
+    # Slots keep each task compact; _json caches the encoded task until the next update()
+    __slots__ = (
+        "id", "title", "description", "due_date", "priority", "completed",
+        "assignee", "tags", "created_at", "_json"
+    )
+
     def __init__(
         self,
         title: str,
@@ -24,13 +46,29 @@ class Task:
         self.title = title
         self.description = description
         self.due_date = due_date
-        self.priority = priority
+        # Priorities, assignees and tags repeat across tasks, so share one copy of each
+        self.priority = _intern(priority)
         self.completed = completed
-        self.assignee = assignee
-        self.tags = tags or []
+        self.assignee = _intern(assignee)
+        self.tags = [_intern(tag) for tag in tags] if tags else []
         self.created_at = created_at or datetime.now()
+        self._json = None
 
-    def to_dict(self) -> Dict[str, Any]:
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Apply field changes and drop the cached encoding."""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._json = None
+
+    def to_json(self) -> str:
+        """The task encoded as JSON, cached until it's next updated."""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict())
+        return self._json
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        if fields is not None:
+            return {name: TASK_FIELDS[name](self) for name in fields}
         return {
             "id": self.id,
             "title": self.title,
@@ -43,129 +81,198 @@ class Task:
             "created_at": self.created_at.isoformat()
         }
 
-def parse_datetime(datetime_str: str) -> Optional[datetime]:
-    """Parse a datetime string into a datetime object."""
-    if not datetime_str:
-        return None
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Task":
+        return cls(
+            title=data["title"],
+            description=data.get("description"),
+            due_date=datetime.fromisoformat(data["due_date"]) if data.get("due_date") else None,
+            priority=data.get("priority", "medium"),
+            completed=data.get("completed", False),
+            assignee=data.get("assignee"),
+            tags=data.get("tags"),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            id=data["id"]
+        )
+
+# Serializer per to_dict() field, used for field projections
+TASK_FIELDS = {
+    "id": lambda t: t.id,
+    "title": lambda t: t.title,
+    "description": lambda t: t.description,
+    "due_date": lambda t: t.due_date.isoformat() if t.due_date else None,
+    "priority": lambda t: t.priority,
+    "completed": lambda t: t.completed,
+    "assignee": lambda t: t.assignee,
+    "tags": lambda t: t.tags,
+    "created_at": lambda t: t.created_at.isoformat(),
+}
+
+class TaskPartition:
+    """One tenant's tasks: in-memory secondary indexes and its own storage."""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.tasks = TaskIndex()
+        self.storage = open_backend(tenant_db_path(DB_PATH, tenant_id), table="tasks")
+        self.load()
+
+    def load(self) -> None:
+        """Rebuild the in-memory indexes from storage."""
+        self.tasks.extend([Task.from_dict(record) for record in self.storage.load()])
+
+# Partitions are loaded on a tenant's first request, so a process only holds the tenants it serves
+partitions = Partitions(TaskPartition)
+
+def build_task(args: Dict[str, Any]) -> Task:
+    """Validate create arguments and build the task, without storing it."""
+    title = args.get("title")
+    if not title:
+        raise ValueError("Task title is required")
         
-    formats = [
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d",
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(datetime_str, fmt)
-        except ValueError:
-            continue
-    
-    # Natural language parsing
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    due_date_str = args.get("due_date")
+    due_date = parse_datetime(due_date_str) if due_date_str else None
     
-    if "today" in datetime_str.lower():
-        return today
-    elif "tomorrow" in datetime_str.lower():
-        return today + timedelta(days=1)
-    elif "next week" in datetime_str.lower():
-        return today + timedelta(days=7)
+    tags = args.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",")]
+        
+    return Task(
+        title=title,
+        description=args.get("description"),
+        due_date=due_date,
+        priority=args.get("priority", "medium"),
+        completed=args.get("completed", False),
+        assignee=args.get("assignee"),
+        tags=tags
+    )
+
+def prepare_task_update(task: Task, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate update arguments into the attribute changes to apply to a task."""
+    changes = {}
     
-    return None
+    if "title" in args:
+        changes["title"] = args["title"]
+        
+    if "description" in args:
+        changes["description"] = args["description"]
+        
+    if "due_date" in args:
+        changes["due_date"] = parse_datetime(args["due_date"])
+        
+    if "priority" in args:
+        changes["priority"] = args["priority"]
+        
+    if "completed" in args:
+        completed = args["completed"]
+        if isinstance(completed, str):
+            completed = completed.lower() == "true"
+        changes["completed"] = completed
+        
+    if "assignee" in args:
+        changes["assignee"] = args["assignee"]
+        
+    if "tags" in args:
+        tags = args["tags"]
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(",")]
+        changes["tags"] = tags
+        
+    return changes
 
 def create_task(args: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new task."""
     try:
-        title = args.get("title")
-        if not title:
+        store = partitions.for_args(args)
+        if not args.get("title"):
             return {"status": "error", "message": "Task title is required"}
             
-        due_date_str = args.get("due_date")
-        due_date = parse_datetime(due_date_str) if due_date_str else None
-        
-        tags = args.get("tags", [])
-        if isinstance(tags, str):
-            tags = [tag.strip() for tag in tags.split(",")]
-            
-        task = Task(
-            title=title,
-            description=args.get("description"),
-            due_date=due_date,
-            priority=args.get("priority", "medium"),
-            completed=args.get("completed", False),
-            assignee=args.get("assignee"),
-            tags=tags
-        )
-        
-        tasks.append(task)
+        task = build_task(args)
+        store.tasks.add(task)
+        store.storage.put(task.id, task.to_json())
         return {"status": "success", "task": task.to_dict()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def task_criteria(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Filter criteria for the task index from get_tasks-style arguments."""
+    # Equality filters that were provided
+    filters = [name for name in ("completed", "priority", "assignee", "tag") if name in args]
+    
+    completed = args.get("completed")
+    if isinstance(completed, str):
+        completed = completed.lower() == "true"
+        
+    # Due date range; bounds that fail to parse are ignored
+    due_date_before = parse_datetime(args["due_date_before"]) if "due_date_before" in args else None
+    due_date_after = parse_datetime(args["due_date_after"]) if "due_date_after" in args else None
+    
+    return {
+        "completed": completed,
+        "priority": args.get("priority"),
+        "assignee": args.get("assignee"),
+        "tag": args.get("tag"),
+        "due_after": due_date_after,
+        "due_before": due_date_before,
+        "filters": filters,
+    }
+
 def get_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
-    """Get tasks, optionally filtered by criteria."""
+    """Get tasks, optionally filtered by criteria.
+    
+    Supports `limit`/`cursor` pagination (the response carries `next_cursor`
+    while more tasks remain), a `fields` projection and `count_only`.
+    """
     try:
-        # Apply filters if provided
-        filtered_tasks = tasks
+        store = partitions.for_args(args)
+        criteria = task_criteria(args)
+        if parse_flag(args.get("count_only")):
+            return {"status": "success", "count": store.tasks.count(**criteria)}
         
-        # Filter by completion status
-        if "completed" in args:
-            completed = args["completed"]
-            if isinstance(completed, str):
-                completed = completed.lower() == "true"
-            filtered_tasks = [t for t in filtered_tasks if t.completed == completed]
-            
-        # Filter by priority
-        if "priority" in args:
-            priority = args["priority"]
-            filtered_tasks = [t for t in filtered_tasks if t.priority == priority]
-            
-        # Filter by assignee
-        if "assignee" in args:
-            assignee = args["assignee"]
-            filtered_tasks = [t for t in filtered_tasks if t.assignee == assignee]
-            
-        # Filter by tag
-        if "tag" in args:
-            tag = args["tag"]
-            filtered_tasks = [t for t in filtered_tasks if tag in t.tags]
-            
-        # Filter by due date range
-        if "due_date_before" in args:
-            due_date = parse_datetime(args["due_date_before"])
-            if due_date:
-                filtered_tasks = [t for t in filtered_tasks if t.due_date and t.due_date <= due_date]
-                
-        if "due_date_after" in args:
-            due_date = parse_datetime(args["due_date_after"])
-            if due_date:
-                filtered_tasks = [t for t in filtered_tasks if t.due_date and t.due_date >= due_date]
-                
-        # Sort results
+        # Let the index pick the most selective filter and return results in sort order
         sort_by = args.get("sort_by", "created_at")
         sort_dir = args.get("sort_dir", "desc").lower()
+        descending = sort_dir != "asc"
         
-        if sort_by == "due_date":
-            # Handle None values in due_date
-            if sort_dir == "asc":
-                filtered_tasks.sort(key=lambda t: (t.due_date is None, t.due_date))
-            else:
-                filtered_tasks.sort(key=lambda t: (t.due_date is None, t.due_date), reverse=True)
-        elif sort_by == "priority":
-            priority_order = {"high": 0, "medium": 1, "low": 2}
-            if sort_dir == "asc":
-                filtered_tasks.sort(key=lambda t: priority_order.get(t.priority, 3))
-            else:
-                filtered_tasks.sort(key=lambda t: priority_order.get(t.priority, 3), reverse=True)
-        elif sort_by == "created_at":
-            if sort_dir == "asc":
-                filtered_tasks.sort(key=lambda t: t.created_at)
-            else:
-                filtered_tasks.sort(key=lambda t: t.created_at, reverse=True)
+        limit = parse_limit(args)
+        fields = parse_fields(args, TASK_FIELDS)
+        # Cursors are only valid for the ordering they were issued for
+        scope = f"tasks:{store.tasks.sort_mode(sort_by)}:{'desc' if descending else 'asc'}"
+        after = decode_cursor(args["cursor"], scope) if args.get("cursor") else None
+        
+        filtered_tasks, next_key = store.tasks.page(
+            sort_by=sort_by, descending=descending, after=after, limit=limit, **criteria
+        )
                 
+        response = {
+            "status": "success",
+            "tasks": [task.to_dict(fields) for task in filtered_tasks] if fields is not None
+                     else JSONFragments(task.to_json() for task in filtered_tasks)
+        }
+        if next_key is not None:
+            response["next_cursor"] = encode_cursor(scope, next_key)
+        return response
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def search_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Full-text search over task titles, tags, assignees and descriptions.
+    
+    Returns the best `limit` matches (default 10), best first, each with its
+    relevance `score`. Accepts the same filters as get_tasks and a `fields` projection.
+    """
+    try:
+        store = partitions.for_args(args)
+        query = args.get("query")
+        if not query or not isinstance(query, str):
+            return {"status": "error", "message": "Search query is required"}
+            
+        limit = parse_limit(args) or DEFAULT_SEARCH_LIMIT
+        fields = parse_fields(args, TASK_FIELDS)
+        hits = store.tasks.search(query, limit, **task_criteria(args))
         return {
             "status": "success",
-            "tasks": [task.to_dict() for task in filtered_tasks]
+            "tasks": [{**task.to_dict(fields), "score": round(score, 4)} for score, task in hits]
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -173,41 +280,20 @@ def get_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
 def update_task(args: Dict[str, Any]) -> Dict[str, Any]:
     """Update an existing task."""
     try:
+        store = partitions.for_args(args)
         task_id = args.get("id")
         if not task_id:
             return {"status": "error", "message": "Task ID is required"}
             
-        task = next((t for t in tasks if t.id == task_id), None)
+        task = store.tasks.get(task_id)
         if not task:
             return {"status": "error", "message": f"Task with ID {task_id} not found"}
             
-        if "title" in args:
-            task.title = args["title"]
-            
-        if "description" in args:
-            task.description = args["description"]
-            
-        if "due_date" in args:
-            task.due_date = parse_datetime(args["due_date"])
-            
-        if "priority" in args:
-            task.priority = args["priority"]
-            
-        if "completed" in args:
-            completed = args["completed"]
-            if isinstance(completed, str):
-                completed = completed.lower() == "true"
-            task.completed = completed
-            
-        if "assignee" in args:
-            task.assignee = args["assignee"]
-            
-        if "tags" in args:
-            tags = args["tags"]
-            if isinstance(tags, str):
-                tags = [tag.strip() for tag in tags.split(",")]
-            task.tags = tags
-            
+        # Validate everything up front so a bad value can't leave the task half-updated
+        changes = prepare_task_update(task, args)
+        task.update(changes)
+        store.tasks.reindex(task)
+        store.storage.put(task.id, task.to_json())
         return {"status": "success", "task": task.to_dict()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -215,15 +301,16 @@ def update_task(args: Dict[str, Any]) -> Dict[str, Any]:
 def delete_task(args: Dict[str, Any]) -> Dict[str, Any]:
     """Delete a task."""
     try:
+        store = partitions.for_args(args)
         task_id = args.get("id")
         if not task_id:
             return {"status": "error", "message": "Task ID is required"}
             
-        task_index = next((i for i, t in enumerate(tasks) if t.id == task_id), None)
-        if task_index is None:
+        deleted_task = store.tasks.remove(task_id)
+        if deleted_task is None:
             return {"status": "error", "message": f"Task with ID {task_id} not found"}
             
-        deleted_task = tasks.pop(task_index)
+        store.storage.delete(task_id)
         return {"status": "success", "deleted_task": deleted_task.to_dict()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -231,91 +318,205 @@ def delete_task(args: Dict[str, Any]) -> Dict[str, Any]:
 def mark_completed(args: Dict[str, Any]) -> Dict[str, Any]:
     """Mark a task as completed."""
     try:
+        store = partitions.for_args(args)
         task_id = args.get("id")
         if not task_id:
             return {"status": "error", "message": "Task ID is required"}
             
-        task = next((t for t in tasks if t.id == task_id), None)
+        task = store.tasks.get(task_id)
         if not task:
             return {"status": "error", "message": f"Task with ID {task_id} not found"}
             
-        task.completed = True
+        task.update({"completed": True})
+        store.tasks.reindex(task)
+        store.storage.put(task.id, task.to_json())
         return {"status": "success", "task": task.to_dict()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def _bulk_items(args: Dict[str, Any], key: str) -> List[Any]:
+    items = args.get(key)
+    if not isinstance(items, list):
+        raise ValueError(f"'{key}' must be a list")
+    return items
+
+def _bulk_error(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    failed = [r for r in results if "error" in r]
+    return {
+        "status": "error",
+        "message": f"{len(failed)} of {len(results)} items are invalid; nothing was changed",
+        "results": failed
+    }
+
+def create_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Create many tasks at once; either all of them are created or none."""
+    try:
+        store = partitions.for_args(args)
+        new_tasks, results = [], []
+        for i, item in enumerate(_bulk_items(args, "tasks")):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Each task must be an object")
+                task = build_task(item)
+                new_tasks.append(task)
+                results.append({"index": i, "id": task.id})
+            except Exception as e:
+                results.append({"index": i, "error": str(e)})
+        if len(new_tasks) < len(results):
+            return _bulk_error(results)
+            
+        store.tasks.extend(new_tasks)
+        store.storage.put_many([(task.id, task.to_json()) for task in new_tasks])
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def update_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Update many tasks at once; either all of them are updated or none."""
+    try:
+        store = partitions.for_args(args)
+        updates, results = [], []
+        for i, item in enumerate(_bulk_items(args, "tasks")):
+            task_id = item.get("id") if isinstance(item, dict) else None
+            task = store.tasks.get(task_id) if isinstance(task_id, str) else None
+            try:
+                if not task_id:
+                    raise ValueError("Task ID is required")
+                if not task:
+                    raise ValueError(f"Task with ID {task_id} not found")
+                updates.append((task, prepare_task_update(task, item)))
+                results.append({"index": i, "id": task_id})
+            except Exception as e:
+                results.append({"index": i, "error": str(e)})
+        if len(updates) < len(results):
+            return _bulk_error(results)
+            
+        for task, changes in updates:
+            task.update(changes)
+        updated = list({task.id: task for task, _ in updates}.values())
+        store.tasks.reindex_many(updated)
+        store.storage.put_many([(task.id, task.to_json()) for task in updated])
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def delete_tasks(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Delete many tasks at once; either all of them are deleted or none."""
+    try:
+        store = partitions.for_args(args)
+        task_ids, seen, results = [], set(), []
+        for i, task_id in enumerate(_bulk_items(args, "ids")):
+            if not isinstance(task_id, str) or task_id not in store.tasks:
+                results.append({"index": i, "error": f"Task with ID {task_id} not found"})
+            elif task_id in seen:
+                results.append({"index": i, "error": f"Duplicate task ID {task_id}"})
+            else:
+                task_ids.append(task_id)
+                seen.add(task_id)
+                results.append({"index": i, "id": task_id})
+        if len(task_ids) < len(results):
+            return _bulk_error(results)
+            
+        store.tasks.remove_many(task_ids)
+        store.storage.delete_many(task_ids)
+        return {"status": "success", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 def get_task_summary(args: Dict[str, Any]) -> Dict[str, Any]:
     """Get a summary of tasks by status, priority, etc."""
     try:
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for t in tasks if t.completed)
-        incomplete_tasks = total_tasks - completed_tasks
-        
-        # Count by priority
-        priority_counts = {
-            "high": sum(1 for t in tasks if t.priority == "high"),
-            "medium": sum(1 for t in tasks if t.priority == "medium"),
-            "low": sum(1 for t in tasks if t.priority == "low")
-        }
-        
-        # Count by due date
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        overdue = sum(1 for t in tasks if not t.completed and t.due_date and t.due_date < today)
-        due_today = sum(1 for t in tasks if not t.completed and t.due_date and t.due_date.date() == today.date())
-        due_this_week = sum(
-            1 for t in tasks 
-            if not t.completed 
-            and t.due_date 
-            and t.due_date.date() > today.date() 
-            and t.due_date.date() <= (today + timedelta(days=7)).date()
-        )
+        store = partitions.for_args(args)
+        # Counts are maintained by the task index on every write
+        summary = store.tasks.summary()
+        total_tasks = summary["total_tasks"]
+        completed_tasks = summary["completed_tasks"]
         
         return {
             "status": "success",
             "summary": {
                 "total_tasks": total_tasks,
                 "completed_tasks": completed_tasks,
-                "incomplete_tasks": incomplete_tasks,
+                "incomplete_tasks": summary["incomplete_tasks"],
                 "completion_percentage": round(completed_tasks / total_tasks * 100, 1) if total_tasks > 0 else 0,
-                "priority_counts": priority_counts,
-                "overdue": overdue,
-                "due_today": due_today,
-                "due_this_week": due_this_week
+                "priority_counts": summary["priority_counts"],
+                "overdue": summary["overdue"],
+                "due_today": summary["due_today"],
+                "due_this_week": summary["due_this_week"]
             }
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# Name the server's metrics are labelled with
+SERVER_NAME = "tasks"
+
 # Function dispatch table
 FUNCTIONS = {
     "create_task": create_task,
     "get_tasks": get_tasks,
+    "search_tasks": search_tasks,
     "update_task": update_task,
     "delete_task": delete_task,
     "mark_completed": mark_completed,
     "get_task_summary": get_task_summary,
+    "create_tasks": create_tasks,
+    "update_tasks": update_tasks,
+    "delete_tasks": delete_tasks,
+}
+
+# Functions that modify the store; the request loop runs these one at a time
+WRITE_FUNCTIONS = {
+    "create_task", "update_task", "delete_task", "mark_completed",
+    "create_tasks", "update_tasks", "delete_tasks",
+}
+
+# Argument schemas, advertised to MCP clients with each function (see sample_agent/inprocess.py)
+DATE = {"type": "string", "description": "Date or date-time, e.g. 2025-03-14."}
+TASK_ID = {"type": "string"}
+PRIORITY = {"type": "string", "enum": list(PRIORITY_ORDER)}
+TASK_PROPERTIES = {
+    "title": {"type": "string"},
+    "description": {"type": "string"},
+    "due_date": DATE,
+    "priority": PRIORITY,
+    "completed": {"type": "boolean"},
+    "assignee": {"type": "string"},
+    "tags": {"type": "array", "items": {"type": "string"}},
+}
+TASK_FILTERS = {
+    "completed": {"type": "boolean"},
+    "priority": PRIORITY,
+    "assignee": {"type": "string"},
+    "tag": {"type": "string"},
+    "due_date_before": DATE,
+    "due_date_after": DATE,
+}
+SCHEMAS = {
+    "create_task": object_schema(TASK_PROPERTIES, ["title"]),
+    "get_tasks": object_schema({
+        **TASK_FILTERS,
+        "sort_by": {"type": "string", "enum": list(SORT_MODES), "default": "created_at"},
+        "sort_dir": {"type": "string", "enum": ["asc", "desc"], "default": "desc"},
+        "count_only": {"type": "boolean", "description": "Only count the matching tasks."},
+        **page_arguments(TASK_FIELDS),
+    }),
+    "search_tasks": object_schema({
+        "query": {"type": "string", "description": "Words to look for in titles, tags, assignees and descriptions."},
+        **TASK_FILTERS,
+        **page_arguments(TASK_FIELDS),
+    }, ["query"]),
+    "update_task": object_schema({"id": TASK_ID, **TASK_PROPERTIES}, ["id"]),
+    "delete_task": object_schema({"id": TASK_ID}, ["id"]),
+    "mark_completed": object_schema({"id": TASK_ID}, ["id"]),
+    "get_task_summary": object_schema({}),
+    "create_tasks": object_schema({"tasks": {"type": "array", "items": object_schema(TASK_PROPERTIES, ["title"])}}, ["tasks"]),
+    "update_tasks": object_schema({"tasks": {"type": "array", "items": object_schema({"id": TASK_ID, **TASK_PROPERTIES}, ["id"])}}, ["tasks"]),
+    "delete_tasks": object_schema({"ids": {"type": "array", "items": TASK_ID}}, ["ids"]),
 }
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        try:
-            request = json.loads(line)
-            function_name = request.get("function")
-            args = request.get("args", {})
-            
-            if function_name in FUNCTIONS:
-                result = FUNCTIONS[function_name](args)
-            else:
-                result = {
-                    "status": "error",
-                    "message": f"Unknown function: {function_name}"
-                }
-                
-            print(json.dumps(result))
-            sys.stdout.flush()
-        except json.JSONDecodeError:
-            print(json.dumps({"status": "error", "message": "Invalid JSON"}))
-            sys.stdout.flush()
-        except Exception as e:
-            print(json.dumps({"status": "error", "message": str(e)}))
-            sys.stdout.flush() 
\ No newline at end of file
+    serve(FUNCTIONS, WRITE_FUNCTIONS, name=SERVER_NAME)
+
+    # Commit any writes still waiting for the next group commit, in every tenant's storage
+    partitions.close()
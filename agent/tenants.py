@@ -0,0 +1,99 @@
+import bisect
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from storage import MEMORY_PATHS
+
+# Argument every request names its tenant (user, team, ...) with
+TENANT_ARG = "tenant_id"
+# Tenant of requests that don't name one, so single-user setups work unchanged
+DEFAULT_TENANT = "default"
+MAX_TENANT_ID_LENGTH = 128
+
+# Virtual nodes per shard on the hash ring; more spread tenants more evenly
+DEFAULT_RING_REPLICAS = 64
+
+def tenant_of(args: Any) -> str:
+    """The tenant a request's arguments name, or the default tenant."""
+    tenant_id = args.get(TENANT_ARG) if isinstance(args, dict) else None
+    if tenant_id is None or tenant_id == "":
+        return DEFAULT_TENANT
+    if not isinstance(tenant_id, str) or len(tenant_id) > MAX_TENANT_ID_LENGTH:
+        raise ValueError(f"{TENANT_ARG} must be a string of at most {MAX_TENANT_ID_LENGTH} characters")
+    return tenant_id
+
+def tenant_db_path(path: Optional[str], tenant_id: str) -> Optional[str]:
+    """Database file of one tenant's partition, next to the configured one.
+
+    The default tenant keeps the configured file, so existing data stays where
+    it is; every other tenant gets its own file under `<name>.tenants/`.
+    """
+    if path is None or path.strip() in MEMORY_PATHS or tenant_id == DEFAULT_TENANT:
+        return path
+    root, extension = os.path.splitext(path)
+    # Readable prefix for whoever browses the directory, hash so distinct ids never share a file
+    readable = re.sub(r"[^A-Za-z0-9_-]", "_", tenant_id)[:48]
+    digest = hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(f"{root}.tenants", f"{readable}-{digest}{extension or '.db'}")
+
+T = TypeVar("T")
+
+class Partitions(Generic[T]):
+    """Each tenant's partition of a server's data, created and loaded on first use.
+
+    Partitions don't share indexes or storage, so a query only ever scans its
+    own tenant's records and a large tenant can't slow down the others.
+    """
+
+    def __init__(self, create: Callable[[str], T]):
+        self._create = create
+        self._partitions: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str) -> T:
+        partition = self._partitions.get(tenant_id)
+        if partition is None:
+            with self._lock:
+                partition = self._partitions.get(tenant_id)
+                if partition is None:
+                    partition = self._partitions[tenant_id] = self._create(tenant_id)
+        return partition
+
+    def for_args(self, args: Any) -> T:
+        """The partition of the tenant a request's arguments name."""
+        return self.get(tenant_of(args))
+
+    def loaded(self) -> List[T]:
+        with self._lock:
+            return list(self._partitions.values())
+
+    def close(self) -> None:
+        """Close every loaded partition's storage, committing pending writes."""
+        for partition in self.loaded():
+            partition.storage.close()
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent hashing of tenant ids onto shards.
+
+    Each shard owns `replicas` points on the ring and a tenant goes to the
+    shard owning the first point after its hash. Changing the shard count
+    only moves the tenants whose points changed hands, about 1/shards of them.
+    """
+
+    def __init__(self, shards: int, replicas: int = DEFAULT_RING_REPLICAS):
+        if shards < 1:
+            raise ValueError("A hash ring needs at least one shard")
+        points = sorted((_ring_hash(f"shard-{shard}:{replica}"), shard) for shard in range(shards) for replica in range(replicas))
+        self.shards = shards
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard(self, tenant_id: str) -> int:
+        index = bisect.bisect(self._hashes, _ring_hash(tenant_id))
+        return self._owners[index % len(self._owners)]
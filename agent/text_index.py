@@ -0,0 +1,304 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Query terms shorter than this only match whole words, not prefixes
+MIN_PREFIX_LENGTH = 2
+# Most vocabulary terms one query term expands to, and how many are considered
+MAX_EXPANSIONS = 64
+MAX_EXPANSION_SCAN = 1024
+# Prefix matches score a little below whole-word matches
+PREFIX_PENALTY = 0.8
+# How far the average record length may drift before length norms are recomputed
+NORM_DRIFT = 0.1
+# Rare query terms whose postings add up to this many have all their matches scored
+EXHAUSTIVE_MAX = 4096
+
+# Vocabulary words a query term matches -> their BM25 weight
+Expansions = Dict[str, float]
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercased word tokens of a string, or of every string in a list."""
+    if not text:
+        return []
+    if isinstance(text, str):
+        return _TOKEN_RE.findall(text.lower())
+    if isinstance(text, (list, tuple)):
+        return [token for item in text for token in tokenize(item)]
+    return []
+
+class TextIndex:
+    """Incrementally maintained inverted index with BM25 ranking and prefix matching.
+
+    `fields` maps a field name to (extract, weight): `extract(record)` returns
+    the field's text (a string or a list of strings) and every token in it
+    counts `weight` times, so title matches can outrank description matches.
+    Query terms also match vocabulary words they are a prefix of ("budg"
+    finds "budget"), found by bisecting a sorted vocabulary.
+
+    A query scores every match of its rarest terms, then walks the common
+    terms' postings in impact order (the term's BM25 score in each record,
+    before idf) and stops as soon as no record it has not reached can make
+    the top `limit` (Fagin's threshold algorithm), rather than scoring every
+    record that mentions a common word.
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[Callable[[Any], Any], float]], k1: float = 1.2, b: float = 0.75):
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        # term -> {record id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # Terms of each record, to unindex it, and its weighted length
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []
+        # BM25 length norm of each record, relative to the average length when computed
+        self._norms: Dict[str, float] = {}
+        self._norm_average = 0.0
+        # term -> [(-impact, record id)] ascending, for terms that have been queried. Searches
+        # fill it in under the lock, so concurrent ones can share the index
+        self._impacts: Dict[str, List[Tuple[float, str]]] = {}
+        self._impacts_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _frequencies(self, record: Any) -> Dict[str, float]:
+        frequencies: Dict[str, float] = {}
+        for extract, weight in self.fields.values():
+            for token in tokenize(extract(record)):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+        return frequencies
+
+    def _insert(self, record_id: str, record: Any, new_terms: List[str]) -> None:
+        frequencies = self._frequencies(record)
+        length = sum(frequencies.values())
+        self._lengths[record_id] = length
+        self._total_length += length
+        norm = self._norms[record_id] = self._norm(length) if self._norm_average else 0.0
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                new_terms.append(term)
+            postings[record_id] = frequency
+            impacts = self._impacts.get(term)
+            if impacts is not None:
+                bisect.insort(impacts, (-frequency / (frequency + norm), record_id))
+        self._terms[record_id] = tuple(frequencies)
+
+    def add(self, record_id: str, record: Any) -> None:
+        """Index a record, replacing whatever was indexed under `record_id`."""
+        self._remove(record_id)
+        new_terms: List[str] = []
+        self._insert(record_id, record, new_terms)
+        for term in new_terms:
+            bisect.insort(self._vocabulary, term)
+        self._refresh_norms()
+
+    def extend(self, records: Iterable[Tuple[str, Any]]) -> None:
+        """Index many (record id, record) pairs, sorting the vocabulary once."""
+        new_terms: List[str] = []
+        for record_id, record in records:
+            self._remove(record_id)
+            self._insert(record_id, record, new_terms)
+        if new_terms:
+            self._vocabulary = sorted(set(self._vocabulary).union(new_terms))
+        self._refresh_norms()
+
+    def remove(self, record_id: str) -> None:
+        self._remove(record_id)
+        self._refresh_norms()
+
+    def _remove(self, record_id: str) -> None:
+        terms = self._terms.pop(record_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(record_id)
+        norm = self._norms.pop(record_id)
+        for term in terms:
+            postings = self._postings[term]
+            frequency = postings.pop(record_id)
+            impacts = self._impacts.get(term)
+            if impacts is not None:
+                del impacts[bisect.bisect_left(impacts, (-frequency / (frequency + norm), record_id))]
+            if not postings:
+                del self._postings[term]
+                self._impacts.pop(term, None)
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+
+    def _norm(self, length: float) -> float:
+        return self.k1 * (1 - self.b + self.b * length / self._norm_average)
+
+    def _refresh_norms(self) -> None:
+        """Recompute length norms once the average length has drifted too far.
+
+        Between refreshes new records are normed against the older average,
+        which keeps writes O(terms) at a negligible cost in ranking accuracy.
+        Only writes refresh, so searches never see the norms change under them.
+        """
+        if not self._terms:
+            return
+        average = self._total_length / len(self._terms) or 1.0
+        if self._norm_average and abs(average - self._norm_average) <= NORM_DRIFT * self._norm_average:
+            return
+        self._norm_average = average
+        self._norms = {record_id: self._norm(length) for record_id, length in self._lengths.items()}
+        # Impacts depend on the norms, so the orders are rebuilt as terms are queried again
+        self._impacts.clear()
+
+    def _impact_order(self, term: str) -> List[Tuple[float, str]]:
+        """(-impact, record id) pairs of a term, best first; kept up to date once built."""
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            with self._impacts_lock:
+                impacts = self._impacts.get(term)
+                if impacts is None:
+                    norms = self._norms
+                    impacts = self._impacts[term] = sorted(
+                        (-frequency / (frequency + norms[record_id]), record_id)
+                        for record_id, frequency in self._postings[term].items()
+                    )
+        return impacts
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Vocabulary terms a query term matches, with the factor their scores are scaled by."""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) < MIN_PREFIX_LENGTH:
+            return matches
+        lo = bisect.bisect_right(self._vocabulary, term)
+        scan_end = min(len(self._vocabulary), lo + MAX_EXPANSION_SCAN)
+        hi = bisect.bisect_left(self._vocabulary, term + "\U0010ffff", lo, scan_end)
+        prefixed = self._vocabulary[lo:hi]
+        if len(prefixed) > MAX_EXPANSIONS:
+            # Keep the most common completions
+            prefixed = heapq.nlargest(MAX_EXPANSIONS, prefixed, key=lambda word: len(self._postings[word]))
+        return matches + [(word, PREFIX_PENALTY) for word in prefixed]
+
+    def _weighted(self, expansions: List[Tuple[str, float]]) -> Expansions:
+        """Expansions with their factor folded into the term weight: idf * factor * (k1 + 1)."""
+        count = len(self._terms)
+        weighted = {}
+        for word, factor in expansions:
+            matches = len(self._postings[word])
+            idf = math.log(1 + (count - matches + 0.5) / (matches + 0.5))
+            weighted[word] = idf * factor * (self.k1 + 1)
+        return weighted
+
+    def _term_score(self, record_id: str, expansions: Expansions) -> float:
+        """A query term's score in one record: that of its best-scoring expansion."""
+        best = 0.0
+        norm = self._norms[record_id]
+        words = self._terms[record_id]
+        # Look up whichever of the record's words and the term's expansions is fewer
+        if len(expansions) > len(words):
+            matches = ((word, expansions[word]) for word in words if word in expansions)
+        else:
+            matches = expansions.items()
+        for word, weight in matches:
+            frequency = self._postings[word].get(record_id)
+            if frequency is not None:
+                score = weight * frequency / (frequency + norm)
+                if score > best:
+                    best = score
+        return best
+
+    def search(
+        self, query: str, limit: int = 10, candidates: Optional[Set[str]] = None
+    ) -> List[Tuple[float, str]]:
+        """Best `limit` (score, record id) matches for `query`, highest score first.
+
+        Records matching more query terms score higher; a query term that
+        matches several words counts its best match per record. With
+        `candidates`, only those record ids are considered.
+        """
+        if limit < 1 or not self._terms or (candidates is not None and not candidates):
+            return []
+        terms = [self._weighted(self._expand(term)) for term in dict.fromkeys(tokenize(query))]
+        terms = [expansions for expansions in terms if expansions]
+        if not terms:
+            return []
+        if candidates is not None and len(candidates) * len(terms) <= EXHAUSTIVE_MAX:
+            return heapq.nlargest(limit, self._scored(candidates, terms))
+
+        # Rarest terms first: every record matching one of them gets scored up front
+        terms.sort(key=lambda expansions: sum(len(self._postings[word]) for word in expansions))
+        rare, scanned = 0, 0
+        while rare < len(terms):
+            size = sum(len(self._postings[word]) for word in terms[rare])
+            if scanned + size > EXHAUSTIVE_MAX:
+                break
+            scanned += size
+            rare += 1
+        matched = {record_id for expansions in terms[:rare] for word in expansions for record_id in self._postings[word]}
+        if candidates is not None:
+            matched &= candidates
+        top = heapq.nlargest(limit, self._scored(matched, terms))
+        heapq.heapify(top)
+        if rare < len(terms):
+            self._walk(terms, terms[rare:], limit, candidates, matched, top)
+        return sorted(top, reverse=True)
+
+    def _scored(self, record_ids: Iterable[str], terms: List[Expansions]) -> Iterator[Tuple[float, str]]:
+        """(score, record id) for each of `record_ids` matching the query."""
+        for record_id in record_ids:
+            score = sum(self._term_score(record_id, expansions) for expansions in terms)
+            if score > 0:
+                yield score, record_id
+
+    def _walk(
+        self,
+        terms: List[Expansions],
+        common: List[Expansions],
+        limit: int,
+        candidates: Optional[Set[str]],
+        seen: Set[str],
+        top: List[Tuple[float, str]],
+    ) -> None:
+        """Add records reached through the `common` terms to the `top` heap until it is settled.
+
+        Records not in `seen` match only common terms, so the common terms'
+        scores at the walks' current positions bound what they could score.
+        """
+        streams: List[Optional[Iterator[Tuple[float, str]]]] = [self._stream(expansions) for expansions in common]
+        bounds = [self._bound(expansions) for expansions in common]
+        while len(top) < limit or top[0][0] < sum(bounds):
+            for i, stream in enumerate(streams):
+                if stream is None:
+                    continue
+                entry = next(stream, None)
+                if entry is None:
+                    streams[i], bounds[i] = None, 0.0
+                    continue
+                bounds[i] = -entry[0]
+                record_id = entry[1]
+                if record_id in seen or (candidates is not None and record_id not in candidates):
+                    continue
+                seen.add(record_id)
+                hit = (sum(self._term_score(record_id, expansions) for expansions in terms), record_id)
+                if len(top) < limit:
+                    heapq.heappush(top, hit)
+                elif hit > top[0]:
+                    heapq.heapreplace(top, hit)
+            if all(stream is None for stream in streams):
+                return
+
+    def _bound(self, expansions: Expansions) -> float:
+        """Highest score a query term reaches in any record."""
+        return max(-self._impact_order(word)[0][0] * weight for word, weight in expansions.items())
+
+    def _stream(self, expansions: Expansions) -> Iterator[Tuple[float, str]]:
+        """(-score, record id) for a query term's matches, best first across its expansions."""
+        def scaled(word: str, weight: float) -> Iterator[Tuple[float, str]]:
+            for impact, record_id in self._impact_order(word):
+                yield impact * weight, record_id
+        if len(expansions) == 1:
+            return scaled(*next(iter(expansions.items())))
+        return heapq.merge(*(scaled(word, weight) for word, weight in expansions.items()))